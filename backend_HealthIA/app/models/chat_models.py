@@ -44,6 +44,29 @@ class ChatResponse(BaseModel):
 
 class AllChatsResponse(BaseModel):
     chats: List[Dict[str, Any]]
+    next_cursor: Optional[int] = None
+
+
+class ChatDetailResponse(BaseModel):
+    id: int
+    title: str
+    created_at: str
+    last_message_at: Optional[str] = None
+    message_count: int
+    version: int = 0
+    messages: List[Dict[str, Any]]
+
+
+class SyncChatsResponse(BaseModel):
+    version: int
+    chats: List[Dict[str, Any]]
+    deleted: List[Dict[str, Any]]
+
+
+class SearchChatsResponse(BaseModel):
+    query: str
+    results: List[Dict[str, Any]]
+    next_offset: Optional[int] = None
 
 
 class ImageAnalysisRequest(BaseModel):
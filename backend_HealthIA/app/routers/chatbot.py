@@ -7,21 +7,29 @@ from fastapi import (
     Body,
     Depends,
     Request,
+    Query,
 )
+from fastapi.responses import StreamingResponse
 from app.models.chat_models import (
     ChatRequest,
     AllChatsResponse,
+    ChatDetailResponse,
     ChatResponse,
     InputType,
+    SearchChatsResponse,
+    SyncChatsResponse,
 )
 from app.services.openai_service import OpenAIService
 from herramientas.supervisor_agent import SupervisorAgent
 from herramientas.nutrition_agent import NutritionAgent
 from herramientas.exercise_agent import ExerciseAgent
 from herramientas.medical_agent import MedicalAgent
+from herramientas.llm_client import reset_stream_sink, set_stream_sink
+from herramientas.sharding import sharded_path
 from typing import Optional
 import json
 import sys
+import asyncio
 import logging
 import os
 import tempfile
@@ -121,7 +129,8 @@ async def process_chatbot_request(
                     )
 
                     # Subir la imagen a S3
-                    s3_result = S3Service.upload_file_to_s3(
+                    s3_result = await asyncio.to_thread(
+                        S3Service.upload_file_to_s3,
                         file_content=media_content,
                         file_extension=file_extension,
                         conversation_id=id,
@@ -150,14 +159,17 @@ async def process_chatbot_request(
                             if original_filename
                             else f"image_{timestamp}{extension}"
                         )
-                        local_path = IMAGES_DIR / f"{id}_{timestamp}_{safe_filename}"
+                        image_name = f"{id}_{timestamp}_{safe_filename}"
+                        # Repartir las imágenes en subdirectorios por el hash del nombre
+                        local_path = sharded_path(IMAGES_DIR, image_name, image_name)
+                        local_path.parent.mkdir(parents=True, exist_ok=True)
 
                         # Guardar la imagen localmente
                         with open(local_path, "wb") as f:
                             f.write(media_content)
 
                         # Generar URL relativa para acceder a la imagen
-                        media_url = f"/static/images/{local_path.name}"
+                        media_url = f"/static/images/{local_path.relative_to(IMAGES_DIR).as_posix()}"
                         logger.info(f"Imagen guardada localmente: {local_path}")
                     except Exception as e:
                         logger.error(f"Error al guardar imagen localmente: {str(e)}")
@@ -169,7 +181,9 @@ async def process_chatbot_request(
                 image_path = temp_file.name
 
             # Procesar con el supervisor_agent
-            result_content = supervisor_agent.process_request(message, image_path)
+            result_content = await supervisor_agent.process_request(
+                message, image_path
+            )
 
             # Registrar derivación exitosa si se menciona un agente específico
             if "[Agente de Nutricion]" in result_content:
@@ -206,6 +220,79 @@ async def process_chatbot_request(
         )
 
 
+def _sse_event(event: str, data: dict) -> str:
+    """Formatea un evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_chatbot_request(**kwargs):
+    """
+    Procesa una solicitud del chatbot enviando la respuesta como Server-Sent Events.
+
+    Emite eventos 'token' con cada fragmento de texto a medida que el agente lo genera,
+    y un evento 'done' con la respuesta completa (mismo formato que ChatResponse) una vez
+    que la conversación se ha guardado. Si ocurre un error se emite un evento 'error'.
+
+    Args:
+        **kwargs: Parámetros de process_chatbot_request.
+
+    Yields:
+        Eventos SSE codificados como texto.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    # La tarea hereda el contexto actual, por lo que sus llamadas al modelo usarán la cola
+    token = set_stream_sink(queue)
+    try:
+        task = asyncio.create_task(process_chatbot_request(**kwargs))
+    finally:
+        reset_stream_sink(token)
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+
+    streamed = []
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            break
+        streamed.append(chunk)
+        yield _sse_event("token", {"delta": chunk})
+
+    try:
+        result = task.result()
+    except HTTPException as e:
+        yield _sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        return
+    except Exception as e:
+        logger.error(f"ERROR en streaming: {str(e)}")
+        yield _sse_event(
+            "error",
+            {"status_code": 500, "detail": f"Error al procesar la solicitud: {str(e)}"},
+        )
+        return
+
+    # Enviar el texto que no pasó por el modelo (descargos, rutas de guardado, etc.)
+    respuesta = result.get("respuesta") or ""
+    streamed_text = "".join(streamed)
+    if respuesta.startswith(streamed_text) and len(respuesta) > len(streamed_text):
+        yield _sse_event("token", {"delta": respuesta[len(streamed_text) :]})
+
+    yield _sse_event("done", result)
+
+
+async def respond_chatbot_request(stream: bool, **kwargs):
+    """
+    Devuelve la respuesta completa o, si se solicitó streaming, un StreamingResponse SSE.
+    """
+    if not stream:
+        return await process_chatbot_request(**kwargs)
+
+    return StreamingResponse(
+        stream_chatbot_request(**kwargs),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.put("/chatbot", response_model=ChatResponse)
 async def chatbot(
     request: Request,
@@ -214,6 +301,7 @@ async def chatbot(
     id: Optional[int] = Form(None),
     type: Optional[str] = Form(None),
     media_file: Optional[UploadFile] = File(None),
+    stream: bool = Query(False),
 ):
     """
     Endpoint para chatbot con OpenAI.
@@ -231,6 +319,10 @@ async def chatbot(
     - **type**: Tipo de entrada (text, image, audio). Por defecto es "text".
     - **media_file**: Archivo multimedia opcional (imagen o audio)
 
+    Parámetro de consulta:
+    - **stream**: Si es true, la respuesta se envía como Server-Sent Events: eventos 'token'
+      con cada fragmento de texto y un evento final 'done' con la respuesta completa.
+
     Retorna la respuesta de OpenAI, el ID de la conversación, el título generado y la fecha de creación.
     """
     # Registrar nueva solicitud al endpoint
@@ -272,7 +364,8 @@ async def chatbot(
                         status_code=400, detail=f"Tipo de entrada no válido: {type_str}"
                     )
 
-                return await process_chatbot_request(
+                return await respond_chatbot_request(
+                    stream=stream,
                     message=message,
                     id=id,
                     input_type=input_type,
@@ -284,7 +377,8 @@ async def chatbot(
         else:
             # Si se pudo parsear el JSON correctamente
             logger.info(f"RAW BODY: {chat_request.dict()}")
-            return await process_chatbot_request(
+            return await respond_chatbot_request(
+                stream=stream,
                 message=chat_request.message,
                 id=chat_request.id,
                 input_type=chat_request.type,
@@ -313,7 +407,8 @@ async def chatbot(
             media_content = file_content
             original_filename = media_file.filename
 
-        return await process_chatbot_request(
+        return await respond_chatbot_request(
+            stream=stream,
             message=message,
             id=id,
             input_type=input_type,
@@ -341,14 +436,14 @@ async def delete_chat(chat_id: int):
 
     try:
         # Verificar si la conversación existe
-        if not OpenAIService.conversation_exists(chat_id):
+        if not await asyncio.to_thread(OpenAIService.conversation_exists, chat_id):
             raise HTTPException(
                 status_code=404,
                 detail=f"No se encontró la conversación con ID {chat_id}",
             )
 
         # Eliminar la conversación
-        success = OpenAIService.delete_conversation(chat_id)
+        success = await asyncio.to_thread(OpenAIService.delete_conversation, chat_id)
 
         if success:
             return {"mensaje": f"Conversación con ID {chat_id} eliminada correctamente"}
@@ -366,21 +461,150 @@ async def delete_chat(chat_id: int):
 
 
 @router.get("/show-chats", response_model=AllChatsResponse)
-async def show_all_chats():
+async def show_all_chats(
+    cursor: Optional[int] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    include_messages: bool = Query(False),
+):
     """
-    Obtiene todas las conversaciones disponibles.
+    Obtiene las conversaciones disponibles, de la más reciente a la más antigua.
+
+    - **cursor**: Valor de `next_cursor` de la página anterior (opcional).
+    - **limit**: Número máximo de conversaciones por página (1-200).
+    - **include_messages**: Incluir los mensajes de cada conversación.
 
-    Retorna una lista con todas las conversaciones, cada una con su ID y mensajes.
+    Retorna una lista con el ID, título, fecha de creación, fecha del último mensaje y
+    número de mensajes de cada conversación, y el cursor de la página siguiente.
     """
     # Registrar nueva solicitud al endpoint
     logger.info(f"NEW REQUEST: /show-chats [GET]")
 
     try:
-        # Obtener todas las conversaciones
-        all_chats = OpenAIService.get_all_conversations()
+        # Obtener la página de conversaciones del índice de metadatos
+        chats, next_cursor = await asyncio.to_thread(
+            OpenAIService.list_conversations, cursor, limit, include_messages
+        )
 
-        return {"chats": all_chats}
+        return {"chats": chats, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al obtener las conversaciones: {str(e)}"
         )
+
+
+@router.get("/show-chat/{chat_id}", response_model=ChatDetailResponse)
+async def show_chat(chat_id: int):
+    """
+    Obtiene una conversación con todos sus mensajes.
+
+    - **chat_id**: ID numérico entero de la conversación (en la URL).
+    """
+    # Registrar nueva solicitud al endpoint
+    logger.info(f"NEW REQUEST: /show-chat/{chat_id} [GET]")
+
+    try:
+        chat = await asyncio.to_thread(OpenAIService.get_conversation_detail, chat_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al obtener la conversación: {str(e)}"
+        )
+
+    if chat is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No se encontró la conversación con ID {chat_id}",
+        )
+    return chat
+
+
+@router.get("/sync-chats", response_model=SyncChatsResponse)
+async def sync_chats(
+    since: int = Query(0, ge=0),
+    include_messages: bool = Query(True),
+):
+    """
+    Obtiene solo los cambios en las conversaciones desde una versión anterior.
+
+    - **since**: Valor de `version` de la sincronización anterior (0 para obtener todo).
+    - **include_messages**: Incluir los mensajes nuevos de cada conversación.
+
+    Cada conversación creada o modificada incluye sus metadatos y su `version`; con
+    `include_messages`, también `offset` (número de mensajes que el cliente ya tiene) y
+    los mensajes posteriores. Las conversaciones eliminadas se devuelven en `deleted`.
+    """
+    # Registrar nueva solicitud al endpoint
+    logger.info(f"NEW REQUEST: /sync-chats [GET] since={since}")
+
+    try:
+        return await asyncio.to_thread(
+            OpenAIService.sync_conversations, since, include_messages
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al sincronizar las conversaciones: {str(e)}"
+        )
+
+
+@router.get("/search-chats", response_model=SearchChatsResponse)
+async def search_chats(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Busca mensajes en el historial de conversaciones.
+
+    - **q**: Texto a buscar. Deben aparecer todas las palabras (sin distinguir
+      mayúsculas ni tildes); la última también se busca como prefijo.
+    - **limit**: Número máximo de resultados (1-100).
+    - **offset**: Valor de `next_offset` de la página anterior (opcional).
+
+    Cada resultado incluye el ID y el título de la conversación, la posición (`seq`) y el
+    rol del mensaje, un fragmento (`snippet`) con los términos entre `<mark>` y `</mark>`
+    y la puntuación de relevancia (`score`).
+    """
+    # Registrar nueva solicitud al endpoint
+    logger.info(f"NEW REQUEST: /search-chats [GET]")
+
+    try:
+        return await asyncio.to_thread(
+            OpenAIService.search_conversations, q, limit, offset
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al buscar en las conversaciones: {str(e)}"
+        )
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """
+    Obtiene las métricas de las cachés del supervisor y de la caché de conversaciones
+    (tamaño, aciertos, fallos y tasa de aciertos).
+    """
+    # Registrar nueva solicitud al endpoint
+    logger.info(f"NEW REQUEST: /cache-stats [GET]")
+
+    stats = supervisor_agent.cache_stats()
+    conversation_stats = await asyncio.to_thread(OpenAIService.conversation_cache_stats)
+    if conversation_stats is not None:
+        stats["conversations"] = conversation_stats
+    return stats
+
+
+@router.get("/archive-stats")
+async def archive_stats():
+    """
+    Obtiene las métricas del archivo comprimido de conversaciones inactivas:
+    conversaciones archivadas, segmentos, bytes sin comprimir y comprimidos, bytes en
+    disco y ahorro.
+    """
+    # Registrar nueva solicitud al endpoint
+    logger.info(f"NEW REQUEST: /archive-stats [GET]")
+
+    stats = await asyncio.to_thread(OpenAIService.conversation_archive_stats)
+    if stats is None:
+        raise HTTPException(
+            status_code=404, detail="El archivo de conversaciones no está activado"
+        )
+    return stats
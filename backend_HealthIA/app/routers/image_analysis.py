@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, File, Form, UploadFile, Body, Request
 from app.models.chat_models import (
     ImageAnalysisRequest,
@@ -161,7 +162,9 @@ async def delete_analysis(delete_request: DeleteImageAnalysisRequest):
             )
 
         # Eliminar el análisis
-        success = ImageAnalysisService.delete_analysis(delete_request.id)
+        success = await asyncio.to_thread(
+            ImageAnalysisService.delete_analysis, delete_request.id
+        )
 
         if success:
             logger.info(f"Análisis con ID {delete_request.id} eliminado correctamente")
@@ -0,0 +1,254 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from herramientas.cache import TTLCache
+from herramientas.llm_client import get_async_client
+
+# Configurar logger
+logger = logging.getLogger("context_service")
+logger.setLevel(logging.INFO)
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Obtener el cliente de OpenAI compartido
+client = get_async_client(os.getenv("OPENAI_API_KEY"))
+
+# Modelo usado para resumir la parte antigua de las conversaciones
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+
+# Presupuesto de tokens del historial enviado literalmente al modelo
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000))
+# Número máximo de mensajes recientes enviados literalmente (user + assistant)
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", 12))
+# Longitud máxima del resumen acumulado
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", 400))
+CONTEXT_SUMMARY_ENABLED = (
+    os.getenv("CONTEXT_SUMMARY_ENABLED", "True").lower() == "true"
+)
+# Conversaciones cuyo resumen se mantiene en memoria; el resto se recarga del
+# resumen guardado con la conversación
+CONTEXT_SUMMARY_CACHE_SIZE = int(os.getenv("CONTEXT_SUMMARY_CACHE_SIZE", 1024))
+
+# Coste aproximado de una imagen en el historial
+IMAGE_TOKEN_COST = 765
+
+# Resumen acumulado por conversación (LRU): {"text": ..., "covered": nº de mensajes resumidos}
+_summaries = TTLCache(CONTEXT_SUMMARY_CACHE_SIZE, ttl=None)
+# Resúmenes en curso por conversación
+_summary_tasks: Dict[int, asyncio.Task] = {}
+
+# Codificador de tiktoken (incluido en requirements.txt); si no está instalado, los
+# tokens se estiman como caracteres / 4, lo que suele sobrestimar el texto en español
+_encoding = None
+try:
+    import tiktoken
+
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"No se pudo cargar la codificación de tiktoken: {str(e)}")
+except ImportError:
+    pass
+
+
+class ContextService:
+    @staticmethod
+    def count_text_tokens(text: str) -> int:
+        """Cuenta (o estima) los tokens de un texto."""
+        if _encoding is not None:
+            return len(_encoding.encode(text, disallowed_special=()))
+        return max(1, (len(text) + 3) // 4)
+
+    @staticmethod
+    def count_message_tokens(message: dict) -> int:
+        """
+        Cuenta los tokens de un mensaje en formato OpenAI, incluidas las partes
+        multimodales (texto e imágenes).
+        """
+        content = message.get("content")
+        tokens = 4  # Coste fijo por mensaje (rol y separadores)
+        if isinstance(content, str):
+            tokens += ContextService.count_text_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    tokens += ContextService.count_text_tokens(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    tokens += IMAGE_TOKEN_COST
+        return tokens
+
+    @staticmethod
+    def select_window(history: List[dict]) -> int:
+        """
+        Elige los mensajes recientes que se envían literalmente: como máximo
+        CONTEXT_MAX_MESSAGES y dentro de CONTEXT_TOKEN_BUDGET (el último mensaje
+        siempre se incluye).
+
+        Args:
+            history: Historial completo en formato OpenAI.
+
+        Returns:
+            Índice del primer mensaje de la ventana.
+        """
+        used = 0
+        start = len(history)
+        while start > 0 and len(history) - start < CONTEXT_MAX_MESSAGES:
+            tokens = ContextService.count_message_tokens(history[start - 1])
+            if start < len(history) and used + tokens > CONTEXT_TOKEN_BUDGET:
+                break
+            used += tokens
+            start -= 1
+        return start
+
+    @staticmethod
+    def build_history(conversation_id: int, history: List[dict]) -> List[dict]:
+        """
+        Construye el historial que se envía al modelo: un resumen de los mensajes
+        antiguos seguido de los mensajes recientes que caben en el presupuesto.
+        Si el resumen no cubre todos los mensajes que quedan fuera de la ventana,
+        se actualiza en segundo plano para el siguiente turno y, mientras tanto, los
+        mensajes que no cubre se envían literalmente.
+
+        Args:
+            conversation_id: ID de la conversación.
+            history: Historial completo en formato OpenAI (sin mensaje de sistema).
+
+        Returns:
+            Lista de mensajes a enviar después del mensaje de sistema.
+        """
+        start = ContextService.select_window(history)
+        if start == 0:
+            return list(history)
+
+        messages = []
+        if CONTEXT_SUMMARY_ENABLED:
+            summary = _summaries.get(conversation_id)
+            covered = summary["covered"] if summary and summary.get("text") else 0
+            if covered < start:
+                ContextService.schedule_summary(conversation_id, history[:start])
+                # No perder los mensajes que el resumen aún no cubre
+                start = covered
+            if covered:
+                messages.append(
+                    {
+                        "role": "system",
+                        "content": f"Resumen de la conversación anterior:\n{summary['text']}",
+                    }
+                )
+
+        # Si el resumen ya cubre parte de la ventana, esos mensajes se envían igualmente
+        messages.extend(history[start:])
+        return messages
+
+    @staticmethod
+    def load_summary(conversation_id: int, stored: Optional[dict]) -> None:
+        """
+        Carga el resumen guardado con la conversación si es más reciente que el de memoria.
+        """
+        if not stored or "covered" not in stored:
+            return
+        current = _summaries.get(conversation_id)
+        if current is None or stored["covered"] > current["covered"]:
+            _summaries.set(conversation_id, stored)
+
+    @staticmethod
+    def get_summary(conversation_id: int) -> Optional[dict]:
+        """Devuelve el resumen acumulado de la conversación, si existe."""
+        return _summaries.get(conversation_id)
+
+    @staticmethod
+    def forget(conversation_id: int) -> None:
+        """Elimina el resumen de una conversación borrada."""
+        _summaries.delete(conversation_id)
+        task = _summary_tasks.pop(conversation_id, None)
+        if task is not None:
+            task.cancel()
+
+    @staticmethod
+    def schedule_summary(conversation_id: int, older_messages: List[dict]) -> None:
+        """
+        Lanza la actualización del resumen en segundo plano (una por conversación).
+
+        Args:
+            conversation_id: ID de la conversación.
+            older_messages: Mensajes anteriores a la ventana que debe cubrir el resumen.
+        """
+        task = _summary_tasks.get(conversation_id)
+        if task is not None and not task.done():
+            return
+
+        task = asyncio.create_task(
+            ContextService._refresh_summary(conversation_id, list(older_messages))
+        )
+        _summary_tasks[conversation_id] = task
+        task.add_done_callback(
+            lambda t: _summary_tasks.pop(conversation_id, None)
+            if _summary_tasks.get(conversation_id) is t
+            else None
+        )
+
+    @staticmethod
+    def _message_text(message: dict) -> str:
+        """Convierte un mensaje a texto plano para el resumen."""
+        content = message.get("content")
+        if isinstance(content, list):
+            parts = []
+            for part in content:
+                if part.get("type") == "text":
+                    parts.append(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    parts.append("[imagen]")
+            content = " ".join(parts)
+        role = "Usuario" if message.get("role") == "user" else "Asistente"
+        return f"{role}: {content}"
+
+    @staticmethod
+    async def _refresh_summary(conversation_id: int, older_messages: List[dict]) -> None:
+        """Integra en el resumen acumulado los mensajes que aún no cubre."""
+        try:
+            summary = _summaries.get(conversation_id) or {"text": "", "covered": 0}
+            pending = older_messages[summary["covered"] :]
+            if not pending:
+                return
+
+            transcript = "\n".join(ContextService._message_text(m) for m in pending)
+            prompt = (
+                f"Resumen actual:\n{summary['text'] or '(vacío)'}\n\n"
+                f"Nuevos mensajes:\n{transcript}"
+            )
+            response = await client.chat.completions.create(
+                model=CONTEXT_SUMMARY_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "Actualiza el resumen de una conversación entre un usuario y un asistente de salud. Conserva datos del usuario, síntomas, objetivos, recomendaciones y decisiones importantes. Responde solo con el resumen, de forma concisa.",
+                    },
+                    {"role": "user", "content": prompt},
+                ],
+                max_tokens=CONTEXT_SUMMARY_MAX_TOKENS,
+                temperature=0.2,
+            )
+            text = (response.choices[0].message.content or "").strip()
+            if text:
+                _summaries.set(
+                    conversation_id, {"text": text, "covered": len(older_messages)}
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(
+                f"Error al resumir la conversación {conversation_id}: {str(e)}"
+            )
+
+    @staticmethod
+    async def wait_for_background_tasks(timeout: float = 10) -> None:
+        """
+        Espera a que terminen los resúmenes en curso. Se invoca al apagar la aplicación.
+        """
+        if _summary_tasks:
+            await asyncio.wait(list(_summary_tasks.values()), timeout=timeout)
@@ -0,0 +1,351 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+
+# Registro canónico de una conversación:
+# {
+#     "id": 1,
+#     "title": "...",
+#     "created_at": "YYYY-MM-DD HH:MM:SS",
+#     "last_message_at": "YYYY-MM-DD HH:MM:SS",
+#     "summary": {...},            # opcional, resumen acumulado del historial
+#     "version": 12,               # asignada por el almacén en cada cambio
+#     "messages": [...],
+# }
+#
+# Cada turno se guarda una sola vez como mensaje canónico:
+# - Texto:      {"role": "user" | "assistant", "content": "..."}
+# - Imagen:     {"role": "user", "content": instrucción, "image_url": url,
+#                "description": descripción breve (opcional)}
+# - Audio:      {"role": "user", "content": texto enviado al modelo, "audio_url": url,
+#                "transcription": transcripción, "instruction": instrucción}
+#
+# Las vistas del modelo (formato OpenAI) y del frontend se derivan de estos mensajes.
+
+# Prefijos de los mensajes de audio en el formato anterior
+AUDIO_URL_PREFIX = "URL del audio: "
+AUDIO_TRANSCRIPTION_PREFIX = "Transcripción del audio: "
+AUDIO_INSTRUCTION_SEPARATOR = "\n\nInstrucción adicional: "
+
+# Extensiones que identifican una URL de imagen en el formato anterior
+IMAGE_URL_EXTENSIONS = [".jpg", ".jpeg", ".png", ".gif"]
+
+# Conversaciones cuyas vistas derivadas se mantienen en memoria (LRU); una vista
+# expulsada se recalcula entera la próxima vez que se pide
+PROJECTION_CACHE_SIZE = int(os.getenv("PROJECTION_CACHE_SIZE", 512))
+
+
+def new_record(conversation_id: int, title: str = "", created_at: str = "") -> dict:
+    """Crea el registro canónico vacío de una conversación."""
+    return {
+        "id": conversation_id,
+        "title": title,
+        "created_at": created_at,
+        "messages": [],
+    }
+
+
+# Campos de la cabecera del registro
+HEADER_FIELDS = ("title", "created_at", "last_message_at", "summary")
+
+
+def record_header(record: dict) -> dict:
+    """
+    Devuelve la cabecera del registro (título, fecha de creación, fecha del último
+    mensaje y resumen).
+    """
+    return {key: record.get(key) for key in HEADER_FIELDS}
+
+
+def apply_header(record: dict, header: dict) -> None:
+    """Actualiza la cabecera del registro con los valores presentes en header."""
+    for key in HEADER_FIELDS:
+        if header.get(key) is not None:
+            record[key] = header[key]
+
+
+def record_metadata(record: dict) -> dict:
+    """
+    Devuelve los metadatos de una conversación para los listados: ID, título,
+    fecha de creación, fecha del último mensaje, número de mensajes y versión.
+    """
+    return {
+        "id": record["id"],
+        "title": record.get("title") or "Chat sin título",
+        "created_at": record.get("created_at") or "Fecha desconocida",
+        "last_message_at": record.get("last_message_at") or record.get("created_at"),
+        "message_count": len(record.get("messages", [])),
+        "version": record.get("version", 0),
+    }
+
+
+def message_text(message: dict) -> str:
+    """
+    Texto de un mensaje para la búsqueda: su contenido y, en las imágenes, la
+    descripción (el contenido de los audios ya incluye la transcripción).
+    """
+    content = message.get("content")
+    if not isinstance(content, str):
+        content = ""
+    if message.get("description"):
+        content = f"{content}\n{message['description']}"
+    return content
+
+
+def audio_content(transcription: str, instruction: str = "") -> str:
+    """Texto que se envía al modelo para un audio transcrito."""
+    if instruction:
+        return f"{transcription}{AUDIO_INSTRUCTION_SEPARATOR}{instruction}"
+    return transcription
+
+
+def is_image_url(content) -> bool:
+    """Indica si el contenido de un mensaje es la URL de una imagen (formato antiguo)."""
+    return (
+        isinstance(content, str)
+        and content.startswith("http")
+        and (
+            any(content.lower().endswith(ext) for ext in IMAGE_URL_EXTENSIONS)
+            or "s3.amazonaws.com" in content
+        )
+    )
+
+
+def frontend_view(messages: List[dict], start: int = 0) -> List[dict]:
+    """
+    Deriva los mensajes que muestra el frontend.
+
+    Args:
+        messages: Mensajes canónicos de la conversación.
+        start: Índice desde el que convertir.
+
+    Returns:
+        Lista de mensajes en formato frontend.
+    """
+    view = []
+    for m in messages[start:]:
+        if m.get("image_url"):
+            view.append({"role": "user_media", "content": m["image_url"]})
+            view.append({"role": "user", "content": m["content"]})
+        elif m.get("audio_url"):
+            view.append({"role": "user", "content": f"{AUDIO_URL_PREFIX}{m['audio_url']}"})
+            if m.get("instruction"):
+                view.append({"role": "user", "content": m["instruction"]})
+            view.append(
+                {
+                    "role": "system",
+                    "content": f"{AUDIO_TRANSCRIPTION_PREFIX}{m.get('transcription', '')}",
+                }
+            )
+        else:
+            view.append({"role": m["role"], "content": m["content"]})
+    return view
+
+
+def legacy_openai_view(messages: List[dict], start: int = 0) -> List[dict]:
+    """
+    Deriva los mensajes en el formato del archivo OpenAI anterior (backend "json").
+
+    Args:
+        messages: Mensajes canónicos de la conversación.
+        start: Índice desde el que convertir.
+
+    Returns:
+        Lista de mensajes en el formato guardado anteriormente.
+    """
+    view = []
+    for m in messages[start:]:
+        if m.get("image_url"):
+            message = {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": m["content"]},
+                    {"type": "image_url", "image_url": {"url": m["image_url"]}},
+                ],
+            }
+            if m.get("description"):
+                message["description"] = m["description"]
+            view.append(message)
+        elif m.get("audio_url"):
+            view.append(
+                {"role": "system", "content": f"[Audio transcrito: {m['audio_url']}]"}
+            )
+            view.append({"role": "user", "content": m["content"]})
+        else:
+            view.append({"role": m["role"], "content": m["content"]})
+    return view
+
+
+def record_from_legacy(
+    conversation_id: int, openai_data: dict, frontend_data: dict
+) -> dict:
+    """
+    Reconstruye el registro canónico a partir de los dos archivos del formato
+    anterior. Los mensajes se toman de la vista del frontend, que conserva las URL,
+    instrucciones y transcripciones; las descripciones de imagen salen del archivo
+    OpenAI.
+
+    Args:
+        conversation_id: ID de la conversación.
+        openai_data: Contenido del archivo en formato OpenAI.
+        frontend_data: Contenido del archivo en formato frontend.
+
+    Returns:
+        Registro canónico de la conversación.
+    """
+    record = new_record(
+        conversation_id,
+        frontend_data.get("title", ""),
+        frontend_data.get("created_at", ""),
+    )
+    if frontend_data.get("last_message_at"):
+        record["last_message_at"] = frontend_data["last_message_at"]
+    if openai_data.get("summary"):
+        record["summary"] = openai_data["summary"]
+
+    descriptions = {}
+    for m in openai_data.get("messages", []):
+        if isinstance(m.get("content"), list) and m.get("description"):
+            for part in m["content"]:
+                if part.get("type") == "image_url":
+                    descriptions[part["image_url"]["url"]] = m["description"]
+
+    messages = frontend_data.get("messages", [])
+    if not messages and openai_data.get("messages"):
+        # Conversación sin vista de frontend: se usa la del modelo
+        messages = openai_data["messages"]
+
+    i = 0
+    while i < len(messages):
+        m = messages[i]
+        content = m.get("content")
+        next_message = messages[i + 1] if i + 1 < len(messages) else None
+
+        # Imagen: URL (como "user_media" o, en el formato más antiguo, como texto)
+        # seguida de la instrucción del usuario
+        if m["role"] == "user_media" or (m["role"] == "user" and is_image_url(content)):
+            instruction = ""
+            if next_message is not None and next_message["role"] == "user":
+                instruction = next_message["content"]
+                i += 1
+            message = {"role": "user", "content": instruction, "image_url": content}
+            if content in descriptions:
+                message["description"] = descriptions[content]
+            record["messages"].append(message)
+
+        # Audio: URL, instrucción opcional y transcripción
+        elif (
+            m["role"] == "user"
+            and isinstance(content, str)
+            and content.startswith(AUDIO_URL_PREFIX)
+        ):
+            instruction = ""
+            transcription = ""
+            j = i + 1
+            if (
+                j + 1 < len(messages)
+                and messages[j]["role"] == "user"
+                and messages[j + 1]["role"] == "system"
+            ):
+                instruction = messages[j]["content"]
+                j += 1
+            if j < len(messages) and messages[j]["role"] == "system":
+                transcription = messages[j]["content"].replace(
+                    AUDIO_TRANSCRIPTION_PREFIX, "", 1
+                )
+                i = j
+            record["messages"].append(
+                {
+                    "role": "user",
+                    "content": audio_content(transcription, instruction),
+                    "audio_url": content[len(AUDIO_URL_PREFIX) :],
+                    "transcription": transcription,
+                    "instruction": instruction,
+                }
+            )
+
+        # Mensaje multimodal del archivo OpenAI
+        elif m["role"] == "user" and isinstance(content, list):
+            text = " ".join(p.get("text", "") for p in content if p.get("type") == "text")
+            urls = [p["image_url"]["url"] for p in content if p.get("type") == "image_url"]
+            message = {"role": "user", "content": text}
+            if urls:
+                message["image_url"] = urls[0]
+                if m.get("description"):
+                    message["description"] = m["description"]
+            record["messages"].append(message)
+
+        elif m["role"] in ["user", "assistant"]:
+            record["messages"].append({"role": m["role"], "content": content})
+        i += 1
+
+    return record
+
+
+class ProjectionCache:
+    """
+    Memoriza una vista derivada de los mensajes de cada conversación. Solo se
+    convierten los mensajes añadidos desde la última consulta; si el historial
+    cambia por otra vía, la vista se recalcula entera. Se guardan como máximo
+    max_size conversaciones y se descarta la usada hace más tiempo.
+    """
+
+    def __init__(
+        self,
+        project: Callable[[List[dict], int], List[dict]],
+        max_size: int = PROJECTION_CACHE_SIZE,
+    ):
+        """
+        Args:
+            project: Función (mensajes, índice inicial) -> mensajes de la vista.
+            max_size: Número máximo de conversaciones memorizadas.
+        """
+        self.project = project
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, messages: List[dict]) -> List[dict]:
+        """
+        Devuelve la vista de los mensajes indicados.
+
+        Args:
+            key: Clave de la conversación.
+            messages: Mensajes canónicos actuales.
+
+        Returns:
+            Lista con la vista derivada (no debe modificarse).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry["count"] <= len(messages)
+                and (entry["count"] == 0 or messages[entry["count"] - 1] == entry["last_message"])
+            ):
+                if entry["count"] < len(messages):
+                    entry["view"].extend(self.project(messages, entry["count"]))
+            else:
+                entry = {"view": self.project(messages, 0)}
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            entry["count"] = len(messages)
+            entry["last_message"] = messages[-1] if messages else None
+            return entry["view"]
+
+    def forget(self, key: Hashable) -> None:
+        """Elimina la vista guardada de una conversación."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+# Vista del frontend memorizada por conversación
+frontend_views = ProjectionCache(frontend_view)
+
+
+def get_frontend_messages(conversation_id: int, messages: List[dict]) -> List[dict]:
+    """Devuelve la vista del frontend de la conversación, calculada de forma incremental."""
+    return frontend_views.get(conversation_id, messages)
@@ -0,0 +1,2130 @@
+import os
+import gzip
+import json
+import time
+import sqlite3
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import heapq
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pytz
+from dotenv import load_dotenv
+
+from herramientas.file_lock import (
+    atomic_write_json,
+    atomic_write_text,
+    file_lock,
+    lock_path_for,
+)
+from herramientas.sharding import (
+    iter_flat_files,
+    iter_sharded_files,
+    reshard,
+    sharded_path,
+)
+from app.services.conversation_record import (
+    apply_header,
+    legacy_openai_view,
+    frontend_view,
+    message_text,
+    new_record,
+    record_from_legacy,
+    record_header,
+    record_metadata,
+)
+from app.services.search_index import (
+    HIGHLIGHT_CLOSE,
+    HIGHLIGHT_OPEN,
+    SNIPPET_ELLIPSIS,
+    SNIPPET_WORDS,
+    InvertedIndex,
+    fts_query,
+)
+
+# Configurar logger
+logger = logging.getLogger("conversation_store")
+logger.setLevel(logging.INFO)
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Backend de almacenamiento de las conversaciones: "sqlite", "jsonl" (archivos con
+# registro de solo anexado) o "json" (formato anterior). Si la base SQLite está vacía
+# y hay chats en formato JSON, se importan al arrancar (ver migrate_legacy_json)
+CHAT_STORE_BACKEND = os.getenv("CHAT_STORE_BACKEND", "sqlite").lower()
+# Base de datos del backend SQLite
+CHAT_STORE_PATH = os.getenv("CHAT_STORE_PATH", "app/chats.db")
+# Segundos que una escritura SQLite espera si otro proceso tiene la base bloqueada
+CHAT_STORE_BUSY_TIMEOUT = float(os.getenv("CHAT_STORE_BUSY_TIMEOUT", 30))
+
+# Directorios del backend JSON. En este backend y en el JSONL los archivos de cada
+# conversación se reparten en subdirectorios por el hash de su ID (ver
+# herramientas/sharding.py)
+OPENAI_CHATS_DIR = Path("app/chats-openai")
+FRONTEND_CHATS_DIR = Path("app/chats-frontend")
+
+# Directorio del backend JSONL y número de entradas del registro tras el que se compacta
+CHAT_LOG_DIR = Path(os.getenv("CHAT_LOG_DIR", "app/chats-log"))
+CHAT_LOG_COMPACT_EVERY = int(os.getenv("CHAT_LOG_COMPACT_EVERY", 50))
+CHAT_LOG_FSYNC = os.getenv("CHAT_LOG_FSYNC", "True").lower() == "true"
+
+# Caché en memoria de las conversaciones activas con escritura diferida: número máximo
+# de conversaciones, segundos sin uso tras los que se expulsan y segundos entre volcados.
+# La caché es propia de cada proceso y un worker no vería las escrituras de los demás,
+# así que solo se activa de forma explícita y con un único worker (no se puede saber
+# con fiabilidad cuántos hay: "uvicorn --workers" no define WEB_CONCURRENCY).
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "False").lower() == "true"
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", 256))
+CHAT_CACHE_IDLE_SECONDS = float(os.getenv("CHAT_CACHE_IDLE_SECONDS", 900))
+CHAT_CACHE_FLUSH_INTERVAL = float(os.getenv("CHAT_CACHE_FLUSH_INTERVAL", 1.0))
+
+# Archivo comprimido de las conversaciones inactivas: días sin mensajes tras los que
+# se archivan, segundos entre pasadas del archivador, tamaño máximo de cada segmento
+# y nivel de compresión gzip
+CHAT_ARCHIVE_ENABLED = os.getenv("CHAT_ARCHIVE_ENABLED", "False").lower() == "true"
+CHAT_ARCHIVE_DIR = Path(os.getenv("CHAT_ARCHIVE_DIR", "app/chats-archive"))
+CHAT_ARCHIVE_IDLE_DAYS = float(os.getenv("CHAT_ARCHIVE_IDLE_DAYS", 30))
+CHAT_ARCHIVE_INTERVAL = float(os.getenv("CHAT_ARCHIVE_INTERVAL", 3600))
+CHAT_ARCHIVE_SEGMENT_BYTES = int(os.getenv("CHAT_ARCHIVE_SEGMENT_BYTES", 64 * 1024 * 1024))
+CHAT_ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("CHAT_ARCHIVE_COMPRESSION_LEVEL", 6))
+
+# Tamaño del registro de cambios compartido de los backends de archivos a partir del
+# cual se rota (los workers que no lo hayan leído entero reconstruyen sus índices)
+CHAT_CHANGES_MAX_BYTES = int(os.getenv("CHAT_CHANGES_MAX_BYTES", 8 * 1024 * 1024))
+
+# Directorio de los bloqueos de turno de las conversaciones
+CHAT_LOCK_DIR = os.getenv("CHAT_LOCK_DIR", "app/chats-locks")
+
+# Las fechas de las conversaciones se guardan en la hora de Perú
+CHAT_TIMEZONE = pytz.timezone("America/Lima")
+
+
+def turn_lock_path(conversation_id: int) -> str:
+    """
+    Ruta del bloqueo de turno de una conversación: mientras se tiene, ningún otro
+    proceso procesa un mensaje de la conversación ni la archiva.
+    """
+    return str(sharded_path(CHAT_LOCK_DIR, conversation_id, f"turn-{conversation_id}.lock"))
+
+
+def has_unsharded_files(directory: Path) -> bool:
+    """
+    Indica si quedan conversaciones en la raíz de un directorio, con la organización
+    anterior al reparto en subdirectorios (ver reorganizar_almacenamiento.py).
+    """
+    return any(
+        entry.name.split(".", 1)[0].isdigit() for entry in iter_flat_files(directory)
+    )
+
+
+class ConversationStore(ABC):
+    """
+    Interfaz de almacenamiento de conversaciones. Cada conversación se guarda como
+    un único registro canónico (ver app/services/conversation_record.py); las vistas
+    del modelo y del frontend se derivan de él.
+    """
+
+    @abstractmethod
+    def exists(self, conversation_id: int) -> bool:
+        """Indica si la conversación existe."""
+
+    @abstractmethod
+    def create(self, conversation_id: int, title: str, created_at: str) -> None:
+        """Crea una conversación vacía."""
+
+    @abstractmethod
+    def load(self, conversation_id: int) -> Optional[dict]:
+        """
+        Carga una conversación.
+
+        Returns:
+            Registro canónico de la conversación, o None si no existe.
+        """
+
+    @abstractmethod
+    def append(self, conversation_id: int, header: dict, messages: List[dict]) -> None:
+        """
+        Añade mensajes a una conversación (creándola si no existe) y actualiza su cabecera.
+
+        Args:
+            conversation_id: ID de la conversación.
+            header: Título, fecha de creación y, opcionalmente, resumen ("summary").
+            messages: Mensajes canónicos nuevos.
+        """
+
+    @abstractmethod
+    def set_title(self, conversation_id: int, title: str) -> bool:
+        """Cambia el título. Devuelve False si la conversación no existe."""
+
+    @abstractmethod
+    def delete(self, conversation_id: int) -> bool:
+        """Elimina una conversación. Devuelve False si no existía."""
+
+    @abstractmethod
+    def conversation_ids(self) -> List[int]:
+        """Devuelve los IDs de todas las conversaciones guardadas."""
+
+    def iter_conversations(self) -> Iterator[dict]:
+        """
+        Recorre las conversaciones de una en una, sin cargarlas todas en memoria.
+
+        Yields:
+            Registros canónicos de las conversaciones.
+        """
+        for conversation_id in self.conversation_ids():
+            try:
+                record = self.load(conversation_id)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning(
+                    f"No se pudo leer la conversación {conversation_id}: {str(e)}"
+                )
+                continue
+            if record is not None:
+                yield record
+
+    def list_metadata(
+        self, cursor: Optional[int] = None, limit: int = 50
+    ) -> Tuple[List[dict], Optional[int]]:
+        """
+        Devuelve una página de metadatos de conversaciones, de la más reciente (ID
+        mayor) a la más antigua.
+
+        Args:
+            cursor: Devolver solo conversaciones con ID menor que este valor.
+            limit: Número máximo de conversaciones de la página.
+
+        Returns:
+            Tupla (metadatos, cursor de la página siguiente o None si no hay más).
+        """
+        with self._lock:
+            self._sync_version()
+            index = self._get_index()
+            ids = heapq.nlargest(
+                limit + 1, (i for i in index if cursor is None or i < cursor)
+            )
+            page = [dict(index[i]) for i in ids[:limit]]
+        next_cursor = page[-1]["id"] if len(ids) > limit else None
+        return page, next_cursor
+
+    def get_metadata(self, conversation_id: int) -> Optional[dict]:
+        """Devuelve los metadatos de una conversación, o None si no existe."""
+        with self._lock:
+            self._sync_version()
+            metadata = self._get_index().get(conversation_id)
+        return dict(metadata) if metadata else None
+
+    def changes_since(self, version: int) -> Tuple[int, List[Tuple[dict, int]], List[dict]]:
+        """
+        Devuelve los cambios posteriores a una versión. Cada escritura (nueva
+        conversación, mensajes, título o borrado) recibe una versión global creciente.
+
+        Args:
+            version: Última versión conocida por el cliente (0 o menos para todo).
+
+        Returns:
+            Tupla (versión actual, lista de (registro, número de mensajes anteriores
+            a la versión) de las conversaciones creadas o modificadas, marcas de
+            borrado {"id", "version"} de las conversaciones eliminadas).
+        """
+        with self._lock:
+            self._sync_version()
+            current = {
+                conversation_id: metadata["version"]
+                for conversation_id, metadata in self._get_index().items()
+                if version <= 0 or metadata["version"] > version
+            }
+
+            conversations = []
+            for conversation_id in sorted(current):
+                loaded = self._load_versioned(conversation_id)
+                if loaded is None:
+                    continue
+                record, message_versions = loaded
+                offset = bisect_right(message_versions, version) if version > 0 else 0
+                conversations.append((record, offset))
+
+            deleted = []
+            if version > 0:
+                for conversation_id, deleted_version in self._read_tombstones().items():
+                    # Una conversación recreada después del borrado no se marca como eliminada
+                    if deleted_version > version and current.get(conversation_id, 0) < deleted_version:
+                        deleted.append({"id": conversation_id, "version": deleted_version})
+            return self._version, conversations, deleted
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[List[dict], Optional[int]]:
+        """
+        Busca mensajes por su texto, ordenados por relevancia (BM25). Todas las
+        palabras de la consulta deben aparecer; la última se busca como prefijo.
+
+        Args:
+            query: Texto de la consulta.
+            limit: Número máximo de resultados.
+            offset: Número de resultados a saltar (paginación).
+
+        Returns:
+            Tupla (resultados con "id" y "title" de la conversación, "seq" y "role" del
+            mensaje, "snippet" con los términos marcados y "score"; posición de la
+            página siguiente o None si no hay más).
+        """
+        with self._lock:
+            self._sync_version()
+            index = self._get_index()
+            if self._search_index is None:
+                # Se construye en la primera búsqueda y se mantiene con cada escritura
+                search_index = InvertedIndex()
+                for record in self.iter_conversations():
+                    # Los metadatos se toman de la misma lectura, por si la
+                    # conversación ha cambiado desde que se construyó su índice
+                    index[record["id"]] = record_metadata(record)
+                    for seq, message in enumerate(record["messages"]):
+                        search_index.add(
+                            record["id"], seq, message["role"], message_text(message)
+                        )
+                self._search_index = search_index
+            results, next_offset = self._search_index.search(query, limit, offset)
+            results = [
+                {"id": r["id"], "title": index[r["id"]]["title"], **r} for r in results
+            ]
+        return results, next_offset
+
+    # Estado compartido de los backends de archivos, que implementan además
+    # _load_versioned (la conversación y la versión de cada mensaje). Dentro del
+    # proceso todas las operaciones se hacen con self._lock (reentrante); entre
+    # procesos, cada conversación se lee y escribe con su propio bloqueo de archivo y
+    # el bloqueo del almacén solo se toma para asignar la versión de cada escritura.
+    _lock: threading.RLock
+    # Índice de metadatos en memoria: se construye la primera vez que se consulta y se
+    # mantiene al día con cada escritura, propia o de otro proceso
+    _index: Optional[Dict[int, dict]] = None
+    # Índice de búsqueda en memoria: se construye en la primera búsqueda y se
+    # mantiene igual que el de metadatos
+    _search_index: Optional[InvertedIndex] = None
+    # Mayor versión aplicada al índice (el contador compartido está en version_path)
+    # y marcas de borrado
+    _version: Optional[int] = None
+    version_path: Optional[Path] = None
+    tombstones_path: Optional[Path] = None
+    lock_dir: Optional[Path] = None
+    # Registro compartido de cambios: una línea {"version", "id", "writer"} por
+    # escritura, con versiones consecutivas. Cada proceso lee solo las líneas nuevas
+    # desde su posición (inodo y desplazamiento) y recarga esas conversaciones; un
+    # salto en las versiones indica que el registro se ha rotado.
+    changes_path: Optional[Path] = None
+    _changes_position: Optional[Tuple[int, int]] = None
+    _changes_version: int = 0
+    _writer_id: Optional[str] = None
+
+    def _get_index(self) -> Dict[int, dict]:
+        if self._index is None:
+            self._index = {
+                record["id"]: record_metadata(record)
+                for record in self.iter_conversations()
+            }
+        return self._index
+
+    def _index_append(self, conversation_id: int, header: dict, messages: List[dict]) -> None:
+        """Actualiza el índice con una escritura (si ya se ha construido)."""
+        with self._lock:
+            if self._index is None:
+                self._search_index = None
+                return
+            metadata = self._index.get(conversation_id)
+            if metadata is None:
+                metadata = record_metadata(new_record(conversation_id))
+                self._index[conversation_id] = metadata
+            if self._search_index is not None:
+                for seq, message in enumerate(messages, metadata["message_count"]):
+                    self._search_index.add(
+                        conversation_id, seq, message["role"], message_text(message)
+                    )
+            for key in ("title", "created_at", "last_message_at", "version"):
+                if header.get(key):
+                    metadata[key] = header[key]
+            if not metadata.get("last_message_at"):
+                metadata["last_message_at"] = metadata["created_at"]
+            metadata["message_count"] += len(messages)
+
+    def _index_remove(self, conversation_id: int) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.pop(conversation_id, None)
+            if self._search_index is not None:
+                self._search_index.remove_conversation(conversation_id)
+
+    def _conversation_lock(self, conversation_id: int):
+        """Bloqueo entre procesos de una conversación."""
+        return file_lock(
+            str(sharded_path(self.lock_dir, conversation_id, f"{conversation_id}.lock"))
+        )
+
+    def _write_lock(self):
+        """Bloqueo entre procesos del contador de versiones y del registro de cambios."""
+        return file_lock(str(self.lock_dir / "store.lock"))
+
+    @contextmanager
+    def _writing(self, conversation_id: int):
+        """
+        Contexto de una escritura: aplica antes los cambios de otros procesos (sin
+        tener aún ningún bloqueo de archivo, para no esperar por otra conversación
+        mientras se retiene una) y toma el bloqueo de la conversación.
+        """
+        with self._lock:
+            self._sync_version()
+            with self._conversation_lock(conversation_id):
+                yield
+
+    def _read_version_file(self) -> Optional[int]:
+        try:
+            return int(self.version_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _changes_identity(self) -> Optional[Tuple[int, int]]:
+        """Identidad (inodo) y tamaño del registro de cambios, o None si no existe."""
+        try:
+            stat = self.changes_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _reset_state(self) -> None:
+        """
+        Descarta los índices en memoria y toma la posición actual del registro de
+        cambios junto con la versión del contador (con el bloqueo del almacén, para
+        que ambas correspondan). Los índices se reconstruyen cuando se consulten.
+        """
+        with self._write_lock():
+            identity = self._changes_identity()
+            stored = self._read_version_file()
+        self._changes_position = identity
+        self._index = None
+        self._search_index = None
+        if stored is None:
+            # Datos anteriores al contador: se parte de la mayor versión guardada
+            stored = max(
+                [
+                    0,
+                    *(m["version"] for m in self._get_index().values()),
+                    *self._read_tombstones().values(),
+                ]
+            )
+        self._version = stored
+        self._changes_version = stored
+
+    def _read_changes(self) -> Optional[Dict[int, int]]:
+        """
+        Lee las líneas completas añadidas al registro de cambios desde la última
+        lectura.
+
+        Returns:
+            {ID: versión} de las conversaciones cambiadas por otros procesos, o None
+            si el registro se ha rotado y hay que reconstruir los índices.
+        """
+        identity = self._changes_identity()
+        if identity is None:
+            return {} if self._changes_position is None else None
+        inode, size = identity
+        position = self._changes_position or (inode, 0)
+        if position[0] != inode or position[1] > size:
+            return None
+        if position[1] == size:
+            return {}
+
+        with open(self.changes_path, "rb") as f:
+            f.seek(position[1])
+            data = f.read(size - position[1])
+        # Una línea sin terminar se está escribiendo: se leerá en la próxima comprobación
+        data = data[: data.rfind(b"\n") + 1]
+
+        changed = {}
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                return None
+            if entry["version"] != self._changes_version + 1:
+                return None
+            self._changes_version = entry["version"]
+            if entry.get("writer") != self._writer_id:
+                changed[entry["id"]] = entry["version"]
+        self._changes_position = (inode, position[1] + len(data))
+        self._version = max(self._version, self._changes_version)
+        return changed
+
+    def _reload_conversation(self, conversation_id: int) -> None:
+        """Actualiza los índices en memoria con una conversación cambiada por otro proceso."""
+        if self._index is None:
+            return
+        loaded = self._load_versioned(conversation_id)
+        if loaded is None:
+            self._index_remove(conversation_id)
+            return
+        record = loaded[0]
+        self._index[conversation_id] = record_metadata(record)
+        if self._search_index is not None:
+            self._search_index.remove_conversation(conversation_id)
+            for seq, message in enumerate(record["messages"]):
+                self._search_index.add(
+                    conversation_id, seq, message["role"], message_text(message)
+                )
+
+    def _sync_version(self) -> None:
+        """
+        Aplica a los índices en memoria las escrituras de otros procesos desde la
+        última comprobación, recargando solo las conversaciones anotadas en el registro
+        de cambios. Cada conversación se recarga con su bloqueo, así que nunca se ve
+        una escritura a medias. Debe llamarse con self._lock.
+        """
+        if self._version is None:
+            self._reset_state()
+            return
+        changed = self._read_changes()
+        if changed is None:
+            self._reset_state()
+            return
+        for conversation_id in changed:
+            self._reload_conversation(conversation_id)
+
+    def _next_version(self, conversation_id: int, deleted: bool = False) -> int:
+        """
+        Asigna la versión de una escritura con el contador compartido entre procesos y
+        la anota en el registro de cambios (con la marca de borrado, si es un borrado).
+        El bloqueo del almacén solo se mantiene durante esta actualización. Debe
+        llamarse dentro de _writing.
+        """
+        if self._writer_id is None:
+            self._writer_id = uuid.uuid4().hex
+        entry = {"id": conversation_id, "writer": self._writer_id}
+        with self._write_lock():
+            version = max(self._read_version_file() or 0, self._version) + 1
+            if deleted:
+                self._add_tombstone(conversation_id, version)
+            identity = self._changes_identity()
+            if identity is not None and identity[1] > CHAT_CHANGES_MAX_BYTES:
+                # Rotar el registro: los procesos que no lo hayan leído entero
+                # reconstruirán sus índices
+                atomic_write_text(str(self.changes_path), "")
+            with open(self.changes_path, "a") as f:
+                f.write(json.dumps({"version": version, **entry}) + "\n")
+            atomic_write_text(str(self.version_path), str(version))
+        self._version = max(self._version, version)
+        return version
+
+    def _read_tombstones(self) -> Dict[int, int]:
+        """Devuelve las marcas de borrado {ID: versión} guardadas."""
+        tombstones = {}
+        if self.tombstones_path is None or not self.tombstones_path.exists():
+            return tombstones
+        with open(self.tombstones_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                tombstones[entry["id"]] = entry["version"]
+        return tombstones
+
+    def _add_tombstone(self, conversation_id: int, version: int) -> None:
+        """Añade una marca de borrado al archivo de marcas (solo anexado)."""
+        with open(self.tombstones_path, "a") as f:
+            f.write(json.dumps({"id": conversation_id, "version": version}) + "\n")
+
+    def flush(self, conversation_id: Optional[int] = None) -> None:
+        """
+        Vuelca las escrituras diferidas de todas las conversaciones o de una. Solo
+        tiene efecto en los almacenes con caché.
+        """
+
+    def stats(self) -> Optional[dict]:
+        """Devuelve las métricas de la caché del almacén, o None si no tiene caché."""
+        return None
+
+    def archive_stats(self) -> Optional[dict]:
+        """Devuelve las métricas del archivo comprimido, o None si no está activado."""
+        return None
+
+    def close(self) -> None:
+        """Libera los recursos del backend."""
+
+
+class JsonConversationStore(ConversationStore):
+    """
+    Backend anterior: dos archivos JSON completos por conversación, uno en
+    formato OpenAI y otro en formato frontend. Ambos se derivan del registro
+    canónico al escribir y se combinan de nuevo en él al leer.
+    """
+
+    def __init__(
+        self, openai_dir: Path = OPENAI_CHATS_DIR, frontend_dir: Path = FRONTEND_CHATS_DIR
+    ):
+        self.openai_dir = Path(openai_dir)
+        self.frontend_dir = Path(frontend_dir)
+        self.openai_dir.mkdir(exist_ok=True)
+        self.frontend_dir.mkdir(exist_ok=True)
+        self.tombstones_path = self.frontend_dir.parent / "chats-tombstones.jsonl"
+        self.version_path = self.frontend_dir.parent / "chats-version"
+        self.changes_path = self.frontend_dir.parent / "chats-changes.jsonl"
+        self.lock_dir = self.frontend_dir.parent / "chats-locks"
+        self._lock = threading.RLock()
+        if has_unsharded_files(self.frontend_dir) or has_unsharded_files(self.openai_dir):
+            logger.warning(
+                "Hay conversaciones JSON sin repartir en subdirectorios; ejecuta "
+                "'python reorganizar_almacenamiento.py' para que vuelvan a ser visibles"
+            )
+
+    def openai_path(self, conversation_id: int) -> Path:
+        """Ruta del archivo de la conversación en formato OpenAI."""
+        return sharded_path(self.openai_dir, conversation_id, f"{conversation_id}.json")
+
+    def frontend_path(self, conversation_id: int) -> Path:
+        """Ruta del archivo de la conversación en formato frontend."""
+        return sharded_path(self.frontend_dir, conversation_id, f"{conversation_id}.json")
+
+    def exists(self, conversation_id: int) -> bool:
+        return (
+            self.openai_path(conversation_id).exists()
+            or self.frontend_path(conversation_id).exists()
+        )
+
+    def _write(self, record: dict, message_versions: List[int]) -> None:
+        """Escribe los dos archivos del formato anterior a partir del registro."""
+        openai_data = {"messages": legacy_openai_view(record["messages"])}
+        if record.get("summary"):
+            openai_data["summary"] = record["summary"]
+        frontend_data = {
+            "id": record["id"],
+            "title": record.get("title") or "",
+            "created_at": record.get("created_at") or "",
+            "messages": frontend_view(record["messages"]),
+        }
+        if record.get("last_message_at"):
+            frontend_data["last_message_at"] = record["last_message_at"]
+        frontend_data["version"] = record.get("version", 0)
+        frontend_data["message_versions"] = message_versions
+        atomic_write_json(str(self.openai_path(record["id"])), openai_data)
+        atomic_write_json(str(self.frontend_path(record["id"])), frontend_data)
+
+    def create(self, conversation_id: int, title: str, created_at: str) -> None:
+        with self._writing(conversation_id):
+            record = new_record(conversation_id, title, created_at)
+            record["version"] = self._next_version(conversation_id)
+            self._write(record, [])
+            self._index_append(
+                conversation_id,
+                {"title": title, "created_at": created_at, "version": record["version"]},
+                [],
+            )
+
+    def _load_versioned(self, conversation_id: int) -> Optional[Tuple[dict, List[int]]]:
+        """Carga una conversación junto con la versión de cada mensaje."""
+        with self._conversation_lock(conversation_id):
+            return self._read(conversation_id)
+
+    def _read(self, conversation_id: int) -> Optional[Tuple[dict, List[int]]]:
+        """Lee los dos archivos de la conversación (con su bloqueo)."""
+        if not self.exists(conversation_id):
+            return None
+
+        openai_data = {"messages": []}
+        frontend_data = {
+            "id": conversation_id,
+            "title": "Chat sin título",
+            "created_at": "",
+            "messages": [],
+        }
+
+        openai_path = self.openai_path(conversation_id)
+        if openai_path.exists():
+            with open(openai_path, "r") as f:
+                openai_data = json.load(f)
+
+        frontend_path = self.frontend_path(conversation_id)
+        if frontend_path.exists():
+            with open(frontend_path, "r") as f:
+                frontend_data = json.load(f)
+
+        record = record_from_legacy(conversation_id, openai_data, frontend_data)
+        record["version"] = frontend_data.get("version", 0)
+        message_versions = frontend_data.get("message_versions")
+        if message_versions is None or len(message_versions) != len(record["messages"]):
+            # Archivos anteriores a las versiones: todos los mensajes toman la de la conversación
+            message_versions = [record["version"]] * len(record["messages"])
+        return record, message_versions
+
+    def load(self, conversation_id: int) -> Optional[dict]:
+        loaded = self._load_versioned(conversation_id)
+        return loaded[0] if loaded else None
+
+    def append(self, conversation_id: int, header: dict, messages: List[dict]) -> None:
+        with self._writing(conversation_id):
+            # En este formato cada escritura reescribe los dos archivos completos
+            record, message_versions = self._read(conversation_id) or (
+                new_record(conversation_id),
+                [],
+            )
+            apply_header(record, header)
+            record["version"] = self._next_version(conversation_id)
+            record["messages"].extend(messages)
+            message_versions.extend([record["version"]] * len(messages))
+            self._write(record, message_versions)
+            self._index_append(
+                conversation_id, {**header, "version": record["version"]}, messages
+            )
+
+    def set_title(self, conversation_id: int, title: str) -> bool:
+        with self._writing(conversation_id):
+            loaded = self._read(conversation_id)
+            if loaded is None:
+                return False
+            record, message_versions = loaded
+            record["title"] = title
+            record["version"] = self._next_version(conversation_id)
+            self._write(record, message_versions)
+            self._index_append(
+                conversation_id, {"title": title, "version": record["version"]}, []
+            )
+        return True
+
+    def delete(self, conversation_id: int) -> bool:
+        with self._writing(conversation_id):
+            self._index_remove(conversation_id)
+            deleted = False
+            for path in (self.openai_path(conversation_id), self.frontend_path(conversation_id)):
+                if path.exists():
+                    path.unlink()
+                    deleted = True
+            if deleted:
+                self._next_version(conversation_id, deleted=True)
+        return deleted
+
+    def conversation_ids(self) -> List[int]:
+        ids = set()
+        for directory in (self.frontend_dir, self.openai_dir):
+            for entry in iter_sharded_files(directory):
+                stem, _, extension = entry.name.rpartition(".")
+                if extension == "json" and stem.isdigit():
+                    ids.add(int(stem))
+        return sorted(ids)
+
+
+class JsonlConversationStore(ConversationStore):
+    """
+    Backend de archivos con registro de solo anexado: cada conversación tiene una
+    instantánea JSON y un registro JSONL con los cambios posteriores. Cada turno
+    añade una sola línea (con fsync), de modo que el coste de escritura no depende
+    de la longitud de la conversación. El registro se compacta periódicamente en
+    la instantánea.
+    """
+
+    def __init__(
+        self,
+        directory: Path = CHAT_LOG_DIR,
+        compact_every: int = CHAT_LOG_COMPACT_EVERY,
+        fsync: bool = CHAT_LOG_FSYNC,
+    ):
+        """
+        Inicializa el almacén.
+
+        Args:
+            directory: Directorio de instantáneas y registros.
+            compact_every: Número de entradas del registro tras el que se compacta.
+            fsync: Forzar la escritura a disco de cada entrada.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.tombstones_path = self.directory / "tombstones.jsonl"
+        self.version_path = self.directory / "version"
+        self.changes_path = self.directory / "changes.jsonl"
+        self.lock_dir = self.directory / "locks"
+        self._lock = threading.RLock()
+        # Última secuencia escrita, entradas pendientes de compactar y estado de los
+        # archivos (para detectar escrituras de otros procesos) por conversación
+        self._log_state: Dict[int, dict] = {}
+        if has_unsharded_files(self.directory):
+            logger.warning(
+                "Hay conversaciones JSONL sin repartir en subdirectorios; ejecuta "
+                "'python reorganizar_almacenamiento.py' para que vuelvan a ser visibles"
+            )
+
+    def snapshot_path(self, conversation_id: int) -> Path:
+        """Ruta de la instantánea de la conversación."""
+        return sharded_path(
+            self.directory, conversation_id, f"{conversation_id}.snapshot.json"
+        )
+
+    def log_path(self, conversation_id: int) -> Path:
+        """Ruta del registro de cambios de la conversación."""
+        return sharded_path(self.directory, conversation_id, f"{conversation_id}.log.jsonl")
+
+    def exists(self, conversation_id: int) -> bool:
+        return (
+            self.snapshot_path(conversation_id).exists()
+            or self.log_path(conversation_id).exists()
+        )
+
+    @staticmethod
+    def _apply(record: dict, entry: dict) -> None:
+        """Aplica una entrada del registro de cambios a la conversación."""
+        apply_header(record, entry.get("header") or {})
+        messages = entry.get("messages", [])
+        version = entry.get("version", record.get("version", 0))
+        record["messages"].extend(messages)
+        record["message_versions"].extend([version] * len(messages))
+        record["version"] = version
+        record["seq"] = entry["seq"]
+
+    def _replay(self, conversation_id: int) -> Optional[dict]:
+        """
+        Reconstruye la conversación a partir de la instantánea y del registro.
+        Las entradas ya incluidas en la instantánea y una última línea incompleta
+        (escritura interrumpida) se ignoran.
+        """
+        snapshot_path = self.snapshot_path(conversation_id)
+        log_path = self.log_path(conversation_id)
+        if not snapshot_path.exists() and not log_path.exists():
+            return None
+
+        record = new_record(conversation_id)
+        record["seq"] = 0
+        if snapshot_path.exists():
+            with open(snapshot_path, "r") as f:
+                record = json.load(f)
+        # Versión de cada mensaje (las instantáneas anteriores no la guardan)
+        record.setdefault(
+            "message_versions", [record.get("version", 0)] * len(record["messages"])
+        )
+
+        pending = 0
+        if log_path.exists():
+            with open(log_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(
+                            f"Entrada incompleta ignorada en el registro de la conversación {conversation_id}"
+                        )
+                        continue
+                    if entry["seq"] <= record["seq"]:
+                        continue
+                    self._apply(record, entry)
+                    pending += 1
+
+        self._log_state[conversation_id] = {
+            "seq": record["seq"],
+            "pending": pending,
+            "stamp": self._stamp(conversation_id),
+        }
+        return record
+
+    def _stamp(self, conversation_id: int) -> tuple:
+        """
+        Estado de los archivos de la conversación (tamaño del registro e identidad de
+        la instantánea). Si cambia sin pasar por este proceso, otro proceso ha escrito.
+        """
+        stamp = []
+        for path in (self.log_path(conversation_id), self.snapshot_path(conversation_id)):
+            try:
+                stat = path.stat()
+                stamp.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _write_entry(self, conversation_id: int, entry: dict) -> None:
+        """Añade una entrada al registro con una única escritura y compacta si toca."""
+        state = self._log_state.get(conversation_id)
+        if state is None or state["stamp"] != self._stamp(conversation_id):
+            self._replay(conversation_id)
+            state = self._log_state.setdefault(
+                conversation_id, {"seq": 0, "pending": 0, "stamp": None}
+            )
+
+        entry["seq"] = state["seq"] + 1
+        data = (json.dumps(entry) + "\n").encode("utf-8")
+
+        log_path = self.log_path(conversation_id)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # Si la última escritura quedó cortada, empezar en una línea nueva
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                data = b"\n" + data
+            os.write(fd, data)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        state["seq"] = entry["seq"]
+        state["pending"] += 1
+        state["stamp"] = self._stamp(conversation_id)
+        if state["pending"] >= self.compact_every:
+            self._compact(conversation_id)
+
+    def _compact(self, conversation_id: int) -> None:
+        """
+        Escribe la instantánea de forma atómica y vacía el registro. Si el proceso se
+        interrumpe entre ambos pasos, la secuencia guardada en la instantánea evita
+        aplicar dos veces las mismas entradas.
+        """
+        record = self._replay(conversation_id)
+        if record is None:
+            return
+        atomic_write_json(str(self.snapshot_path(conversation_id)), record)
+        self.log_path(conversation_id).unlink(missing_ok=True)
+        self._log_state[conversation_id] = {
+            "seq": record["seq"],
+            "pending": 0,
+            "stamp": self._stamp(conversation_id),
+        }
+
+    def create(self, conversation_id: int, title: str, created_at: str) -> None:
+        with self._writing(conversation_id):
+            header = {"title": title, "created_at": created_at}
+            version = self._next_version(conversation_id)
+            self._write_entry(conversation_id, {"header": header, "version": version})
+            self._index_append(conversation_id, {**header, "version": version}, [])
+
+    def _load_versioned(self, conversation_id: int) -> Optional[Tuple[dict, List[int]]]:
+        """Carga una conversación junto con la versión de cada mensaje."""
+        with self._lock, self._conversation_lock(conversation_id):
+            record = self._replay(conversation_id)
+        if record is None:
+            return None
+        record.pop("seq", None)
+        return record, record.pop("message_versions")
+
+    def load(self, conversation_id: int) -> Optional[dict]:
+        loaded = self._load_versioned(conversation_id)
+        return loaded[0] if loaded else None
+
+    def append(self, conversation_id: int, header: dict, messages: List[dict]) -> None:
+        with self._writing(conversation_id):
+            version = self._next_version(conversation_id)
+            self._write_entry(
+                conversation_id, {"header": header, "messages": messages, "version": version}
+            )
+            self._index_append(conversation_id, {**header, "version": version}, messages)
+
+    def set_title(self, conversation_id: int, title: str) -> bool:
+        with self._writing(conversation_id):
+            if not self.exists(conversation_id):
+                return False
+            version = self._next_version(conversation_id)
+            self._write_entry(
+                conversation_id, {"header": {"title": title}, "version": version}
+            )
+            self._index_append(conversation_id, {"title": title, "version": version}, [])
+        return True
+
+    def delete(self, conversation_id: int) -> bool:
+        with self._writing(conversation_id):
+            self._index_remove(conversation_id)
+            self._log_state.pop(conversation_id, None)
+            deleted = False
+            for path in (self.snapshot_path(conversation_id), self.log_path(conversation_id)):
+                if path.exists():
+                    path.unlink()
+                    deleted = True
+            if deleted:
+                self._next_version(conversation_id, deleted=True)
+        return deleted
+
+    def conversation_ids(self) -> List[int]:
+        ids = set()
+        for entry in iter_sharded_files(self.directory):
+            name = entry.name.split(".", 1)[0]
+            if name.isdigit():
+                ids.add(int(name))
+        return sorted(ids)
+
+
+class SqliteConversationStore(ConversationStore):
+    """
+    Backend SQLite en modo WAL. Los mensajes canónicos se guardan fila a fila,
+    indexados por conversación y secuencia, de modo que añadir un turno no reescribe
+    el resto de la conversación.
+    """
+
+    CONVERSATIONS_TABLE = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL DEFAULT '',
+            created_at TEXT NOT NULL DEFAULT '',
+            summary TEXT,
+            last_message_at TEXT,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    MESSAGES_TABLE = """
+        CREATE TABLE IF NOT EXISTS messages (
+            conversation_id INTEGER NOT NULL
+                REFERENCES conversations(id) ON DELETE CASCADE,
+            seq INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (conversation_id, seq)
+        ) WITHOUT ROWID
+    """
+    # Índice de búsqueda de texto completo: una fila por mensaje con texto. Las
+    # palabras se comparan sin mayúsculas ni tildes.
+    SEARCH_TABLE = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            text,
+            conversation_id UNINDEXED,
+            seq UNINDEXED,
+            role UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """
+    TOMBSTONES_TABLE = """
+        CREATE TABLE IF NOT EXISTS tombstones (
+            id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """
+
+    def __init__(self, path: str = CHAT_STORE_PATH):
+        """
+        Abre (o crea) la base de datos.
+
+        Args:
+            path: Ruta del archivo SQLite.
+        """
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=CHAT_STORE_BUSY_TIMEOUT,
+        )
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        # Con varios workers, solo uno a la vez crea el esquema
+        with file_lock(lock_path_for(path)):
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(self.CONVERSATIONS_TABLE)
+            self._conn.execute(self.MESSAGES_TABLE)
+            self._conn.execute(self.TOMBSTONES_TABLE)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS conversations_version ON conversations(version)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS tombstones_version ON tombstones(version)"
+            )
+            self.search_enabled = self._create_search_index()
+
+    def _create_search_index(self) -> bool:
+        """
+        Crea el índice de búsqueda (FTS5) e indexa los mensajes existentes si la
+        tabla es nueva.
+
+        Returns:
+            False si SQLite no incluye FTS5 (la búsqueda queda desactivada).
+        """
+        if self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+        ).fetchone():
+            return True
+        try:
+            self._conn.execute(self.SEARCH_TABLE)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Búsqueda de conversaciones desactivada, SQLite sin FTS5: {str(e)}")
+            return False
+
+        logger.info("Indexando los mensajes guardados para la búsqueda")
+
+        def statements(conn):
+            rows = conn.execute("SELECT conversation_id, seq, message FROM messages")
+            self._index_messages(
+                conn,
+                ((conversation_id, seq, json.loads(message)) for conversation_id, seq, message in rows),
+            )
+
+        self._write(statements)
+        return True
+
+    @staticmethod
+    def _index_messages(conn, messages) -> None:
+        """Añade mensajes (conversación, secuencia, mensaje) al índice de búsqueda."""
+        conn.executemany(
+            "INSERT INTO messages_fts (text, conversation_id, seq, role) VALUES (?, ?, ?, ?)",
+            (
+                (message_text(message), conversation_id, seq, message["role"])
+                for conversation_id, seq, message in messages
+                if message_text(message)
+            ),
+        )
+
+    @staticmethod
+    def _next_version(conn) -> int:
+        """
+        Asigna la versión de una escritura: la mayor guardada más uno. Se llama
+        dentro de la transacción de escritura, que serializa a los escritores.
+        """
+        return conn.execute(
+            """
+            SELECT MAX(COALESCE((SELECT MAX(version) FROM conversations), 0),
+                       COALESCE((SELECT MAX(version) FROM tombstones), 0)) + 1
+            """
+        ).fetchone()[0]
+
+    def _write(self, statements):
+        """Ejecuta una función de escritura dentro de una transacción y devuelve su resultado."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def exists(self, conversation_id: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row is not None
+
+    def is_empty(self) -> bool:
+        """Indica si la base de datos no tiene conversaciones."""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM conversations LIMIT 1").fetchone()
+        return row is None
+
+    def create(self, conversation_id: int, title: str, created_at: str) -> None:
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT OR IGNORE INTO conversations (id, title, created_at, version) VALUES (?, ?, ?, ?)",
+                (conversation_id, title, created_at, self._next_version(conn)),
+            )
+        )
+
+    def _load(self, conversation_id: int) -> Optional[dict]:
+        """Lee una conversación. Debe llamarse con el cerrojo de la conexión."""
+        row = self._conn.execute(
+            "SELECT title, created_at, last_message_at, summary, version FROM conversations WHERE id = ?",
+            (conversation_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        rows = self._conn.execute(
+            "SELECT message FROM messages WHERE conversation_id = ? ORDER BY seq",
+            (conversation_id,),
+        ).fetchall()
+
+        title, created_at, last_message_at, summary, version = row
+        record = new_record(conversation_id, title, created_at)
+        record["messages"] = [json.loads(message) for (message,) in rows]
+        record["version"] = version
+        if last_message_at:
+            record["last_message_at"] = last_message_at
+        if summary:
+            record["summary"] = json.loads(summary)
+        return record
+
+    def load(self, conversation_id: int) -> Optional[dict]:
+        with self._lock:
+            return self._load(conversation_id)
+
+    def append(self, conversation_id: int, header: dict, messages: List[dict]) -> None:
+        summary = header.get("summary")
+
+        def statements(conn):
+            version = self._next_version(conn)
+            conn.execute(
+                """
+                INSERT INTO conversations
+                    (id, title, created_at, summary, last_message_at, message_count, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    title = excluded.title,
+                    created_at = excluded.created_at,
+                    summary = COALESCE(excluded.summary, conversations.summary),
+                    last_message_at = COALESCE(
+                        excluded.last_message_at, conversations.last_message_at
+                    ),
+                    message_count = conversations.message_count + excluded.message_count,
+                    version = excluded.version
+                """,
+                (
+                    conversation_id,
+                    header.get("title") or "",
+                    header.get("created_at") or "",
+                    json.dumps(summary) if summary else None,
+                    header.get("last_message_at"),
+                    len(messages),
+                    version,
+                ),
+            )
+            if not messages:
+                return
+            # MAX(seq) se resuelve con la clave primaria, sin recorrer la conversación
+            next_seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM messages WHERE conversation_id = ?",
+                (conversation_id,),
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO messages (conversation_id, seq, message, version) VALUES (?, ?, ?, ?)",
+                [
+                    (conversation_id, next_seq + i, json.dumps(message), version)
+                    for i, message in enumerate(messages)
+                ],
+            )
+            if self.search_enabled:
+                self._index_messages(
+                    conn,
+                    (
+                        (conversation_id, next_seq + i, message)
+                        for i, message in enumerate(messages)
+                    ),
+                )
+
+        self._write(statements)
+
+    def set_title(self, conversation_id: int, title: str) -> bool:
+        updated = self._write(
+            lambda conn: conn.execute(
+                "UPDATE conversations SET title = ?, version = ? WHERE id = ?",
+                (title, self._next_version(conn), conversation_id),
+            ).rowcount
+        )
+        return bool(updated)
+
+    def delete(self, conversation_id: int) -> bool:
+        def statements(conn):
+            version = self._next_version(conn)
+            deleted = conn.execute(
+                "DELETE FROM conversations WHERE id = ?", (conversation_id,)
+            ).rowcount
+            if deleted:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tombstones (id, version) VALUES (?, ?)",
+                    (conversation_id, version),
+                )
+                if self.search_enabled:
+                    conn.execute(
+                        "DELETE FROM messages_fts WHERE conversation_id = ?",
+                        (conversation_id,),
+                    )
+            return deleted
+
+        return bool(self._write(statements))
+
+    def changes_since(self, version: int) -> Tuple[int, List[Tuple[dict, int]], List[dict]]:
+        with self._lock:
+            # Una transacción de lectura da una vista coherente aunque otro proceso escriba
+            self._conn.execute("BEGIN")
+            try:
+                current = self._next_version(self._conn) - 1
+                if version > 0:
+                    ids = self._conn.execute(
+                        "SELECT id FROM conversations WHERE version > ? ORDER BY id",
+                        (version,),
+                    ).fetchall()
+                else:
+                    ids = self._conn.execute(
+                        "SELECT id FROM conversations ORDER BY id"
+                    ).fetchall()
+
+                conversations = []
+                for (conversation_id,) in ids:
+                    record = self._load(conversation_id)
+                    offset = 0
+                    if version > 0:
+                        offset = self._conn.execute(
+                            "SELECT COUNT(*) FROM messages WHERE conversation_id = ? AND version <= ?",
+                            (conversation_id, version),
+                        ).fetchone()[0]
+                    conversations.append((record, offset))
+
+                deleted = []
+                if version > 0:
+                    # Una conversación recreada después del borrado no se marca como eliminada
+                    rows = self._conn.execute(
+                        """
+                        SELECT id, version FROM tombstones AS t
+                        WHERE version > ? AND NOT EXISTS (
+                            SELECT 1 FROM conversations AS c
+                            WHERE c.id = t.id AND c.version > t.version
+                        )
+                        ORDER BY id
+                        """,
+                        (version,),
+                    ).fetchall()
+                    deleted = [
+                        {"id": conversation_id, "version": deleted_version}
+                        for conversation_id, deleted_version in rows
+                    ]
+            finally:
+                self._conn.execute("COMMIT")
+        return current, conversations, deleted
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[List[dict], Optional[int]]:
+        if not self.search_enabled:
+            raise RuntimeError("La búsqueda no está disponible: SQLite no incluye FTS5")
+        match = fts_query(query)
+        if match is None:
+            return [], None
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT f.conversation_id, c.title, f.seq, f.role,
+                       snippet(messages_fts, 0, ?, ?, ?, ?), f.rank
+                FROM messages_fts AS f JOIN conversations AS c ON c.id = f.conversation_id
+                WHERE messages_fts MATCH ?
+                ORDER BY f.rank
+                LIMIT ? OFFSET ?
+                """,
+                (
+                    HIGHLIGHT_OPEN,
+                    HIGHLIGHT_CLOSE,
+                    SNIPPET_ELLIPSIS,
+                    SNIPPET_WORDS,
+                    match,
+                    limit + 1,
+                    offset,
+                ),
+            ).fetchall()
+        results = [
+            {
+                "id": conversation_id,
+                "title": title or "Chat sin título",
+                "seq": seq,
+                "role": role,
+                "snippet": text,
+                # bm25() devuelve valores negativos: cuanto menor, más relevante
+                "score": round(-rank, 4),
+            }
+            for conversation_id, title, seq, role, text, rank in rows[:limit]
+        ]
+        next_offset = offset + limit if len(rows) > limit else None
+        return results, next_offset
+
+    def conversation_ids(self) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM conversations ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    METADATA_COLUMNS = "id, title, created_at, last_message_at, message_count, version"
+
+    @staticmethod
+    def _metadata_row(row: tuple) -> dict:
+        conversation_id, title, created_at, last_message_at, message_count, version = row
+        return {
+            "id": conversation_id,
+            "title": title or "Chat sin título",
+            "created_at": created_at or "Fecha desconocida",
+            "last_message_at": last_message_at or created_at,
+            "message_count": message_count,
+            "version": version,
+        }
+
+    def list_metadata(
+        self, cursor: Optional[int] = None, limit: int = 50
+    ) -> Tuple[List[dict], Optional[int]]:
+        # La clave primaria permite recorrer las páginas sin ordenar la tabla
+        if cursor is None:
+            query = f"SELECT {self.METADATA_COLUMNS} FROM conversations ORDER BY id DESC LIMIT ?"
+            params = (limit + 1,)
+        else:
+            query = f"SELECT {self.METADATA_COLUMNS} FROM conversations WHERE id < ? ORDER BY id DESC LIMIT ?"
+            params = (cursor, limit + 1)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        page = [self._metadata_row(row) for row in rows[:limit]]
+        next_cursor = page[-1]["id"] if len(rows) > limit else None
+        return page, next_cursor
+
+    def get_metadata(self, conversation_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.METADATA_COLUMNS} FROM conversations WHERE id = ?",
+                (conversation_id,),
+            ).fetchone()
+        return self._metadata_row(row) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedConversationStore(ConversationStore):
+    """
+    Caché LRU de las conversaciones activas sobre otro almacén, con escritura
+    diferida. Una conversación en caché se lee sin tocar el disco y sus escrituras
+    se acumulan en memoria; un hilo las vuelca al almacén cada flush_interval
+    segundos, con una sola escritura por conversación para todos sus turnos
+    pendientes. Las conversaciones sin uso durante idle_seconds, o las menos usadas
+    cuando se supera max_size, se expulsan una vez volcadas. Al cerrar se vuelcan
+    las escrituras pendientes.
+    """
+
+    def __init__(
+        self,
+        backend: ConversationStore,
+        max_size: int = CHAT_CACHE_SIZE,
+        idle_seconds: float = CHAT_CACHE_IDLE_SECONDS,
+        flush_interval: float = CHAT_CACHE_FLUSH_INTERVAL,
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            backend: Almacén en el que se guardan las conversaciones.
+            max_size: Número máximo de conversaciones en caché.
+            idle_seconds: Segundos sin uso tras los que se expulsa una conversación.
+            flush_interval: Segundos entre volcados (0 o menos para escribir en cada cambio).
+        """
+        self.backend = backend
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval
+        # Por conversación: registro, mensajes pendientes de volcar y último uso
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+        self.flushed_writes = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, name="conversation-cache-flush", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Bucle del hilo de volcado."""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self._evict_idle()
+            except Exception as e:
+                logger.error(f"Error al volcar las conversaciones en caché: {str(e)}")
+
+    @staticmethod
+    def _copy(record: dict) -> dict:
+        """Copia el registro para que el llamador no modifique el de la caché."""
+        copy = dict(record)
+        copy["messages"] = [dict(m) for m in record["messages"]]
+        return copy
+
+    def _get_entry(self, conversation_id: int) -> Optional[dict]:
+        """
+        Devuelve la entrada de la conversación, cargándola del almacén si no está en
+        caché. Debe llamarse con self._lock.
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is not None:
+            self.hits += 1
+            entry["last_access"] = time.monotonic()
+            self._entries.move_to_end(conversation_id)
+            return entry
+
+        self.misses += 1
+        record = self.backend.load(conversation_id)
+        if record is None:
+            return None
+        return self._add_entry(record)
+
+    def _add_entry(self, record: dict) -> dict:
+        """Añade un registro a la caché. Debe llamarse con self._lock."""
+        entry = {
+            "record": record,
+            "pending": [],
+            "dirty": False,
+            "last_access": time.monotonic(),
+        }
+        self._entries[record["id"]] = entry
+        self._evict_overflow()
+        return entry
+
+    def _mark_dirty(self, entry: dict) -> None:
+        entry["dirty"] = True
+        self.writes += 1
+
+    def _evict_overflow(self) -> None:
+        """
+        Expulsa las conversaciones menos usadas que ya están volcadas mientras se
+        supere max_size. Debe llamarse con self._lock.
+        """
+        if len(self._entries) <= self.max_size:
+            return
+        for conversation_id in list(self._entries):
+            if len(self._entries) <= self.max_size:
+                break
+            if not self._entries[conversation_id]["dirty"]:
+                del self._entries[conversation_id]
+                self.evictions += 1
+
+    def _evict_idle(self) -> None:
+        """Expulsa las conversaciones volcadas que llevan idle_seconds sin usarse."""
+        limit = time.monotonic() - self.idle_seconds
+        with self._lock:
+            for conversation_id in list(self._entries):
+                entry = self._entries[conversation_id]
+                if entry["last_access"] > limit:
+                    # El resto de entradas se usaron más recientemente
+                    break
+                if not entry["dirty"]:
+                    del self._entries[conversation_id]
+                    self.evictions += 1
+
+    def flush(self, conversation_id: Optional[int] = None) -> None:
+        """
+        Vuelca al almacén los cambios pendientes de todas las conversaciones o, si se
+        indica, solo los de una.
+        """
+        only = conversation_id
+        with self._flush_lock:
+            with self._lock:
+                batch = []
+                for conversation_id, entry in self._entries.items():
+                    if entry["dirty"] and only in (None, conversation_id):
+                        batch.append(
+                            (conversation_id, entry, record_header(entry["record"]), entry["pending"])
+                        )
+                        entry["pending"] = []
+                        entry["dirty"] = False
+
+            for conversation_id, entry, header, messages in batch:
+                try:
+                    self.backend.append(conversation_id, header, messages)
+                    metadata = self.backend.get_metadata(conversation_id)
+                except Exception as e:
+                    logger.error(
+                        f"Error al guardar la conversación {conversation_id}: {str(e)}"
+                    )
+                    # Devolver los mensajes a la cola para el siguiente volcado
+                    with self._lock:
+                        entry["pending"] = messages + entry["pending"]
+                        entry["dirty"] = True
+                    continue
+                with self._lock:
+                    if metadata is not None:
+                        entry["record"]["version"] = metadata["version"]
+                    self.flushed_writes += 1
+
+            if batch:
+                with self._lock:
+                    self._evict_overflow()
+
+    def _after_write(self) -> None:
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def exists(self, conversation_id: int) -> bool:
+        with self._lock:
+            if conversation_id in self._entries:
+                return True
+        return self.backend.exists(conversation_id)
+
+    def create(self, conversation_id: int, title: str, created_at: str) -> None:
+        with self._lock:
+            entry = self._add_entry(new_record(conversation_id, title, created_at))
+            self._mark_dirty(entry)
+        self._after_write()
+
+    def load(self, conversation_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._get_entry(conversation_id)
+            return self._copy(entry["record"]) if entry else None
+
+    def append(self, conversation_id: int, header: dict, messages: List[dict]) -> None:
+        messages = [dict(m) for m in messages]
+        with self._lock:
+            entry = self._get_entry(conversation_id) or self._add_entry(
+                new_record(conversation_id)
+            )
+            apply_header(entry["record"], header)
+            entry["record"]["messages"].extend(messages)
+            entry["pending"].extend(messages)
+            self._mark_dirty(entry)
+        self._after_write()
+
+    def set_title(self, conversation_id: int, title: str) -> bool:
+        with self._lock:
+            entry = self._get_entry(conversation_id)
+            if entry is None:
+                return False
+            entry["record"]["title"] = title
+            self._mark_dirty(entry)
+        self._after_write()
+        return True
+
+    def delete(self, conversation_id: int) -> bool:
+        # Se bloquean los volcados para que uno en curso no vuelva a crear la conversación
+        with self._flush_lock:
+            with self._lock:
+                cached = self._entries.pop(conversation_id, None) is not None
+            return self.backend.delete(conversation_id) or cached
+
+    def conversation_ids(self) -> List[int]:
+        self.flush()
+        return self.backend.conversation_ids()
+
+    def iter_conversations(self) -> Iterator[dict]:
+        # Recorrer el almacén directamente para no llenar la caché
+        self.flush()
+        return self.backend.iter_conversations()
+
+    def list_metadata(
+        self, cursor: Optional[int] = None, limit: int = 50
+    ) -> Tuple[List[dict], Optional[int]]:
+        self.flush()
+        return self.backend.list_metadata(cursor, limit)
+
+    def get_metadata(self, conversation_id: int) -> Optional[dict]:
+        self.flush()
+        return self.backend.get_metadata(conversation_id)
+
+    def changes_since(self, version: int) -> Tuple[int, List[Tuple[dict, int]], List[dict]]:
+        self.flush()
+        return self.backend.changes_since(version)
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[List[dict], Optional[int]]:
+        self.flush()
+        return self.backend.search(query, limit, offset)
+
+    def archive_stats(self) -> Optional[dict]:
+        return self.backend.archive_stats()
+
+    def stats(self) -> dict:
+        """
+        Devuelve las métricas de la caché: tamaño, aciertos, fallos, expulsiones,
+        escrituras recibidas y escrituras realizadas en el almacén.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "pending": sum(1 for entry in self._entries.values() if entry["dirty"]),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "flushed_writes": self.flushed_writes,
+                "flush_interval": self.flush_interval,
+            }
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self.backend.close()
+
+
+class ArchivedConversationStore(ConversationStore):
+    """
+    Nivel frío del almacén. Las conversaciones sin mensajes nuevos durante idle_days
+    se comprimen con gzip en archivos de segmento (muchas conversaciones por
+    segmento, un miembro gzip por conversación) y se eliminan del almacén principal.
+    Un índice de solo anexado guarda el segmento, la posición, el tamaño y los
+    metadatos de cada una, de modo que los listados no descomprimen nada. Leer o
+    escribir una conversación archivada la devuelve al almacén principal.
+    """
+
+    def __init__(
+        self,
+        backend: ConversationStore,
+        directory: Path = CHAT_ARCHIVE_DIR,
+        idle_days: float = CHAT_ARCHIVE_IDLE_DAYS,
+        interval: float = CHAT_ARCHIVE_INTERVAL,
+        segment_bytes: int = CHAT_ARCHIVE_SEGMENT_BYTES,
+        compression_level: int = CHAT_ARCHIVE_COMPRESSION_LEVEL,
+    ):
+        """
+        Inicializa el archivo.
+
+        Args:
+            backend: Almacén principal de las conversaciones activas.
+            directory: Directorio de los segmentos y del índice.
+            idle_days: Días sin mensajes tras los que se archiva una conversación.
+            interval: Segundos entre pasadas del archivador (0 para no archivar en
+                segundo plano).
+            segment_bytes: Tamaño a partir del cual se empieza un segmento nuevo.
+            compression_level: Nivel de compresión gzip (1-9).
+        """
+        self.backend = backend
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.jsonl"
+        self.lock_path = str(self.directory / "archive.lock")
+        self.idle_days = idle_days
+        self.interval = interval
+        self.segment_bytes = segment_bytes
+        self.compression_level = compression_level
+        # Conversaciones archivadas {ID: entrada del índice} y estado del índice leído
+        self._entries: Dict[int, dict] = {}
+        self._stamp = None
+        self._lock = threading.RLock()
+
+        self._stop = threading.Event()
+        self._thread = None
+        if interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, name="conversation-archiver", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Bucle del hilo archivador."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.archive_idle()
+            except Exception as e:
+                logger.error(f"Error al archivar las conversaciones inactivas: {str(e)}")
+
+    # Índice
+
+    def _index_stamp(self):
+        try:
+            stat = self.index_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _refresh(self) -> Dict[int, dict]:
+        """
+        Devuelve las conversaciones archivadas, releyendo el índice si ha cambiado
+        (por ejemplo, porque otro proceso ha archivado o recuperado conversaciones).
+        """
+        with self._lock:
+            stamp = self._index_stamp()
+            if stamp == self._stamp:
+                return self._entries
+            entries = {}
+            if stamp is not None:
+                with open(self.index_path, "r") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if entry.get("removed"):
+                            entries.pop(entry["id"], None)
+                        else:
+                            entries[entry["id"]] = entry
+            self._entries = entries
+            self._stamp = stamp
+            return entries
+
+    def _append_index(self, entry: dict) -> None:
+        """Añade una entrada al índice. Debe llamarse con el bloqueo del archivo."""
+        with open(self.index_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            if entry.get("removed"):
+                self._entries.pop(entry["id"], None)
+            else:
+                self._entries[entry["id"]] = entry
+            self._stamp = self._index_stamp()
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob("segment-*.gz"))
+
+    def _current_segment(self) -> Path:
+        """Segmento en el que se añaden las conversaciones; se empieza uno nuevo al llenarse."""
+        segments = self._segments()
+        if segments and segments[-1].stat().st_size < self.segment_bytes:
+            return segments[-1]
+        number = int(segments[-1].stem.split("-")[1]) + 1 if segments else 1
+        return self.directory / f"segment-{number:06d}.gz"
+
+    def _read_archived(self, entry: dict) -> dict:
+        """Lee y descomprime una conversación de su segmento."""
+        with open(self.directory / entry["segment"], "rb") as f:
+            f.seek(entry["offset"])
+            data = f.read(entry["length"])
+        return json.loads(gzip.decompress(data))
+
+    def _drop_segment_if_empty(self, segment: str) -> None:
+        """Elimina un segmento lleno cuando ya no contiene conversaciones archivadas."""
+        path = self.directory / segment
+        if path == self._current_segment() or any(
+            entry["segment"] == segment for entry in self._entries.values()
+        ):
+            return
+        path.unlink(missing_ok=True)
+
+    # Archivado y recuperación
+
+    def archive_conversation(self, conversation_id: int) -> Optional[dict]:
+        """
+        Archiva una conversación: la comprime en el segmento actual, la registra en
+        el índice y la elimina del almacén principal. Si la conversación está
+        procesando un mensaje, no se archiva.
+
+        Returns:
+            Entrada del índice ("size" sin comprimir y "length" comprimido), o None
+            si no se ha archivado.
+        """
+        try:
+            with file_lock(turn_lock_path(conversation_id), timeout=0), file_lock(
+                self.lock_path
+            ):
+                self._refresh()
+                record = self.backend.load(conversation_id)
+                metadata = self.backend.get_metadata(conversation_id)
+                if record is None or metadata is None:
+                    return None
+
+                data = json.dumps(record).encode("utf-8")
+                compressed = gzip.compress(data, compresslevel=self.compression_level)
+                segment = self._current_segment()
+                with open(segment, "ab") as f:
+                    offset = f.tell()
+                    f.write(compressed)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                entry = {
+                    "id": conversation_id,
+                    "segment": segment.name,
+                    "offset": offset,
+                    "length": len(compressed),
+                    "size": len(data),
+                    "metadata": metadata,
+                    "archived_at": datetime.now(CHAT_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                self._append_index(entry)
+                # La marca de borrado del almacén principal no se envía a los clientes
+                # (ver changes_since)
+                self.backend.delete(conversation_id)
+                return entry
+        except TimeoutError:
+            return None
+
+    def archive_idle(self, idle_days: Optional[float] = None) -> dict:
+        """
+        Archiva las conversaciones cuyo último mensaje es anterior a idle_days días.
+
+        Args:
+            idle_days: Días de inactividad (por defecto, los del archivo).
+
+        Returns:
+            Diccionario con las conversaciones archivadas ("archived") y los bytes
+            antes y después de comprimir ("original_bytes", "compressed_bytes").
+        """
+        idle_days = self.idle_days if idle_days is None else idle_days
+        cutoff = (datetime.now(CHAT_TIMEZONE) - timedelta(days=idle_days)).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+
+        # Se recorren solo los metadatos, página a página
+        idle, cursor = [], None
+        while True:
+            page, cursor = self.backend.list_metadata(cursor, 200)
+            idle.extend(
+                m["id"]
+                for m in page
+                if m.get("last_message_at") and m["last_message_at"] < cutoff
+            )
+            if cursor is None:
+                break
+
+        summary = {"archived": 0, "original_bytes": 0, "compressed_bytes": 0}
+        for conversation_id in idle:
+            entry = self.archive_conversation(conversation_id)
+            if entry is not None:
+                summary["archived"] += 1
+                summary["original_bytes"] += entry["size"]
+                summary["compressed_bytes"] += entry["length"]
+
+        if summary["archived"]:
+            logger.info(
+                f"Archivadas {summary['archived']} conversaciones inactivas: "
+                f"{summary['original_bytes']} bytes comprimidos en {summary['compressed_bytes']} "
+                f"({self._savings(summary['original_bytes'], summary['compressed_bytes']):.0%} de ahorro)"
+            )
+        return summary
+
+    @staticmethod
+    def _savings(original: int, compressed: int) -> float:
+        return 1 - compressed / original if original else 0.0
+
+    def _is_archived(self, conversation_id: int) -> bool:
+        return conversation_id in self._refresh()
+
+    def _rehydrate(self, conversation_id: int) -> None:
+        """Devuelve una conversación archivada al almacén principal."""
+        if not self._is_archived(conversation_id):
+            return
+        with self._lock, file_lock(self.lock_path):
+            entry = self._refresh().get(conversation_id)
+            if entry is None:
+                return
+            # Si una interrupción dejó la conversación en ambos sitios, manda la del almacén
+            if not self.backend.exists(conversation_id):
+                record = self._read_archived(entry)
+                self.backend.append(conversation_id, record_header(record), record["messages"])
+            self._append_index({"id": conversation_id, "removed": True})
+            self._drop_segment_if_empty(entry["segment"])
+            logger.info(f"Conversación {conversation_id} recuperada del archivo")
+
+    # Interfaz del almacén
+
+    def exists(self, conversation_id: int) -> bool:
+        return self.backend.exists(conversation_id) or self._is_archived(conversation_id)
+
+    def create(self, conversation_id: int, title: str, created_at: str) -> None:
+        self._rehydrate(conversation_id)
+        self.backend.create(conversation_id, title, created_at)
+
+    def load(self, conversation_id: int) -> Optional[dict]:
+        self._rehydrate(conversation_id)
+        return self.backend.load(conversation_id)
+
+    def append(self, conversation_id: int, header: dict, messages: List[dict]) -> None:
+        self._rehydrate(conversation_id)
+        self.backend.append(conversation_id, header, messages)
+
+    def set_title(self, conversation_id: int, title: str) -> bool:
+        self._rehydrate(conversation_id)
+        return self.backend.set_title(conversation_id, title)
+
+    def delete(self, conversation_id: int) -> bool:
+        # Se recupera primero para que el borrado deje su marca en el almacén principal
+        self._rehydrate(conversation_id)
+        return self.backend.delete(conversation_id)
+
+    def conversation_ids(self) -> List[int]:
+        return sorted(set(self.backend.conversation_ids()) | set(self._refresh()))
+
+    def iter_conversations(self) -> Iterator[dict]:
+        seen = set()
+        for record in self.backend.iter_conversations():
+            seen.add(record["id"])
+            yield record
+        # Las archivadas se leen sin devolverlas al almacén principal. Si una
+        # interrupción dejó una conversación en ambos sitios, manda la del almacén.
+        for conversation_id, entry in list(self._refresh().items()):
+            if conversation_id not in seen:
+                yield self._read_archived(entry)
+
+    def list_metadata(
+        self, cursor: Optional[int] = None, limit: int = 50
+    ) -> Tuple[List[dict], Optional[int]]:
+        page, next_cursor = self.backend.list_metadata(cursor, limit)
+        entries = self._refresh()
+        listed = {m["id"] for m in page}
+        archived = heapq.nlargest(
+            limit + 1,
+            (
+                i
+                for i in entries
+                if (cursor is None or i < cursor) and i not in listed
+            ),
+        )
+        if not archived:
+            return page, next_cursor
+        merged = page + [dict(entries[i]["metadata"]) for i in archived]
+        merged.sort(key=lambda m: m["id"], reverse=True)
+        more = next_cursor is not None or len(merged) > limit
+        merged = merged[:limit]
+        return merged, merged[-1]["id"] if more and merged else None
+
+    def get_metadata(self, conversation_id: int) -> Optional[dict]:
+        metadata = self.backend.get_metadata(conversation_id)
+        if metadata is None:
+            entry = self._refresh().get(conversation_id)
+            if entry is not None:
+                metadata = dict(entry["metadata"])
+        return metadata
+
+    def changes_since(self, version: int) -> Tuple[int, List[Tuple[dict, int]], List[dict]]:
+        """
+        Las conversaciones archivadas se devuelven con los metadatos del índice, sin
+        descomprimir sus segmentos: su registro es {"id", "archived": True,
+        "metadata"} y no lleva mensajes.
+        """
+        current, conversations, deleted = self.backend.changes_since(version)
+        archived = self._refresh()
+        # Archivar una conversación no es borrarla
+        deleted = [d for d in deleted if d["id"] not in archived]
+        changed = {record["id"] for record, _ in conversations}
+        for conversation_id in sorted(archived):
+            entry = archived[conversation_id]
+            if conversation_id not in changed and (
+                version <= 0 or entry["metadata"]["version"] > version
+            ):
+                record = {
+                    "id": conversation_id,
+                    "archived": True,
+                    "metadata": dict(entry["metadata"]),
+                }
+                conversations.append((record, 0))
+        return current, conversations, deleted
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[List[dict], Optional[int]]:
+        # Las conversaciones archivadas no se buscan hasta que se recuperan
+        return self.backend.search(query, limit, offset)
+
+    def stats(self) -> Optional[dict]:
+        return self.backend.stats()
+
+    def archive_stats(self) -> dict:
+        """
+        Devuelve las métricas del archivo: conversaciones archivadas, segmentos, bytes
+        de las conversaciones sin comprimir y comprimidas, bytes en disco de los
+        segmentos (incluidas las conversaciones ya recuperadas) y ahorro.
+        """
+        entries = list(self._refresh().values())
+        original = sum(entry["size"] for entry in entries)
+        compressed = sum(entry["length"] for entry in entries)
+        segments = self._segments()
+        return {
+            "conversations": len(entries),
+            "segments": len(segments),
+            "original_bytes": original,
+            "compressed_bytes": compressed,
+            "disk_bytes": sum(path.stat().st_size for path in segments),
+            "savings": round(self._savings(original, compressed), 4),
+            "idle_days": self.idle_days,
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.backend.close()
+
+
+_store: Optional[ConversationStore] = None
+# Los servicios usan el almacén desde hilos (asyncio.to_thread): se crea una sola vez
+_store_lock = threading.Lock()
+
+
+def migrate_conversations(
+    source: ConversationStore, target: ConversationStore, replace: bool = False
+) -> Tuple[int, int]:
+    """
+    Copia las conversaciones de un almacén a otro, de una en una, por lo que la
+    memoria usada no depende del número de chats.
+
+    Args:
+        source: Almacén de origen.
+        target: Almacén de destino.
+        replace: Reemplazar las conversaciones que ya existen en el destino.
+
+    Returns:
+        Tupla (conversaciones migradas, conversaciones omitidas porque ya existían).
+    """
+    migrated = skipped = 0
+    for record in source.iter_conversations():
+        conversation_id = record["id"]
+        if target.exists(conversation_id):
+            if not replace:
+                skipped += 1
+                continue
+            target.delete(conversation_id)
+
+        target.append(conversation_id, record_header(record), record["messages"])
+        migrated += 1
+    return migrated, skipped
+
+
+def has_legacy_json_chats() -> bool:
+    """Indica si hay conversaciones guardadas con el backend JSON."""
+    return any(
+        next(iter_sharded_files(directory), None) is not None
+        or has_unsharded_files(directory)
+        for directory in (FRONTEND_CHATS_DIR, OPENAI_CHATS_DIR)
+    )
+
+
+def migrate_legacy_json(store: "SqliteConversationStore") -> None:
+    """
+    Importa en una base SQLite vacía las conversaciones del backend JSON, para que
+    sigan visibles al actualizar. Los archivos que siguen en la raíz de sus
+    directorios se reparten antes en subdirectorios. Con varios workers solo migra
+    el primero que obtiene el bloqueo; los archivos JSON no se borran.
+    """
+    with file_lock(lock_path_for(store.path)):
+        if not store.is_empty():
+            return
+        logger.info("Importando las conversaciones en formato JSON a la base SQLite")
+        for directory in (OPENAI_CHATS_DIR, FRONTEND_CHATS_DIR):
+            for path in reshard(directory)["conflicts"]:
+                logger.warning(
+                    f"No se importa {path}: ya hay un archivo con ese nombre en su subdirectorio"
+                )
+        migrated, _ = migrate_conversations(JsonConversationStore(), store)
+        logger.info(f"Conversaciones importadas a {store.path}: {migrated}")
+
+
+def get_conversation_store() -> ConversationStore:
+    """
+    Devuelve el almacén de conversaciones configurado con CHAT_STORE_BACKEND
+    (se crea una sola vez por proceso).
+    """
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is not None:
+            return _store
+        if CHAT_STORE_BACKEND == "json":
+            store = JsonConversationStore()
+        elif CHAT_STORE_BACKEND == "jsonl":
+            store = JsonlConversationStore()
+        else:
+            store = SqliteConversationStore(CHAT_STORE_PATH)
+            if store.is_empty() and has_legacy_json_chats():
+                migrate_legacy_json(store)
+        if CHAT_ARCHIVE_ENABLED:
+            store = ArchivedConversationStore(store)
+        if CHAT_CACHE_ENABLED:
+            if WEB_CONCURRENCY > 1:
+                logger.warning(
+                    "Caché de conversaciones activada con varios workers: cada worker "
+                    "puede servir conversaciones desactualizadas"
+                )
+            store = CachedConversationStore(store)
+        _store = store
+        return _store
+
+
+def close_conversation_store() -> None:
+    """Cierra el almacén de conversaciones. Se invoca al apagar la aplicación."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
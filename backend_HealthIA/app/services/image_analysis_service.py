@@ -1,4 +1,3 @@
-from openai import OpenAI
 import os
 from typing import Dict, Any, Optional, List
 import base64
@@ -13,7 +12,10 @@ from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
 from app.services.s3_service import S3Service, S3_PLATES_FOLDER
-import tempfile
+from herramientas.file_lock import atomic_write_json, file_lock, lock_path_for
+from herramientas.image_preprocessing import VISION_DETAIL, prepare_image
+from herramientas.llm_client import get_async_client
+import asyncio
 import logging
 import sys
 import traceback
@@ -66,7 +68,7 @@ class ImageAnalysisService:
                         "No se encontró la clave API de OpenAI en las variables de entorno"
                     )
 
-                cls._client = OpenAI(api_key=api_key)
+                cls._client = get_async_client(api_key)
                 logger.info("Cliente OpenAI inicializado correctamente")
 
                 # Cargar análisis desde el archivo JSON si existe
@@ -140,6 +142,14 @@ class ImageAnalysisService:
             cls._analyses = {}
             cls._next_id = 1
 
+    @classmethod
+    def _file_lock(cls):
+        """
+        Bloqueo del archivo de análisis. Con varios workers, cada uno tiene su copia en
+        memoria: las modificaciones recargan el archivo y lo guardan con este bloqueo.
+        """
+        return file_lock(lock_path_for(cls._json_file_path))
+
     @classmethod
     def _save_analyses_to_json(cls):
         """
@@ -182,9 +192,8 @@ class ImageAnalysisService:
                 "last_updated": datetime.now().isoformat(),
             }
 
-            # Guardar en archivo con formato legible
-            with open(cls._json_file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # Guardar en archivo con formato legible (escritura atómica)
+            atomic_write_json(cls._json_file_path, data, ensure_ascii=False, indent=2)
 
             logger.info(
                 f"Guardados {len(cls._analyses)} análisis en {cls._json_file_path}"
@@ -401,102 +410,162 @@ IMPORTANTE:
             }
 
     @classmethod
-    def draw_analysis_on_image(cls, image_data: bytes, analysis_result: Dict) -> str:
+    def draw_analysis_on_image(cls, image: Image.Image, analysis_result: Dict) -> bytes:
         """
         Dibuja un área semitransparente sobre cada alimento individual detectado,
-        mostrando su categoría y retorna la imagen en base64.
+        mostrando su categoría, y retorna la imagen codificada en JPEG.
+
+        La imagen se decodifica aquí (si aún no lo estaba) y, si ya es RGB, se dibuja
+        sobre ella misma sin copiarla.
         """
         try:
             logger.info("Dibujando análisis en la imagen...")
-            with Image.open(BytesIO(image_data)) as img:
-                # Obtener dimensiones de la imagen
-                image_width, image_height = img.size
-                logger.info(
-                    f"Dimensiones de la imagen para dibujo: {image_width}x{image_height}"
-                )
+            # Obtener dimensiones de la imagen
+            image_width, image_height = image.size
+            logger.info(
+                f"Dimensiones de la imagen para dibujo: {image_width}x{image_height}"
+            )
 
-                # Convertir a RGB si es necesario
-                if img.mode != "RGB":
-                    img = img.convert("RGB")
+            # Convertir a RGB si es necesario
+            img = image if image.mode == "RGB" else image.convert("RGB")
 
-                # Crear una capa de overlay para las áreas semitransparentes
-                overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
-                draw_overlay = ImageDraw.Draw(overlay)
+            # Crear una capa de overlay para las áreas semitransparentes
+            overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
+            draw_overlay = ImageDraw.Draw(overlay)
 
-                # Crear objeto para dibujar texto en la imagen principal
-                draw = ImageDraw.Draw(img)
+            # Crear objeto para dibujar texto en la imagen principal
+            draw = ImageDraw.Draw(img)
 
-                # Intentar cargar una fuente, si no está disponible usar default
-                try:
-                    font = ImageFont.truetype("arial.ttf", 16)
-                except:
-                    font = ImageFont.load_default()
+            # Intentar cargar una fuente, si no está disponible usar default
+            try:
+                font = ImageFont.truetype("arial.ttf", 16)
+            except:
+                font = ImageFont.load_default()
 
-                # Dibujar cada alimento detectado
-                logger.info(
-                    f"Dibujando {len(analysis_result['detalle_alimentos'])} alimentos..."
+            # Dibujar cada alimento detectado
+            logger.info(
+                f"Dibujando {len(analysis_result['detalle_alimentos'])} alimentos..."
+            )
+            for alimento in analysis_result["detalle_alimentos"]:
+                categoria = alimento["categoria"]
+                logger.info(f"Dibujando: {alimento['nombre']} ({categoria})")
+
+                # Normalizar coordenadas al tamaño de la imagen
+                coords = cls.normalize_coordinates(
+                    alimento["coordenadas"], image_width, image_height
                 )
-                for alimento in analysis_result["detalle_alimentos"]:
-                    categoria = alimento["categoria"]
-                    logger.info(f"Dibujando: {alimento['nombre']} ({categoria})")
+                logger.info(f"Coordenadas normalizadas: {coords}")
 
-                    # Normalizar coordenadas al tamaño de la imagen
-                    coords = cls.normalize_coordinates(
-                        alimento["coordenadas"], image_width, image_height
+                # Verificar si el área es válida
+                if coords["x2"] <= coords["x1"] or coords["y2"] <= coords["y1"]:
+                    logger.warning(
+                        f"Coordenadas inválidas para {alimento['nombre']}: {coords}"
                     )
-                    logger.info(f"Coordenadas normalizadas: {coords}")
+                    continue
 
-                    # Verificar si el área es válida
-                    if coords["x2"] <= coords["x1"] or coords["y2"] <= coords["y1"]:
-                        logger.warning(
-                            f"Coordenadas inválidas para {alimento['nombre']}: {coords}"
-                        )
-                        continue
-
-                    color = cls.get_color_for_category(categoria)
+                color = cls.get_color_for_category(categoria)
 
-                    # Crear color semitransparente (agregar canal alpha)
-                    color_overlay = color + (80,)  # Alpha=80 para mejor visibilidad
+                # Crear color semitransparente (agregar canal alpha)
+                color_overlay = color + (80,)  # Alpha=80 para mejor visibilidad
 
-                    # Dibujar área semitransparente para este alimento específico
-                    draw_overlay.rectangle(
-                        [(coords["x1"], coords["y1"]), (coords["x2"], coords["y2"])],
-                        fill=color_overlay,
-                    )
+                # Dibujar área semitransparente para este alimento específico
+                draw_overlay.rectangle(
+                    [(coords["x1"], coords["y1"]), (coords["x2"], coords["y2"])],
+                    fill=color_overlay,
+                )
 
-                    # Calcular posición para la etiqueta
-                    text_pos = (coords["x1"] + 2, coords["y1"] + 2)
-                    text_alimento = (
-                        f"{alimento['nombre']} ({alimento['porcentaje_area']:.1f}%)"
-                    )
+                # Calcular posición para la etiqueta
+                text_pos = (coords["x1"] + 2, coords["y1"] + 2)
+                text_alimento = (
+                    f"{alimento['nombre']} ({alimento['porcentaje_area']:.1f}%)"
+                )
 
-                    # Agregar fondo semi-transparente para la etiqueta
-                    text_bbox = draw.textbbox(text_pos, text_alimento, font=font)
-                    # Verificar si hay espacio suficiente para la etiqueta y si está dentro de la imagen
-                    if (
-                        (text_bbox[2] - text_bbox[0]) <= (coords["x2"] - coords["x1"])
-                        and text_bbox[2] <= image_width
-                        and text_bbox[3] <= image_height
-                    ):
-                        draw.rectangle(text_bbox, fill=(0, 0, 0, 160))
-                        draw.text(text_pos, text_alimento, fill=color, font=font)
+                # Agregar fondo semi-transparente para la etiqueta
+                text_bbox = draw.textbbox(text_pos, text_alimento, font=font)
+                # Verificar si hay espacio suficiente para la etiqueta y si está dentro de la imagen
+                if (
+                    (text_bbox[2] - text_bbox[0]) <= (coords["x2"] - coords["x1"])
+                    and text_bbox[2] <= image_width
+                    and text_bbox[3] <= image_height
+                ):
+                    draw.rectangle(text_bbox, fill=(0, 0, 0, 160))
+                    draw.text(text_pos, text_alimento, fill=color, font=font)
 
-                # Combinar la imagen original con el overlay
-                img = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
+            # Combinar el overlay sobre la imagen usando su canal alpha como máscara
+            # (mismo resultado que alpha_composite, sin copias RGBA de la imagen)
+            img.paste(overlay, (0, 0), overlay)
+            overlay.close()
 
-                # Convertir la imagen procesada a base64
-                buffer = BytesIO()
-                img.save(buffer, format="JPEG", quality=95)
-                buffer.seek(0)
+            # Codificar la imagen procesada en JPEG
+            buffer = BytesIO()
+            img.save(buffer, format="JPEG", quality=95)
 
-                logger.info("Imagen procesada correctamente")
-                return base64.b64encode(buffer.getvalue()).decode("utf-8")
+            logger.info("Imagen procesada correctamente")
+            return buffer.getvalue()
         except Exception as e:
             error_msg = f"Error al procesar la imagen para dibujo: {str(e)}"
             logger.error(error_msg)
             logger.error(traceback.format_exc())
             raise Exception(error_msg)
 
+    @classmethod
+    def _reserve_analysis_id(cls, analysis_id: Optional[int]) -> int:
+        """
+        Reserva el ID de un análisis nuevo con el archivo bloqueado: si no se indica o
+        ya existe, se genera uno nuevo.
+
+        Args:
+            analysis_id: ID solicitado (opcional).
+
+        Returns:
+            ID reservado.
+        """
+        with cls._file_lock():
+            cls._load_analyses_from_json()
+            # Si no se proporciona ID o el ID ya existe, generar uno nuevo
+            if analysis_id is None:
+                analysis_id = cls._next_id
+                cls._next_id += 1
+                logger.info(f"ID generado automáticamente: {analysis_id}")
+            elif analysis_id in cls._analyses:
+                # Si el ID ya existe, generar uno nuevo para evitar sobrescribir
+                logger.warning(
+                    f"El ID {analysis_id} ya existe. Generando un nuevo ID para evitar sobrescribir."
+                )
+                analysis_id = cls._next_id
+                cls._next_id += 1
+                logger.info(f"Nuevo ID generado: {analysis_id}")
+            elif analysis_id >= cls._next_id:
+                # Si el ID proporcionado es mayor que _next_id, actualizar _next_id
+                cls._next_id = analysis_id + 1
+                logger.info(
+                    f"Actualizando _next_id a {cls._next_id} basado en el ID proporcionado"
+                )
+            cls._save_analyses_to_json()
+        return analysis_id
+
+    @classmethod
+    def _store_analysis(
+        cls,
+        analysis_id: int,
+        analisis: AnalisisPlato,
+        image_url: str,
+        processed_image_url: str,
+    ) -> None:
+        """Guarda un análisis en el historial con el archivo bloqueado."""
+        with cls._file_lock():
+            cls._load_analyses_from_json()
+            cls._analyses[analysis_id] = {
+                "id": analysis_id,
+                "fecha": datetime.now(),
+                "analisis": analisis,
+                "imagen_original_url": image_url,
+                "imagen_procesada_url": processed_image_url,
+            }
+
+            # Guardar análisis en JSON
+            cls._save_analyses_to_json()
+
     @classmethod
     async def analyze_image(
         cls,
@@ -511,28 +580,13 @@ IMPORTANTE:
         """
         logger.info(f"Iniciando análisis de imagen - ID solicitado: {analysis_id}")
 
-        # Si no se proporciona ID o el ID ya existe, generar uno nuevo
-        if analysis_id is None:
-            analysis_id = cls._next_id
-            cls._next_id += 1
-            logger.info(f"ID generado automáticamente: {analysis_id}")
-        elif analysis_id in cls._analyses:
-            # Si el ID ya existe, generar uno nuevo para evitar sobrescribir
-            logger.warning(
-                f"El ID {analysis_id} ya existe. Generando un nuevo ID para evitar sobrescribir."
-            )
-            analysis_id = cls._next_id
-            cls._next_id += 1
-            logger.info(f"Nuevo ID generado: {analysis_id}")
-        elif analysis_id >= cls._next_id:
-            # Si el ID proporcionado es mayor que _next_id, actualizar _next_id
-            cls._next_id = analysis_id + 1
-            logger.info(
-                f"Actualizando _next_id a {cls._next_id} basado en el ID proporcionado"
-            )
+        # Reservar el ID con el archivo bloqueado, partiendo de su contenido actual
+        # (otro worker puede haber añadido análisis). El bloqueo se espera en un hilo
+        # para no detener el bucle de eventos
+        analysis_id = await asyncio.to_thread(cls._reserve_analysis_id, analysis_id)
 
         image_url = None
-        temp_image_path = None
+        image = None
 
         try:
             # Asegurarse de que el cliente existe
@@ -540,15 +594,22 @@ IMPORTANTE:
                 logger.info("Cliente OpenAI no inicializado, creando instancia...")
                 cls()
 
-            # Determinar la fuente de la imagen
+            # Determinar la fuente de la imagen. Si llega en base64 válido, la misma
+            # cadena se envía a la API sin volver a codificar los bytes
             image_data = None
+            encoded_image = None
             if media_content:
                 logger.info(f"Usando media_content ({len(media_content)} bytes)")
                 image_data = media_content
             elif image_base64:
                 try:
                     logger.info("Decodificando imagen base64...")
-                    image_data = base64.b64decode(image_base64)
+                    try:
+                        image_data = base64.b64decode(image_base64, validate=True)
+                        encoded_image = image_base64
+                    except ValueError:
+                        # Base64 con saltos de línea u otros caracteres: se ignoran
+                        image_data = base64.b64decode(image_base64)
                     logger.info(f"Imagen decodificada ({len(image_data)} bytes)")
                 except Exception as e:
                     error_msg = (
@@ -568,18 +629,13 @@ IMPORTANTE:
                     "La imagen es demasiado grande. El tamaño máximo permitido es 10MB"
                 )
 
-            # Obtener dimensiones y validar formato de imagen
+            # Validar el formato de la imagen. Solo se lee la cabecera: los píxeles se
+            # decodifican una vez, al prepararla para el modelo, y se reutilizan al dibujar
             try:
-                logger.info("Validando formato y dimensiones de la imagen...")
-                with Image.open(BytesIO(image_data)) as img:
-                    if img.format.lower() not in ["jpeg", "jpg", "png", "gif"]:
-                        raise ValueError(
-                            f"Formato de imagen no soportado: {img.format}"
-                        )
-                    dimensions = ImageDimensions(width=img.width, height=img.height)
-                    logger.info(
-                        f"Dimensiones obtenidas: {dimensions.width}x{dimensions.height}"
-                    )
+                logger.info("Validando formato de la imagen...")
+                image = Image.open(BytesIO(image_data))
+                if image.format.lower() not in ["jpeg", "jpg", "png", "gif"]:
+                    raise ValueError(f"Formato de imagen no soportado: {image.format}")
             except Exception as e:
                 error_msg = f"Error al procesar la imagen: {str(e)}"
                 logger.error(error_msg)
@@ -598,7 +654,8 @@ IMPORTANTE:
 
             # Subir imagen original a S3
             logger.info("Subiendo imagen original a S3...")
-            s3_result = S3Service.upload_file_to_s3(
+            s3_result = await asyncio.to_thread(
+                S3Service.upload_file_to_s3,
                 file_content=image_data,
                 file_extension=file_extension,
                 conversation_id=analysis_id,
@@ -616,28 +673,26 @@ IMPORTANTE:
             image_url = s3_result["url"]
             logger.info(f"Imagen original subida a S3: {image_url}")
 
-            # Crear archivo temporal para OpenAI
-            logger.info("Creando archivo temporal...")
-            with tempfile.NamedTemporaryFile(
-                delete=False, suffix=f".{file_extension}"
-            ) as temp_image:
-                temp_image.write(image_data)
-                temp_image_path = temp_image.name
-                logger.info(f"Archivo temporal creado: {temp_image_path}")
-
             try:
-                # Leer la imagen y convertirla a base64 para enviarla a la API
+                # Preparar la imagen para la API: se orienta según su EXIF (también la
+                # que se dibuja después), se reduce y se recodifica. Las coordenadas
+                # se piden en píxeles de la imagen enviada
                 logger.info("Preparando imagen para enviar a OpenAI...")
-                with open(temp_image_path, "rb") as image_file:
-                    base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-                    logger.info(
-                        f"Imagen codificada en base64 ({len(base64_image)} caracteres)"
-                    )
+                prepared_image = await asyncio.to_thread(
+                    prepare_image, image, VISION_DETAIL, image_data, encoded_image
+                )
+                encoded_image = None
+                dimensions = ImageDimensions(
+                    width=prepared_image.width, height=prepared_image.height
+                )
+                logger.info(
+                    f"Dimensiones de la imagen enviada: {dimensions.width}x{dimensions.height}"
+                )
 
                 # Llamar a la API de OpenAI
                 logger.info("Llamando a la API de OpenAI...")
                 try:
-                    response = cls._client.chat.completions.create(
+                    response = await cls._client.chat.completions.create(
                         model="gpt-4o-mini",
                         messages=[
                             {
@@ -647,12 +702,7 @@ IMPORTANTE:
                                         "type": "text",
                                         "text": cls._get_prompt(dimensions),
                                     },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:image/{file_extension};base64,{base64_image}"
-                                        },
-                                    },
+                                    prepared_image.content_part(),
                                 ],
                             }
                         ],
@@ -677,6 +727,13 @@ IMPORTANTE:
                     # Usar json.loads en lugar de eval para mayor seguridad y mejor manejo de errores
                     analysis_dict = json.loads(analysis)
 
+                    # Llevar las coordenadas de la imagen enviada a la imagen original
+                    for alimento in analysis_dict.get("detalle_alimentos") or []:
+                        if isinstance(alimento.get("coordenadas"), dict):
+                            alimento["coordenadas"] = prepared_image.to_original(
+                                alimento["coordenadas"]
+                            )
+
                     # Verificar si las recomendaciones están completas
                     if "recomendaciones" in analysis_dict and isinstance(
                         analysis_dict["recomendaciones"], list
@@ -851,9 +908,7 @@ IMPORTANTE:
                 # Procesar la imagen con el análisis
                 logger.info("Dibujando análisis en la imagen...")
                 try:
-                    imagen_procesada_base64 = cls.draw_analysis_on_image(
-                        image_data, analysis_dict
-                    )
+                    imagen_procesada = cls.draw_analysis_on_image(image, analysis_dict)
                     logger.info("Imagen procesada correctamente")
                 except Exception as draw_error:
                     error_msg = f"Error al dibujar el análisis: {str(draw_error)}"
@@ -864,8 +919,9 @@ IMPORTANTE:
                 # Subir imagen procesada a S3
                 logger.info("Subiendo imagen procesada a S3 en carpeta platos_ia...")
                 try:
-                    processed_s3_result = S3Service.upload_file_to_s3(
-                        file_content=base64.b64decode(imagen_procesada_base64),
+                    processed_s3_result = await asyncio.to_thread(
+                        S3Service.upload_file_to_s3,
+                        file_content=imagen_procesada,
                         file_extension=file_extension,
                         conversation_id=analysis_id,
                         original_filename=f"processed_{original_filename if original_filename else 'image'}",
@@ -894,36 +950,25 @@ IMPORTANTE:
 
                 # Guardar el análisis en el historial
                 logger.info(f"Guardando análisis ID {analysis_id} en el historial...")
-                cls._analyses[analysis_id] = {
-                    "id": analysis_id,
-                    "fecha": datetime.now(),
-                    "analisis": analisis,
-                    "imagen_original_url": image_url,
-                    "imagen_procesada_url": processed_s3_result["url"],
-                }
-
-                # Guardar análisis en JSON
-                cls._save_analyses_to_json()
+                await asyncio.to_thread(
+                    cls._store_analysis,
+                    analysis_id,
+                    analisis,
+                    image_url,
+                    processed_s3_result["url"],
+                )
 
                 logger.info(f"Análisis completado exitosamente para ID {analysis_id}")
                 return analisis
 
             finally:
-                # Limpiar archivo temporal
-                if temp_image_path and os.path.exists(temp_image_path):
-                    logger.info(f"Eliminando archivo temporal: {temp_image_path}")
-                    os.unlink(temp_image_path)
+                # Liberar la imagen decodificada
+                image.close()
 
         except Exception as e:
             # Limpiar recursos en caso de error
-            if temp_image_path and os.path.exists(temp_image_path):
-                try:
-                    os.unlink(temp_image_path)
-                    logger.info(f"Archivo temporal eliminado: {temp_image_path}")
-                except Exception as cleanup_error:
-                    logger.error(
-                        f"Error al eliminar archivo temporal: {str(cleanup_error)}"
-                    )
+            if image is not None:
+                image.close()
 
             if image_url:
                 try:
@@ -976,50 +1021,52 @@ IMPORTANTE:
         logger.info(f"Eliminando análisis ID {analysis_id}...")
 
         try:
-            # Leer directamente del JSON
-            if os.path.exists(cls._json_file_path):
-                with open(cls._json_file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-
-                    # Verificar si el análisis existe en el JSON
-                    if str(analysis_id) not in data.get("analyses", {}):
-                        logger.warning(
-                            f"No se encontró el análisis ID {analysis_id} en el JSON"
-                        )
-                        return False
+            # Leer directamente del JSON (con el archivo bloqueado)
+            with cls._file_lock():
+                if os.path.exists(cls._json_file_path):
+                    with open(cls._json_file_path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+
+                        # Verificar si el análisis existe en el JSON
+                        if str(analysis_id) not in data.get("analyses", {}):
+                            logger.warning(
+                                f"No se encontró el análisis ID {analysis_id} en el JSON"
+                            )
+                            return False
 
-                    # Obtener datos del análisis
-                    analysis = data["analyses"][str(analysis_id)]
+                        # Obtener datos del análisis
+                        analysis = data["analyses"][str(analysis_id)]
 
-                    # Eliminar imágenes de S3
-                    logger.info("Eliminando imágenes y carpeta de S3...")
+                        # Eliminar imágenes de S3
+                        logger.info("Eliminando imágenes y carpeta de S3...")
 
-                    # Eliminar la carpeta completa del ID en S3
-                    folder_path = f"{S3_PLATES_FOLDER}/{analysis_id}"
-                    logger.info(f"Eliminando carpeta completa: {folder_path}")
-                    S3Service.delete_folder_from_s3(folder_path)
+                        # Eliminar la carpeta completa del ID en S3
+                        folder_path = f"{S3_PLATES_FOLDER}/{analysis_id}"
+                        logger.info(f"Eliminando carpeta completa: {folder_path}")
+                        S3Service.delete_folder_from_s3(folder_path)
 
-                    # Eliminar análisis del JSON
-                    logger.info(f"Eliminando análisis ID {analysis_id} del JSON...")
-                    del data["analyses"][str(analysis_id)]
+                        # Eliminar análisis del JSON
+                        logger.info(f"Eliminando análisis ID {analysis_id} del JSON...")
+                        del data["analyses"][str(analysis_id)]
 
-                    # Guardar cambios en JSON
-                    with open(cls._json_file_path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
+                        # Guardar cambios en JSON
+                        atomic_write_json(
+                            cls._json_file_path, data, ensure_ascii=False, indent=2
+                        )
 
-                    # También eliminar del diccionario en memoria si existe
-                    if analysis_id in cls._analyses:
-                        del cls._analyses[analysis_id]
+                        # También eliminar del diccionario en memoria si existe
+                        if analysis_id in cls._analyses:
+                            del cls._analyses[analysis_id]
 
-                    logger.info(
-                        f"Análisis ID {analysis_id} y su carpeta en S3 eliminados correctamente"
+                        logger.info(
+                            f"Análisis ID {analysis_id} y su carpeta en S3 eliminados correctamente"
+                        )
+                        return True
+                else:
+                    logger.warning(
+                        f"No se encontró archivo de análisis en {cls._json_file_path}"
                     )
-                    return True
-            else:
-                logger.warning(
-                    f"No se encontró archivo de análisis en {cls._json_file_path}"
-                )
-                return False
+                    return False
 
         except Exception as e:
             logger.error(f"Error al eliminar análisis: {str(e)}")
@@ -1,33 +1,80 @@
 import os
-import json
+import re
 import base64
-from openai import OpenAI
+import unicodedata
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import datetime
 import pytz
 import tempfile
+import asyncio
 from app.models.chat_models import InputType
 from app.services.s3_service import S3Service
+from app.services.context_service import ContextService
+from app.services.conversation_record import (
+    audio_content,
+    frontend_view,
+    frontend_views,
+    get_frontend_messages,
+    new_record,
+    ProjectionCache,
+    record_header,
+    record_metadata,
+)
+from app.services.conversation_store import get_conversation_store, turn_lock_path
+from herramientas.file_lock import async_file_lock
+from herramientas.image_preprocessing import VISION_DETAIL, prepare_image
+from herramientas.llm_client import generate_text, get_async_client
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Inicializar cliente de OpenAI
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Obtener el cliente de OpenAI compartido
+client = get_async_client(os.getenv("OPENAI_API_KEY"))
 
 # Obtener el modelo de OpenAI desde las variables de entorno
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
-# Directorios para almacenar las conversaciones
-OPENAI_CHATS_DIR = Path("app/chats-openai")
-FRONTEND_CHATS_DIR = Path("app/chats-frontend")
-OPENAI_CHATS_DIR.mkdir(exist_ok=True)
-FRONTEND_CHATS_DIR.mkdir(exist_ok=True)
-
 # Ruta al archivo de system prompt
 SYSTEM_PROMPT_PATH = Path("app/static/system_prompt.txt")
 
+# Segundos máximos que un mensaje espera a que termine el turno anterior de la misma
+# conversación
+CHAT_TURN_LOCK_TIMEOUT = float(os.getenv("CHAT_TURN_LOCK_TIMEOUT", 120))
+
+# Generación del título de las conversaciones:
+# - "background": título extractivo inmediato y título del LLM en segundo plano
+# - "local": solo título extractivo, sin llamadas al LLM
+# - "inline": título del LLM antes de responder (comportamiento anterior)
+CHAT_TITLE_MODE = os.getenv("CHAT_TITLE_MODE", "background").lower()
+
+# Instrucciones para generar el título según el origen del texto
+TITLE_PROMPTS = {
+    "text": "Genera un título muy corto (máximo 5 palabras) para esta conversación basado en el primer mensaje del usuario. No uses comillas ni puntuación.",
+    "image": "Genera un título muy corto (máximo 5 palabras) para esta conversación basado en la descripción de una imagen. No uses comillas ni puntuación.",
+    "audio": "Genera un título muy corto (máximo 5 palabras) para esta conversación basado en la transcripción de un audio. No uses comillas ni puntuación.",
+}
+
+# Palabras vacías que se omiten en los títulos extractivos
+TITLE_STOPWORDS = set(
+    """
+    a al algo como con cual cuales cuanto cuantos cuanta cuantas de del dime
+    donde el en es esta este esto hola la las le lo los me mi mis por para
+    puedes puedo que quiero se ser si sobre son su sus te tengo tu un una unos
+    unas y o favor podrias hay
+    """.split()
+)
+
+# Imágenes anteriores que se reenvían al modelo como imagen; el resto se sustituye
+# por la descripción guardada de la primera respuesta de visión
+CHAT_HISTORY_MAX_IMAGES = int(os.getenv("CHAT_HISTORY_MAX_IMAGES", 0))
+# Longitud máxima de la descripción guardada de cada imagen
+IMAGE_DESCRIPTION_MAX_CHARS = int(os.getenv("IMAGE_DESCRIPTION_MAX_CHARS", 500))
+
+# Tareas de título en curso y títulos generados aún no guardados
+_title_tasks: set = set()
+_pending_titles: dict = {}
+
 
 class OpenAIService:
     @staticmethod
@@ -40,25 +87,12 @@ class OpenAIService:
             # Prompt predeterminado si el archivo no existe
             return "Eres un asistente médico de HealthIA, diseñado para proporcionar información médica precisa y útil."
 
-    @staticmethod
-    def get_openai_conversation_path(conversation_id: int) -> Path:
-        """Obtiene la ruta del archivo para una conversación específica en formato OpenAI."""
-        return OPENAI_CHATS_DIR / f"{conversation_id}.json"
-
-    @staticmethod
-    def get_frontend_conversation_path(conversation_id: int) -> Path:
-        """Obtiene la ruta del archivo para una conversación específica en formato frontend."""
-        return FRONTEND_CHATS_DIR / f"{conversation_id}.json"
-
     @staticmethod
     def conversation_exists(conversation_id: int) -> bool:
         """Verifica si una conversación existe."""
         if conversation_id is None:
             return False
-        return (
-            OpenAIService.get_openai_conversation_path(conversation_id).exists()
-            or OpenAIService.get_frontend_conversation_path(conversation_id).exists()
-        )
+        return get_conversation_store().exists(conversation_id)
 
     @staticmethod
     def create_new_conversation(conversation_id: int) -> int:
@@ -70,71 +104,151 @@ class OpenAIService:
         current_time = datetime.now(peru_timezone)
         formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
 
-        # Datos para OpenAI (solo mensajes)
-        openai_conversation_data = {"messages": []}
+        get_conversation_store().create(conversation_id, "", formatted_time)
+        return conversation_id
 
-        # Datos para el frontend (estructura completa)
-        frontend_conversation_data = {
-            "id": conversation_id,
-            "title": "",
-            "created_at": formatted_time,
-            "messages": [],
-        }
+    @staticmethod
+    def get_conversation(conversation_id: int) -> dict:
+        """Obtiene el registro canónico de una conversación existente."""
+        conversation = get_conversation_store().load(conversation_id)
+        if conversation is None:
+            return new_record(conversation_id, "Chat sin título")
+        return conversation
 
-        # Guardar ambos archivos
-        with open(
-            OpenAIService.get_openai_conversation_path(conversation_id), "w"
-        ) as f:
-            json.dump(openai_conversation_data, f)
+    @staticmethod
+    def save_conversation(conversation_id: int, conversation: dict, start: int = 0) -> None:
+        """
+        Guarda los mensajes nuevos de una conversación (los que siguen al índice
+        indicado) junto con su título, fecha de creación y resumen.
 
-        with open(
-            OpenAIService.get_frontend_conversation_path(conversation_id), "w"
-        ) as f:
-            json.dump(frontend_conversation_data, f)
+        Args:
+            conversation_id: ID de la conversación.
+            conversation: Registro canónico de la conversación.
+            start: Número de mensajes ya guardados.
+        """
+        # Aplicar un título generado en segundo plano que aún no se haya guardado: el
+        # registro de este turno se leyó con el título anterior y lo sobrescribiría
+        pending_title = _pending_titles.pop(conversation_id, None)
+        if pending_title:
+            conversation["title"] = pending_title
 
-        return conversation_id
+        # Fecha del último mensaje en la zona horaria de Perú (UTC-5)
+        peru_timezone = pytz.timezone("America/Lima")
+        conversation["last_message_at"] = datetime.now(peru_timezone).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+
+        get_conversation_store().append(
+            conversation_id,
+            record_header(conversation),
+            conversation["messages"][start:],
+        )
+
+    @staticmethod
+    def compact_description(text: str) -> str:
+        """
+        Resume la respuesta de visión en una descripción breve para el historial:
+        elimina el formato markdown y corta en el último final de frase antes de
+        IMAGE_DESCRIPTION_MAX_CHARS.
+
+        Args:
+            text: Respuesta del modelo a la imagen.
+
+        Returns:
+            Descripción compacta de la imagen.
+        """
+        description = re.sub(r"[#*_`>]+", "", text or "")
+        description = " ".join(description.split())
+        if len(description) <= IMAGE_DESCRIPTION_MAX_CHARS:
+            return description
+
+        cut = description[:IMAGE_DESCRIPTION_MAX_CHARS]
+        end = max(cut.rfind(". "), cut.rfind("? "), cut.rfind("! "))
+        if end > IMAGE_DESCRIPTION_MAX_CHARS // 2:
+            return cut[: end + 1]
+        return cut.rsplit(" ", 1)[0] + "..."
 
     @staticmethod
-    def get_conversation(conversation_id: int) -> tuple:
-        """Obtiene los datos de una conversación existente."""
-        openai_data = {"messages": []}
-        frontend_data = {
-            "id": conversation_id,
-            "title": "Chat sin título",
-            "created_at": "",
-            "messages": [],
+    def _image_message(message: dict) -> dict:
+        """Mensaje de usuario con la imagen de un mensaje canónico de imagen."""
+        return {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": message["content"]},
+                {"type": "image_url", "image_url": {"url": message["image_url"]}},
+            ],
         }
 
-        # Intentar cargar datos de OpenAI
-        openai_path = OpenAIService.get_openai_conversation_path(conversation_id)
-        if openai_path.exists():
-            with open(openai_path, "r") as f:
-                openai_data = json.load(f)
+    @staticmethod
+    def _project_messages(messages: list, start: int = 0) -> list:
+        """
+        Convierte mensajes canónicos al formato nativo de OpenAI en una sola pasada.
+        Las imágenes que ya tienen descripción se convierten en texto. Cada mensaje
+        de texto o imagen da exactamente un mensaje del modelo; el resto se omite.
 
-        # Intentar cargar datos del frontend
-        frontend_path = OpenAIService.get_frontend_conversation_path(conversation_id)
-        if frontend_path.exists():
-            with open(frontend_path, "r") as f:
-                frontend_data = json.load(f)
+        Args:
+            messages: Mensajes canónicos de la conversación.
+            start: Índice desde el que convertir.
 
-        return openai_data, frontend_data
+        Returns:
+            Lista de mensajes listos para enviar al modelo.
+        """
+        model_messages = []
+        for m in messages[start:]:
+            if m.get("image_url"):
+                if not m.get("description"):
+                    model_messages.append(OpenAIService._image_message(m))
+                    continue
+                model_messages.append(
+                    {
+                        "role": "user",
+                        "content": f"{m['content']}\n\n[Imagen enviada por el usuario. Descripción: {m['description']}]",
+                    }
+                )
+            elif m["role"] in ["assistant", "user"]:
+                model_messages.append({"role": m["role"], "content": m["content"]})
+        return model_messages
 
     @staticmethod
-    def save_conversation(
-        conversation_id: int, openai_data: dict, frontend_data: dict
-    ) -> None:
-        """Guarda los datos de una conversación."""
-        # Guardar datos de OpenAI
-        with open(
-            OpenAIService.get_openai_conversation_path(conversation_id), "w"
-        ) as f:
-            json.dump(openai_data, f)
-
-        # Guardar datos del frontend
-        with open(
-            OpenAIService.get_frontend_conversation_path(conversation_id), "w"
-        ) as f:
-            json.dump(frontend_data, f)
+    def get_model_history(conversation_id: int, conversation: dict) -> list:
+        """
+        Obtiene el historial de la conversación en formato nativo de OpenAI.
+        La vista se memoriza por conversación (model_views) y solo se convierten los
+        mensajes añadidos desde la última vez, de modo que el coste por turno no crece
+        con la longitud de la conversación. Solo las CHAT_HISTORY_MAX_IMAGES imágenes
+        más recientes se envían como imagen; las anteriores van como descripción.
+
+        Args:
+            conversation_id: ID de la conversación.
+            conversation: Registro canónico de la conversación.
+
+        Returns:
+            Lista de mensajes (sin el mensaje de sistema) lista para enviar al modelo.
+        """
+        messages = conversation["messages"]
+        model_messages = model_views.get(conversation_id, messages)
+        if CHAT_HISTORY_MAX_IMAGES <= 0:
+            return model_messages
+
+        # Recorrer ambas listas desde el final hasta encontrar las imágenes con
+        # descripción más recientes y reenviarlas como imagen
+        recent = []
+        position = len(model_messages)
+        for m in reversed(messages):
+            if len(recent) >= CHAT_HISTORY_MAX_IMAGES:
+                break
+            if not (m.get("image_url") or m["role"] in ["assistant", "user"]):
+                continue
+            position -= 1
+            if m.get("image_url") and m.get("description"):
+                recent.append((position, OpenAIService._image_message(m)))
+        if not recent:
+            return model_messages
+
+        model_messages = list(model_messages)
+        for position, image_message in recent:
+            model_messages[position] = image_message
+        return model_messages
 
     @staticmethod
     def delete_conversation(conversation_id: int) -> bool:
@@ -142,55 +256,239 @@ class OpenAIService:
         Elimina una conversación existente.
         Retorna True si se eliminó correctamente, False si no existía.
         """
-        openai_path = OpenAIService.get_openai_conversation_path(conversation_id)
-        frontend_path = OpenAIService.get_frontend_conversation_path(conversation_id)
+        model_views.forget(conversation_id)
+        frontend_views.forget(conversation_id)
+        ContextService.forget(conversation_id)
+        return get_conversation_store().delete(conversation_id)
+
+    @staticmethod
+    def list_conversations(
+        cursor: int = None, limit: int = 50, include_messages: bool = False
+    ) -> tuple:
+        """
+        Obtiene una página de conversaciones, de la más reciente a la más antigua,
+        a partir del índice de metadatos del almacén.
 
-        deleted = False
+        Args:
+            cursor: ID a partir del cual continuar (se devuelven IDs menores).
+            limit: Número máximo de conversaciones.
+            include_messages: Incluir los mensajes de cada conversación.
 
-        if openai_path.exists():
-            openai_path.unlink()  # Elimina el archivo
-            deleted = True
+        Returns:
+            Tupla (lista de conversaciones con ID, título, fecha de creación, fecha del
+            último mensaje y número de mensajes; cursor de la página siguiente o None).
+        """
+        chats, next_cursor = get_conversation_store().list_metadata(cursor, limit)
+        if include_messages:
+            for chat in chats:
+                chat["messages"] = OpenAIService.get_conversation_messages(chat["id"])
+        return chats, next_cursor
 
-        if frontend_path.exists():
-            frontend_path.unlink()  # Elimina el archivo
-            deleted = True
+    @staticmethod
+    def get_conversation_messages(conversation_id: int) -> list:
+        """Obtiene los mensajes de una conversación en el formato del frontend."""
+        conversation = get_conversation_store().load(conversation_id)
+        if conversation is None:
+            return []
+        return get_frontend_messages(conversation_id, conversation["messages"])
 
-        return deleted
+    @staticmethod
+    def get_conversation_detail(conversation_id: int) -> dict:
+        """
+        Obtiene los metadatos y los mensajes (formato frontend) de una conversación.
+        Retorna None si la conversación no existe.
+        """
+        conversation = get_conversation_store().load(conversation_id)
+        if conversation is None:
+            return None
+        detail = record_metadata(conversation)
+        detail["messages"] = get_frontend_messages(
+            conversation_id, conversation["messages"]
+        )
+        return detail
 
     @staticmethod
-    def get_all_conversations() -> list:
+    def search_conversations(query: str, limit: int = 20, offset: int = 0) -> dict:
         """
-        Obtiene todas las conversaciones disponibles.
-        Retorna una lista de diccionarios, cada uno con el ID, título, fecha de creación y mensajes.
+        Busca mensajes en las conversaciones guardadas.
+
+        Args:
+            query: Texto a buscar.
+            limit: Número máximo de resultados.
+            offset: Número de resultados a saltar (paginación).
+
+        Returns:
+            Diccionario con la consulta ("query"), los resultados ordenados por
+            relevancia ("results": ID y título de la conversación, posición y rol del
+            mensaje, fragmento con los términos marcados y puntuación) y la posición de
+            la página siguiente ("next_offset").
         """
-        all_chats = []
+        results, next_offset = get_conversation_store().search(query, limit, offset)
+        return {"query": query, "results": results, "next_offset": next_offset}
 
-        # Buscar todos los archivos JSON en el directorio de frontend
-        for file_path in FRONTEND_CHATS_DIR.glob("*.json"):
-            try:
-                # Extraer el ID de la conversación del nombre del archivo
-                conversation_id = int(file_path.stem)
+    @staticmethod
+    def conversation_cache_stats() -> dict:
+        """Obtiene las métricas de la caché de conversaciones (None si está desactivada)."""
+        return get_conversation_store().stats()
 
-                # Obtener los datos de la conversación
-                with open(file_path, "r") as f:
-                    conversation_data = json.load(f)
+    @staticmethod
+    def conversation_archive_stats() -> dict:
+        """
+        Obtiene las métricas del archivo de conversaciones inactivas, con el ahorro de
+        disco (None si está desactivado).
+        """
+        return get_conversation_store().archive_stats()
 
-                # Crear un resumen de la conversación
-                chat_summary = {
-                    "id": conversation_id,
-                    "title": conversation_data.get("title", "Chat sin título"),
-                    "created_at": conversation_data.get(
-                        "created_at", "Fecha desconocida"
-                    ),
-                    "messages": conversation_data["messages"],
-                }
+    @staticmethod
+    def sync_conversations(since: int = 0, include_messages: bool = True) -> dict:
+        """
+        Obtiene los cambios en las conversaciones posteriores a una versión.
+
+        Args:
+            since: Última versión recibida por el cliente (0 para una sincronización completa).
+            include_messages: Incluir los mensajes nuevos de cada conversación.
 
-                all_chats.append(chat_summary)
-            except (ValueError, json.JSONDecodeError, KeyError) as e:
-                # Ignorar archivos con formato incorrecto
+        Returns:
+            Diccionario con la versión actual ("version"), las conversaciones creadas o
+            modificadas ("chats", con sus metadatos y, si se piden, "offset" y los
+            mensajes en formato frontend posteriores a esa posición; las archivadas
+            solo con sus metadatos y "archived") y las eliminadas ("deleted").
+        """
+        version, changed, deleted = get_conversation_store().changes_since(since)
+        chats = []
+        for conversation, offset in changed:
+            if conversation.get("archived"):
+                # Las archivadas solo llevan sus metadatos; los mensajes se obtienen al abrirlas
+                chats.append(dict(conversation["metadata"], archived=True))
                 continue
+            chat = record_metadata(conversation)
+            if include_messages:
+                view = get_frontend_messages(conversation["id"], conversation["messages"])
+                new_messages = frontend_view(conversation["messages"], offset)
+                chat["offset"] = len(view) - len(new_messages)
+                chat["messages"] = new_messages
+            chats.append(chat)
+        return {"version": version, "chats": chats, "deleted": deleted}
+
+    @staticmethod
+    def extractive_title(text: str, max_words: int = 5) -> str:
+        """
+        Genera un título corto a partir del propio texto, sin llamar al LLM:
+        toma las primeras palabras con contenido de la primera frase.
+
+        Args:
+            text: Texto de origen (mensaje, descripción o transcripción).
+            max_words: Número máximo de palabras del título.
+
+        Returns:
+            Título generado, o "Chat sin título" si el texto no tiene palabras útiles.
+        """
+        first_sentence = re.split(r"(?<=[.!?])\s+|\n", text.strip(), maxsplit=1)[0]
+        words = re.findall(r"[^\W_]+", first_sentence)
+        content_words = [
+            word
+            for word in words
+            if len(word) > 1
+            and unicodedata.normalize("NFKD", word.lower())
+            .encode("ascii", "ignore")
+            .decode()
+            not in TITLE_STOPWORDS
+        ][:max_words]
+        if not content_words:
+            return "Chat sin título"
+        title = " ".join(content_words)
+        return title[0].upper() + title[1:]
+
+    @staticmethod
+    async def generate_title(source_text: str, kind: str = "text") -> str:
+        """
+        Genera un título corto para la conversación con el LLM.
+
+        Args:
+            source_text: Texto de origen (mensaje, descripción o transcripción).
+            kind: Origen del texto ("text", "image" o "audio").
+
+        Returns:
+            Título generado.
+        """
+        title_response = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": TITLE_PROMPTS[kind]},
+                {"role": "user", "content": source_text},
+            ],
+            temperature=0.4,
+        )
+        return (title_response.choices[0].message.content or "").strip()
+
+    @staticmethod
+    async def assign_title(conversation: dict, source_text: str, kind: str) -> None:
+        """
+        Asigna el título de una conversación nueva según CHAT_TITLE_MODE. En los modos
+        "background" y "local" se usa de inmediato un título extractivo.
+        """
+        if CHAT_TITLE_MODE == "inline":
+            conversation["title"] = await OpenAIService.generate_title(source_text, kind)
+        else:
+            conversation["title"] = OpenAIService.extractive_title(source_text)
 
-        return all_chats
+    @staticmethod
+    def schedule_title_update(conversation_id: int, source_text: str, kind: str) -> None:
+        """
+        Lanza en segundo plano la generación del título con el LLM (modo "background").
+        Cuando termina, el título se escribe en el registro del frontend.
+        """
+        if CHAT_TITLE_MODE != "background":
+            return
+
+        task = asyncio.create_task(
+            OpenAIService._update_title(conversation_id, source_text, kind)
+        )
+        _title_tasks.add(task)
+        task.add_done_callback(_title_tasks.discard)
+
+    @staticmethod
+    async def _update_title(conversation_id: int, source_text: str, kind: str) -> None:
+        """
+        Genera el título con el LLM y lo guarda en la conversación. El título se
+        guarda con el bloqueo de turno, para que un turno en curso (que leyó el
+        registro con el título extractivo) no lo sobrescriba al guardar. Mientras
+        espera el bloqueo queda pendiente y, si el turno lo aplica al guardar, ya no
+        se vuelve a escribir.
+        """
+        try:
+            title = await OpenAIService.generate_title(source_text, kind)
+            if not title:
+                return
+
+            _pending_titles[conversation_id] = title
+            try:
+                async with async_file_lock(
+                    turn_lock_path(conversation_id), timeout=CHAT_TURN_LOCK_TIMEOUT
+                ):
+                    if _pending_titles.get(conversation_id) != title:
+                        return
+                    store = get_conversation_store()
+                    await asyncio.to_thread(store.set_title, conversation_id, title)
+                    await asyncio.to_thread(store.flush, conversation_id)
+                    _pending_titles.pop(conversation_id, None)
+            except TimeoutError:
+                # Sigue pendiente: lo guardará el próximo turno de la conversación
+                print(
+                    f"Título de la conversación {conversation_id} pendiente: "
+                    "la conversación está ocupada"
+                )
+        except Exception as e:
+            print(f"Error al generar el título de la conversación {conversation_id}: {str(e)}")
+
+    @staticmethod
+    async def wait_for_background_tasks(timeout: float = 10) -> None:
+        """
+        Espera a que terminen las tareas en segundo plano (títulos pendientes).
+        Se invoca al apagar la aplicación.
+        """
+        if _title_tasks:
+            await asyncio.wait(list(_title_tasks), timeout=timeout)
 
     @staticmethod
     async def chat_with_openai(
@@ -201,7 +499,11 @@ class OpenAIService:
         original_filename=None,
     ) -> dict:
         """
-        Procesa un mensaje con OpenAI y devuelve la respuesta.
+        Procesa un mensaje con OpenAI y devuelve la respuesta. Los turnos de una misma
+        conversación se procesan de uno en uno, también entre workers: el turno lee el
+        historial, llama al modelo y guarda la respuesta sin que otro turno se intercale.
+        Con la caché de conversaciones, el turno se vuelca al almacén antes de liberar
+        el bloqueo.
 
         Args:
             message: Mensaje del usuario (texto, imagen en base64 o audio en base64)
@@ -214,8 +516,48 @@ class OpenAIService:
             Diccionario con la respuesta, ID de la conversación, título y fecha de creación
         """
         try:
+            async with async_file_lock(
+                turn_lock_path(conversation_id), timeout=CHAT_TURN_LOCK_TIMEOUT
+            ):
+                try:
+                    return await OpenAIService._chat_turn(
+                        message,
+                        conversation_id,
+                        input_type,
+                        media_content,
+                        original_filename,
+                    )
+                finally:
+                    await asyncio.to_thread(get_conversation_store().flush, conversation_id)
+        except TimeoutError:
+            return {
+                "error": "La conversación está ocupada con otro mensaje; inténtalo de nuevo",
+                "id": conversation_id,
+                "title": "Chat sin título",
+                "created_at": "Fecha desconocida",
+                "media_url": None,
+            }
+
+    @staticmethod
+    async def _chat_turn(
+        message: str,
+        conversation_id: int,
+        input_type: InputType = InputType.TEXT,
+        media_content=None,
+        original_filename=None,
+    ) -> dict:
+        """
+        Procesa un turno de la conversación con el bloqueo del turno ya adquirido
+        (ver chat_with_openai).
+        """
+        try:
+            # Texto y tipo de origen para el título, solo en el primer mensaje
+            title_source = None
+
             # Verificar si la conversación existe
-            is_new_conversation = not OpenAIService.conversation_exists(conversation_id)
+            is_new_conversation = not await asyncio.to_thread(
+                OpenAIService.conversation_exists, conversation_id
+            )
 
             # Obtener o crear la conversación
             if is_new_conversation:
@@ -224,19 +566,18 @@ class OpenAIService:
                 current_time = datetime.now(peru_timezone)
                 formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
 
-                openai_data = {"messages": []}
-
-                frontend_data = {
-                    "id": conversation_id,
-                    "title": "Chat sin título",
-                    "created_at": formatted_time,
-                    "messages": [],
-                }
+                conversation = new_record(
+                    conversation_id, "Chat sin título", formatted_time
+                )
             else:
                 # Obtener la conversación existente
-                openai_data, frontend_data = OpenAIService.get_conversation(
-                    conversation_id
+                conversation = await asyncio.to_thread(
+                    OpenAIService.get_conversation, conversation_id
                 )
+                ContextService.load_summary(conversation_id, conversation.get("summary"))
+
+            # Mensajes ya guardados; al final solo se añaden los nuevos
+            saved_count = len(conversation["messages"])
 
             # Procesar según el tipo de entrada
             if input_type == InputType.TEXT:
@@ -247,116 +588,33 @@ class OpenAIService:
                 system_prompt = OpenAIService.get_system_prompt()
                 openai_messages.append({"role": "system", "content": system_prompt})
 
-                # Convertir el historial de mensajes al formato nativo de OpenAI
-                for m in openai_data["messages"]:
-                    # Omitir mensajes de sistema internos que no son relevantes para OpenAI
-                    if (
-                        m["role"] == "system"
-                        and "[El usuario ha compartido una imagen:" in m["content"]
-                    ):
-                        continue
-
-                    # Si es un mensaje de usuario con URL de imagen, convertirlo a formato multimodal
-                    if (
-                        m["role"] == "user"
-                        and isinstance(m["content"], str)
-                        and m["content"].startswith("http")
-                    ):
-                        # Verificar si es una URL de imagen
-                        is_image_url = (
-                            any(
-                                m["content"].lower().endswith(ext)
-                                for ext in [".jpg", ".jpeg", ".png", ".gif"]
-                            )
-                            or "s3.amazonaws.com" in m["content"]
-                        )
-
-                        if is_image_url:
-                            # Buscar el siguiente mensaje que debería ser la instrucción del usuario
-                            idx = openai_data["messages"].index(m)
-                            if (
-                                idx + 1 < len(openai_data["messages"])
-                                and openai_data["messages"][idx + 1]["role"] == "user"
-                            ):
-                                instruction = openai_data["messages"][idx + 1][
-                                    "content"
-                                ]
-
-                                # Crear un mensaje multimodal con la imagen y la instrucción
-                                openai_messages.append(
-                                    {
-                                        "role": "user",
-                                        "content": [
-                                            {"type": "text", "text": instruction},
-                                            {
-                                                "type": "image_url",
-                                                "image_url": {"url": m["content"]},
-                                            },
-                                        ],
-                                    }
-                                )
-                            continue
-
-                    # Si es un mensaje de usuario con instrucción después de una imagen, ya lo procesamos
-                    if m["role"] == "user":
-                        idx = openai_data["messages"].index(m)
-                        if (
-                            idx > 0
-                            and openai_data["messages"][idx - 1]["role"] == "user"
-                        ):
-                            prev_msg = openai_data["messages"][idx - 1]["content"]
-                            if (
-                                isinstance(prev_msg, str)
-                                and prev_msg.startswith("http")
-                                and (
-                                    any(
-                                        prev_msg.lower().endswith(ext)
-                                        for ext in [".jpg", ".jpeg", ".png", ".gif"]
-                                    )
-                                    or "s3.amazonaws.com" in prev_msg
-                                )
-                            ):
-                                continue
-
-                    # Para otros mensajes, añadirlos normalmente
-                    if m["role"] in ["assistant", "user"]:
-                        openai_messages.append(
-                            {"role": m["role"], "content": m["content"]}
-                        )
+                # Historial en formato nativo de OpenAI (se mantiene de forma incremental),
+                # limitado al presupuesto de tokens y con un resumen de los mensajes antiguos
+                openai_messages.extend(
+                    ContextService.build_history(
+                        conversation_id,
+                        OpenAIService.get_model_history(conversation_id, conversation),
+                    )
+                )
 
                 # Añadir el mensaje actual del usuario
                 openai_messages.append({"role": "user", "content": message})
 
                 # Procesar el mensaje con OpenAI
-                response = client.chat.completions.create(
-                    model=OPENAI_MODEL, messages=openai_messages, temperature=0.4
+                assistant_message = await generate_text(
+                    client,
+                    model=OPENAI_MODEL,
+                    messages=openai_messages,
+                    temperature=0.4,
                 )
 
-                # Obtener la respuesta
-                assistant_message = response.choices[0].message.content
-
                 # Si es el primer mensaje, generar un título corto
-                if is_new_conversation or len(openai_data["messages"]) == 0:
-                    # Solicitar a OpenAI que genere un título corto
-                    title_response = client.chat.completions.create(
-                        model=OPENAI_MODEL,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "Genera un título muy corto (máximo 5 palabras) para esta conversación basado en el primer mensaje del usuario. No uses comillas ni puntuación.",
-                            },
-                            {"role": "user", "content": message},
-                        ],
-                        temperature=0.4,
-                    )
-                    # Guardar el título generado
-                    frontend_data["title"] = title_response.choices[
-                        0
-                    ].message.content.strip()
+                if is_new_conversation or len(conversation["messages"]) == 0:
+                    title_source = (message, "text")
+                    await OpenAIService.assign_title(conversation, *title_source)
 
                 # Agregar el mensaje del usuario al historial
-                openai_data["messages"].append({"role": "user", "content": message})
-                frontend_data["messages"].append({"role": "user", "content": message})
+                conversation["messages"].append({"role": "user", "content": message})
 
             elif input_type == InputType.IMAGE:
                 # Procesar imagen
@@ -374,8 +632,8 @@ class OpenAIService:
                             return {
                                 "error": "El formato de la imagen no es válido. Debe ser una cadena base64 válida o un archivo de imagen.",
                                 "id": conversation_id,
-                                "title": frontend_data.get("title", "Chat sin título"),
-                                "created_at": frontend_data.get(
+                                "title": conversation.get("title", "Chat sin título"),
+                                "created_at": conversation.get(
                                     "created_at", "Fecha desconocida"
                                 ),
                             }
@@ -391,7 +649,8 @@ class OpenAIService:
                             ].lower()  # Eliminar el punto inicial
 
                     # Guardar la imagen en S3
-                    s3_result = S3Service.upload_file_to_s3(
+                    s3_result = await asyncio.to_thread(
+                        S3Service.upload_file_to_s3,
                         file_content=image_data,
                         file_extension=file_extension,
                         conversation_id=conversation_id,
@@ -402,8 +661,8 @@ class OpenAIService:
                         return {
                             "error": f"Error al guardar la imagen en S3: {s3_result.get('error')}",
                             "id": conversation_id,
-                            "title": frontend_data.get("title", "Chat sin título"),
-                            "created_at": frontend_data.get(
+                            "title": conversation.get("title", "Chat sin título"),
+                            "created_at": conversation.get(
                                 "created_at", "Fecha desconocida"
                             ),
                         }
@@ -419,18 +678,10 @@ class OpenAIService:
                         else "¿Qué puedes ver en esta imagen? Por favor, descríbela detalladamente."
                     )
 
-                    # Crear un archivo temporal para la imagen si es necesario
-                    with tempfile.NamedTemporaryFile(
-                        delete=False, suffix=f".{file_extension}"
-                    ) as temp_image:
-                        temp_image.write(image_data)
-                        temp_image_path = temp_image.name
-
-                    # Leer la imagen y convertirla a base64 para enviarla a la API
-                    with open(temp_image_path, "rb") as image_file:
-                        base64_image = base64.b64encode(image_file.read()).decode(
-                            "utf-8"
-                        )
+                    # Preparar la imagen para el modelo (orientada, reducida y recodificada)
+                    prepared_image = await asyncio.to_thread(
+                        prepare_image, image_data, VISION_DETAIL
+                    )
 
                     # Preparar los mensajes para OpenAI en formato nativo
                     openai_messages = []
@@ -439,83 +690,14 @@ class OpenAIService:
                     system_prompt = OpenAIService.get_system_prompt()
                     openai_messages.append({"role": "system", "content": system_prompt})
 
-                    # Convertir el historial de mensajes al formato nativo de OpenAI
-                    for m in openai_data["messages"]:
-                        # Omitir mensajes de sistema internos que no son relevantes para OpenAI
-                        if (
-                            m["role"] == "system"
-                            and "[El usuario ha compartido una imagen:" in m["content"]
-                        ):
-                            continue
-
-                        # Si es un mensaje de usuario con URL de imagen, convertirlo a formato multimodal
-                        if (
-                            m["role"] == "user"
-                            and isinstance(m["content"], str)
-                            and m["content"].startswith("http")
-                        ):
-                            # Verificar si es una URL de imagen
-                            is_image_url = (
-                                any(
-                                    m["content"].lower().endswith(ext)
-                                    for ext in [".jpg", ".jpeg", ".png", ".gif"]
-                                )
-                                or "s3.amazonaws.com" in m["content"]
-                            )
-
-                            if is_image_url:
-                                # Buscar el siguiente mensaje que debería ser la instrucción del usuario
-                                idx = openai_data["messages"].index(m)
-                                if (
-                                    idx + 1 < len(openai_data["messages"])
-                                    and openai_data["messages"][idx + 1]["role"]
-                                    == "user"
-                                ):
-                                    instruction = openai_data["messages"][idx + 1][
-                                        "content"
-                                    ]
-
-                                    # Crear un mensaje multimodal con la imagen y la instrucción
-                                    openai_messages.append(
-                                        {
-                                            "role": "user",
-                                            "content": [
-                                                {"type": "text", "text": instruction},
-                                                {
-                                                    "type": "image_url",
-                                                    "image_url": {"url": m["content"]},
-                                                },
-                                            ],
-                                        }
-                                    )
-                                continue
-
-                        # Si es un mensaje de usuario con instrucción después de una imagen, ya lo procesamos
-                        if m["role"] == "user":
-                            idx = openai_data["messages"].index(m)
-                            if (
-                                idx > 0
-                                and openai_data["messages"][idx - 1]["role"] == "user"
-                            ):
-                                prev_msg = openai_data["messages"][idx - 1]["content"]
-                                if (
-                                    isinstance(prev_msg, str)
-                                    and prev_msg.startswith("http")
-                                    and (
-                                        any(
-                                            prev_msg.lower().endswith(ext)
-                                            for ext in [".jpg", ".jpeg", ".png", ".gif"]
-                                        )
-                                        or "s3.amazonaws.com" in prev_msg
-                                    )
-                                ):
-                                    continue
-
-                        # Para otros mensajes, añadirlos normalmente
-                        if m["role"] in ["assistant", "user"]:
-                            openai_messages.append(
-                                {"role": m["role"], "content": m["content"]}
-                            )
+                    # Historial en formato nativo de OpenAI (se mantiene de forma incremental),
+                    # limitado al presupuesto de tokens y con un resumen de los mensajes antiguos
+                    openai_messages.extend(
+                        ContextService.build_history(
+                            conversation_id,
+                            OpenAIService.get_model_history(conversation_id, conversation),
+                        )
+                    )
 
                     # Añadir el mensaje actual con la imagen
                     openai_messages.append(
@@ -523,75 +705,43 @@ class OpenAIService:
                             "role": "user",
                             "content": [
                                 {"type": "text", "text": user_instruction},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/{file_extension};base64,{base64_image}"
-                                    },
-                                },
+                                prepared_image.content_part(),
                             ],
                         }
                     )
 
                     # Enviar la imagen a GPT-4o
-                    response = client.chat.completions.create(
+                    assistant_message = await generate_text(
+                        client,
                         model="gpt-4o",  # Usar GPT-4o para visión
                         messages=openai_messages,
                         temperature=0.4,
                     )
 
-                    # Obtener la respuesta
-                    assistant_message = response.choices[0].message.content
-
-                    # Si es el primer mensaje, generar un título corto
-                    if is_new_conversation or len(openai_data["messages"]) == 0:
-                        # Solicitar a OpenAI que genere un título corto basado en la descripción
-                        title_response = client.chat.completions.create(
-                            model=OPENAI_MODEL,
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": "Genera un título muy corto (máximo 5 palabras) para esta conversación basado en la descripción de una imagen. No uses comillas ni puntuación.",
-                                },
-                                {"role": "user", "content": assistant_message},
-                            ],
-                            temperature=0.4,
-                        )
-                        # Guardar el título generado
-                        frontend_data["title"] = title_response.choices[
-                            0
-                        ].message.content.strip()
-
-                    # Eliminar el archivo temporal
-                    os.unlink(temp_image_path)
+                    # Si es el primer mensaje, generar un título corto basado en la descripción
+                    if is_new_conversation or len(conversation["messages"]) == 0:
+                        title_source = (assistant_message, "image")
+                        await OpenAIService.assign_title(conversation, *title_source)
 
-                    # Guardar la URL de la imagen y la instrucción en el historial
-                    # Para OpenAI: formato multimodal
-                    openai_data["messages"].append(
+                    # Guardar la URL de la imagen y la instrucción en el historial, con la
+                    # descripción que sustituye a la imagen en los turnos siguientes
+                    conversation["messages"].append(
                         {
                             "role": "user",
-                            "content": [
-                                {"type": "text", "text": user_instruction},
-                                {"type": "image_url", "image_url": {"url": image_url}},
-                            ],
+                            "content": user_instruction,
+                            "image_url": image_url,
+                            "description": OpenAIService.compact_description(
+                                assistant_message
+                            ),
                         }
                     )
 
-                    # Para Frontend: formato simple
-                    frontend_data["messages"].append(
-                        {"role": "user_media", "content": image_url}
-                    )
-
-                    frontend_data["messages"].append(
-                        {"role": "user", "content": user_instruction}
-                    )
-
                 except base64.binascii.Error:
                     return {
                         "error": "El formato de la imagen no es válido. Debe ser una cadena base64 válida o un archivo de imagen.",
                         "id": conversation_id,
-                        "title": frontend_data.get("title", "Chat sin título"),
-                        "created_at": frontend_data.get(
+                        "title": conversation.get("title", "Chat sin título"),
+                        "created_at": conversation.get(
                             "created_at", "Fecha desconocida"
                         ),
                     }
@@ -599,8 +749,8 @@ class OpenAIService:
                     return {
                         "error": f"Error al procesar la imagen: {str(e)}",
                         "id": conversation_id,
-                        "title": frontend_data.get("title", "Chat sin título"),
-                        "created_at": frontend_data.get(
+                        "title": conversation.get("title", "Chat sin título"),
+                        "created_at": conversation.get(
                             "created_at", "Fecha desconocida"
                         ),
                     }
@@ -620,8 +770,8 @@ class OpenAIService:
                             return {
                                 "error": "El formato del audio no es válido. Debe ser una cadena base64 válida o un archivo de audio.",
                                 "id": conversation_id,
-                                "title": frontend_data.get("title", "Chat sin título"),
-                                "created_at": frontend_data.get(
+                                "title": conversation.get("title", "Chat sin título"),
+                                "created_at": conversation.get(
                                     "created_at", "Fecha desconocida"
                                 ),
                             }
@@ -637,7 +787,8 @@ class OpenAIService:
                             ].lower()  # Eliminar el punto inicial
 
                     # Guardar el audio en S3
-                    s3_result = S3Service.upload_file_to_s3(
+                    s3_result = await asyncio.to_thread(
+                        S3Service.upload_file_to_s3,
                         file_content=audio_data,
                         file_extension=file_extension,
                         conversation_id=conversation_id,
@@ -648,8 +799,8 @@ class OpenAIService:
                         return {
                             "error": f"Error al guardar el audio en S3: {s3_result.get('error')}",
                             "id": conversation_id,
-                            "title": frontend_data.get("title", "Chat sin título"),
-                            "created_at": frontend_data.get(
+                            "title": conversation.get("title", "Chat sin título"),
+                            "created_at": conversation.get(
                                 "created_at", "Fecha desconocida"
                             ),
                         }
@@ -674,7 +825,7 @@ class OpenAIService:
 
                     # Transcribir el audio con Whisper
                     with open(temp_audio_path, "rb") as audio_file:
-                        transcript = client.audio.transcriptions.create(
+                        transcript = await client.audio.transcriptions.create(
                             model="whisper-1", file=audio_file
                         )
 
@@ -688,78 +839,44 @@ class OpenAIService:
                     system_prompt = OpenAIService.get_system_prompt()
                     openai_messages.append({"role": "system", "content": system_prompt})
 
-                    # Convertir el historial de mensajes al formato nativo de OpenAI
-                    for m in openai_data["messages"]:
-                        # Para mensajes normales, añadirlos directamente
-                        if m["role"] in ["assistant", "user"]:
-                            openai_messages.append(
-                                {"role": m["role"], "content": m["content"]}
-                            )
+                    # Historial en formato nativo de OpenAI (se mantiene de forma incremental),
+                    # limitado al presupuesto de tokens y con un resumen de los mensajes antiguos
+                    openai_messages.extend(
+                        ContextService.build_history(
+                            conversation_id,
+                            OpenAIService.get_model_history(conversation_id, conversation),
+                        )
+                    )
 
                     # Añadir la transcripción como mensaje del usuario
-                    message_content = transcription
-                    if user_instruction:
-                        message_content = f"{transcription}\n\nInstrucción adicional: {user_instruction}"
+                    message_content = audio_content(transcription, user_instruction)
 
                     openai_messages.append({"role": "user", "content": message_content})
 
                     # Enviar la transcripción a GPT para obtener una respuesta
-                    response = client.chat.completions.create(
-                        model=OPENAI_MODEL, messages=openai_messages, temperature=0.4
+                    assistant_message = await generate_text(
+                        client,
+                        model=OPENAI_MODEL,
+                        messages=openai_messages,
+                        temperature=0.4,
                     )
 
-                    # Obtener la respuesta
-                    assistant_message = response.choices[0].message.content
-
-                    # Si es el primer mensaje, generar un título corto
-                    if is_new_conversation or len(openai_data["messages"]) == 0:
-                        # Solicitar a OpenAI que genere un título corto basado en la transcripción
-                        title_response = client.chat.completions.create(
-                            model=OPENAI_MODEL,
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": "Genera un título muy corto (máximo 5 palabras) para esta conversación basado en la transcripción de un audio. No uses comillas ni puntuación.",
-                                },
-                                {"role": "user", "content": transcription},
-                            ],
-                            temperature=0.4,
-                        )
-                        # Guardar el título generado
-                        frontend_data["title"] = title_response.choices[
-                            0
-                        ].message.content.strip()
+                    # Si es el primer mensaje, generar un título corto basado en la transcripción
+                    if is_new_conversation or len(conversation["messages"]) == 0:
+                        title_source = (transcription, "audio")
+                        await OpenAIService.assign_title(conversation, *title_source)
 
                     # Eliminar el archivo temporal
                     os.unlink(temp_audio_path)
 
                     # Guardar la transcripción y la URL del audio en el historial
-                    # Para OpenAI
-                    openai_data["messages"].append(
+                    conversation["messages"].append(
                         {
-                            "role": "system",
-                            "content": f"[Audio transcrito: {audio_url}]",
-                        }
-                    )
-
-                    openai_data["messages"].append(
-                        {"role": "user", "content": message_content}
-                    )
-
-                    # Para Frontend
-                    frontend_data["messages"].append(
-                        {"role": "user", "content": f"URL del audio: {audio_url}"}
-                    )
-
-                    if user_instruction:
-                        frontend_data["messages"].append(
-                            {"role": "user", "content": user_instruction}
-                        )
-
-                    frontend_data["messages"].append(
-                        {
-                            "role": "system",
-                            "content": f"Transcripción del audio: {transcription}",
+                            "role": "user",
+                            "content": message_content,
+                            "audio_url": audio_url,
+                            "transcription": transcription,
+                            "instruction": user_instruction,
                         }
                     )
 
@@ -767,8 +884,8 @@ class OpenAIService:
                     return {
                         "error": "El formato del audio no es válido. Debe ser una cadena base64 válida o un archivo de audio.",
                         "id": conversation_id,
-                        "title": frontend_data.get("title", "Chat sin título"),
-                        "created_at": frontend_data.get(
+                        "title": conversation.get("title", "Chat sin título"),
+                        "created_at": conversation.get(
                             "created_at", "Fecha desconocida"
                         ),
                     }
@@ -776,8 +893,8 @@ class OpenAIService:
                     return {
                         "error": f"Error al procesar el audio: {str(e)}",
                         "id": conversation_id,
-                        "title": frontend_data.get("title", "Chat sin título"),
-                        "created_at": frontend_data.get(
+                        "title": conversation.get("title", "Chat sin título"),
+                        "created_at": conversation.get(
                             "created_at", "Fecha desconocida"
                         ),
                     }
@@ -785,52 +902,43 @@ class OpenAIService:
                 return {
                     "error": f"Tipo de entrada no soportado: {input_type}",
                     "id": conversation_id,
-                    "title": frontend_data.get("title", "Chat sin título"),
-                    "created_at": frontend_data.get("created_at", "Fecha desconocida"),
+                    "title": conversation.get("title", "Chat sin título"),
+                    "created_at": conversation.get("created_at", "Fecha desconocida"),
                 }
 
             # Agregar la respuesta al historial
-            openai_data["messages"].append(
+            conversation["messages"].append(
                 {"role": "assistant", "content": assistant_message}
             )
 
-            frontend_data["messages"].append(
-                {"role": "assistant", "content": assistant_message}
+            # Guardar el resumen acumulado junto con la conversación
+            summary = ContextService.get_summary(conversation_id)
+            if summary:
+                conversation["summary"] = summary
+
+            # Guardar la conversación actualizada y añadir los nuevos mensajes al historial del modelo
+            await asyncio.to_thread(
+                OpenAIService.save_conversation, conversation_id, conversation, saved_count
             )
+            OpenAIService.get_model_history(conversation_id, conversation)
 
-            # Guardar la conversación actualizada
-            OpenAIService.save_conversation(conversation_id, openai_data, frontend_data)
+            # Generar el título definitivo fuera del camino crítico
+            if title_source:
+                OpenAIService.schedule_title_update(conversation_id, *title_source)
 
             # Preparar la respuesta
             response_data = {
                 "respuesta": assistant_message,
                 "id": conversation_id,
-                "title": frontend_data.get("title", "Chat sin título"),
-                "created_at": frontend_data.get("created_at", "Fecha desconocida"),
+                "title": conversation.get("title", "Chat sin título"),
+                "created_at": conversation.get("created_at", "Fecha desconocida"),
             }
 
-            # Añadir URL de S3 si existe (para imágenes o audio)
-            if input_type == InputType.IMAGE:
-                # Buscar la URL de la imagen en el último mensaje del usuario
-                for m in reversed(frontend_data["messages"]):
-                    if (
-                        m["role"] == "user"
-                        and isinstance(m["content"], str)
-                        and m["content"].startswith("http")
-                    ):
-                        response_data["media_url"] = m["content"]
-                        break
-            elif input_type == InputType.AUDIO:
-                # Buscar la URL del audio en los mensajes del usuario
-                for m in reversed(frontend_data["messages"]):
-                    if (
-                        m["role"] == "user"
-                        and isinstance(m["content"], str)
-                        and m["content"].startswith("URL del audio:")
-                    ):
-                        audio_url = m["content"].split("URL del audio: ")[1]
-                        response_data["media_url"] = audio_url
-                        break
+            # Añadir URL de S3 si existe (para imágenes o audio), tomada del mensaje del usuario
+            user_message = conversation["messages"][-2]
+            media_url = user_message.get("image_url") or user_message.get("audio_url")
+            if media_url:
+                response_data["media_url"] = media_url
 
             return response_data
 
@@ -839,14 +947,18 @@ class OpenAIService:
                 "error": str(e),
                 "id": conversation_id,
                 "title": (
-                    frontend_data.get("title", "Chat sin título")
-                    if "frontend_data" in locals()
+                    conversation.get("title", "Chat sin título")
+                    if "conversation" in locals()
                     else "Chat sin título"
                 ),
                 "created_at": (
-                    frontend_data.get("created_at", "Fecha desconocida")
-                    if "frontend_data" in locals()
+                    conversation.get("created_at", "Fecha desconocida")
+                    if "conversation" in locals()
                     else "Fecha desconocida"
                 ),
                 "media_url": None,
             }
+
+
+# Historial en formato del modelo memorizado por conversación
+model_views = ProjectionCache(OpenAIService._project_messages)
@@ -0,0 +1,232 @@
+import re
+import math
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# Palabras del texto: secuencias de letras y dígitos (como el tokenizador unicode61 de SQLite)
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# Marcas de los términos encontrados en los fragmentos y número de palabras del fragmento
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_WORDS = 12
+
+# Parámetros de la puntuación BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def normalize_token(token: str) -> str:
+    """Pasa una palabra a minúsculas y le quita las tildes."""
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Divide un texto en palabras normalizadas."""
+    return [normalize_token(match.group()) for match in WORD_PATTERN.finditer(text or "")]
+
+
+def fts_query(query: str) -> Optional[str]:
+    """
+    Convierte la consulta del usuario en una consulta FTS5: todas las palabras deben
+    aparecer y la última se busca como prefijo (búsqueda mientras se escribe).
+
+    Returns:
+        Consulta FTS5, o None si la consulta no tiene palabras.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return None
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def snippet(text: str, terms: List[str], prefix: str = "") -> str:
+    """
+    Extrae un fragmento del texto alrededor del primer término encontrado, con los
+    términos marcados (mismo formato que la función snippet de FTS5).
+
+    Args:
+        text: Texto del mensaje.
+        terms: Términos normalizados de la consulta.
+        prefix: Término buscado como prefijo (opcional).
+
+    Returns:
+        Fragmento con los términos entre HIGHLIGHT_OPEN y HIGHLIGHT_CLOSE.
+    """
+    words = list(WORD_PATTERN.finditer(text))
+    wanted = set(terms)
+
+    def matches(word: str) -> bool:
+        token = normalize_token(word)
+        return token in wanted or bool(prefix and token.startswith(prefix))
+
+    if not words:
+        return text
+    first = next((i for i, word in enumerate(words) if matches(word.group())), 0)
+    start = max(0, min(first - SNIPPET_WORDS // 4, len(words) - SNIPPET_WORDS))
+    end = min(len(words), start + SNIPPET_WORDS)
+
+    parts = [SNIPPET_ELLIPSIS] if start > 0 else []
+    position = words[start].start() if start > 0 else 0
+    for word in words[start:end]:
+        parts.append(text[position : word.start()])
+        if matches(word.group()):
+            parts.append(f"{HIGHLIGHT_OPEN}{word.group()}{HIGHLIGHT_CLOSE}")
+        else:
+            parts.append(word.group())
+        position = word.end()
+    if end < len(words):
+        parts.append(SNIPPET_ELLIPSIS)
+    else:
+        parts.append(text[position:])
+    return "".join(parts)
+
+
+class InvertedIndex:
+    """
+    Índice invertido en memoria de los mensajes de las conversaciones, con
+    puntuación BM25. Se construye una vez y se actualiza con cada mensaje nuevo
+    o conversación eliminada.
+    """
+
+    def __init__(self):
+        # Término -> {(conversación, secuencia): frecuencia}
+        self._postings: Dict[str, Dict[Tuple[int, int], int]] = {}
+        # Vocabulario ordenado para las búsquedas por prefijo
+        self._vocabulary: List[str] = []
+        # (conversación, secuencia) -> (texto, rol, número de palabras)
+        self._documents: Dict[Tuple[int, int], Tuple[str, str, int]] = {}
+        self._conversations: Dict[int, List[int]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, conversation_id: int, seq: int, role: str, text: str) -> None:
+        """
+        Indexa un mensaje.
+
+        Args:
+            conversation_id: ID de la conversación.
+            seq: Posición del mensaje en la conversación.
+            role: Rol del mensaje.
+            text: Texto indexable del mensaje.
+        """
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        key = (conversation_id, seq)
+        with self._lock:
+            if key in self._documents:
+                return
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    insort(self._vocabulary, token)
+                postings[key] = count
+            self._documents[key] = (text, role, len(tokens))
+            self._conversations.setdefault(conversation_id, []).append(seq)
+            self._total_length += len(tokens)
+
+    def remove_conversation(self, conversation_id: int) -> None:
+        """Elimina del índice todos los mensajes de una conversación."""
+        with self._lock:
+            for seq in self._conversations.pop(conversation_id, []):
+                key = (conversation_id, seq)
+                text, _, length = self._documents.pop(key)
+                self._total_length -= length
+                for token in set(tokenize(text)):
+                    postings = self._postings.get(token)
+                    if postings is not None:
+                        postings.pop(key, None)
+
+    def _prefix_postings(self, prefix: str) -> Dict[Tuple[int, int], int]:
+        """Une las listas de los términos que empiezan por el prefijo."""
+        merged: Dict[Tuple[int, int], int] = {}
+        i = bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            for key, count in self._postings[self._vocabulary[i]].items():
+                merged[key] = merged.get(key, 0) + count
+            i += 1
+        return merged
+
+    def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> Tuple[List[dict], Optional[int]]:
+        """
+        Busca los mensajes que contienen todas las palabras de la consulta (la última
+        como prefijo), ordenados por relevancia.
+
+        Args:
+            query: Texto de la consulta.
+            limit: Número máximo de resultados.
+            offset: Número de resultados a saltar (paginación).
+
+        Returns:
+            Tupla (resultados con "id", "seq", "role", "snippet" y "score"; posición
+            de la página siguiente o None si no hay más).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return [], None
+        exact, prefix = terms[:-1], terms[-1]
+
+        with self._lock:
+            term_postings = [self._postings.get(term, {}) for term in exact]
+            term_postings.append(self._prefix_postings(prefix))
+            if not all(term_postings):
+                return [], None
+
+            # Intersección empezando por la lista más corta
+            ordered = sorted(term_postings, key=len)
+            candidates = set(ordered[0])
+            for postings in ordered[1:]:
+                candidates.intersection_update(postings)
+                if not candidates:
+                    return [], None
+
+            total = len(self._documents)
+            average_length = self._total_length / total
+            idf = [
+                math.log((total - len(p) + 0.5) / (len(p) + 0.5) + 1) for p in term_postings
+            ]
+
+            def score(key: Tuple[int, int]) -> float:
+                length = self._documents[key][2]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                return sum(
+                    weight * p[key] * (BM25_K1 + 1) / (p[key] + norm)
+                    for weight, p in zip(idf, term_postings)
+                )
+
+            ranked = heapq.nlargest(
+                offset + limit + 1,
+                ((score(key), key) for key in candidates),
+                key=lambda item: (item[0], item[1][0], -item[1][1]),
+            )
+            page = [
+                (value, key, self._documents[key]) for value, key in ranked[offset : offset + limit]
+            ]
+
+        results = [
+            {
+                "id": key[0],
+                "seq": key[1],
+                "role": role,
+                "snippet": snippet(text, exact, prefix),
+                "score": round(value, 4),
+            }
+            for value, key, (text, role, _) in page
+        ]
+        next_offset = offset + limit if len(ranked) > offset + limit else None
+        return results, next_offset
+
+    def __len__(self) -> int:
+        return len(self._documents)
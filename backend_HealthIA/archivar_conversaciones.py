@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+
+from app.services.conversation_store import (
+    CHAT_ARCHIVE_DIR,
+    CHAT_ARCHIVE_IDLE_DAYS,
+    CHAT_STORE_BACKEND,
+    CHAT_STORE_PATH,
+    ArchivedConversationStore,
+    JsonConversationStore,
+    JsonlConversationStore,
+    SqliteConversationStore,
+)
+
+
+def format_bytes(size: int) -> str:
+    """Formatea un tamaño en bytes de forma legible."""
+    if size < 1024:
+        return f"{size} B"
+    for unit in ["KB", "MB", "GB"]:
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+
+
+def main():
+    """
+    Archiva las conversaciones inactivas en el archivo comprimido (lo mismo que hace
+    el archivador en segundo plano) y muestra el ahorro de disco.
+    """
+    parser = argparse.ArgumentParser(
+        description="Archiva las conversaciones inactivas en segmentos comprimidos."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["sqlite", "jsonl", "json"],
+        default=CHAT_STORE_BACKEND,
+        help="Almacén principal de las conversaciones",
+    )
+    parser.add_argument(
+        "--days",
+        type=float,
+        default=CHAT_ARCHIVE_IDLE_DAYS,
+        help="Días sin mensajes tras los que se archiva una conversación",
+    )
+    parser.add_argument(
+        "--archive-dir", default=str(CHAT_ARCHIVE_DIR), help="Directorio del archivo"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Mostrar solo las métricas del archivo, sin archivar",
+    )
+    args = parser.parse_args()
+
+    if args.backend == "json":
+        backend = JsonConversationStore()
+    elif args.backend == "jsonl":
+        backend = JsonlConversationStore()
+    else:
+        backend = SqliteConversationStore(CHAT_STORE_PATH)
+    store = ArchivedConversationStore(
+        backend, args.archive_dir, idle_days=args.days, interval=0
+    )
+
+    if not args.stats:
+        summary = store.archive_idle()
+        print(f"Conversaciones archivadas: {summary['archived']}")
+        if summary["archived"]:
+            saved = summary["original_bytes"] - summary["compressed_bytes"]
+            print(
+                f"Tamaño: {format_bytes(summary['original_bytes'])} -> "
+                f"{format_bytes(summary['compressed_bytes'])} "
+                f"({format_bytes(saved)} ahorrados)"
+            )
+
+    stats = store.archive_stats()
+    store.close()
+    print(
+        f"Archivo: {stats['conversations']} conversaciones en {stats['segments']} segmentos, "
+        f"{format_bytes(stats['original_bytes'])} sin comprimir, "
+        f"{format_bytes(stats['disk_bytes'])} en disco ({stats['savings']:.0%} de ahorro)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import argparse
+
+from herramientas.semantic_cache import CALIBRATION_PAIRS, calibration_report
+
+
+def load_pairs(path: str) -> list:
+    """
+    Carga pares de preguntas etiquetados de un archivo JSONL con los campos
+    "pregunta_a", "pregunta_b" y "equivalentes" (true si admiten la misma respuesta).
+    """
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            pairs.append(
+                (
+                    record["pregunta_a"],
+                    record["pregunta_b"],
+                    bool(record["equivalentes"]),
+                )
+            )
+    return pairs
+
+
+def main():
+    """
+    Evalúa umbrales de la caché semántica sobre pares de preguntas etiquetados y
+    muestra, para cada uno, la fracción de preguntas equivalentes que se
+    reutilizarían y cuántas preguntas distintas recibirían una respuesta ajena.
+    """
+    parser = argparse.ArgumentParser(
+        description="Calibra SEMANTIC_CACHE_THRESHOLD con pares de preguntas."
+    )
+    parser.add_argument(
+        "--pairs",
+        help="Archivo JSONL de pares etiquetados (por defecto, los pares incluidos)",
+    )
+    parser.add_argument(
+        "--no-builtin",
+        action="store_true",
+        help="No añadir los pares incluidos en herramientas/semantic_cache.py",
+    )
+    args = parser.parse_args()
+
+    pairs = [] if args.no_builtin else list(CALIBRATION_PAIRS)
+    if args.pairs:
+        pairs += load_pairs(args.pairs)
+    if not pairs:
+        print("Error: No hay pares para evaluar.")
+        return
+
+    print(f"Pares evaluados: {len(pairs)}\n")
+    print(f"{'umbral':>7} {'reutilizadas':>13} {'falsos aciertos':>16}")
+    thresholds = [round(0.5 + 0.05 * i, 2) for i in range(10)]
+    for row in calibration_report(pairs, thresholds):
+        print(
+            f"{row['threshold']:>7.2f} {row['recall']:>12.0%} "
+            f"{row['false_hits']:>9} ({row['false_hit_rate']:.0%})"
+        )
+    print(
+        "\nFija en SEMANTIC_CACHE_THRESHOLD un umbral sin falsos aciertos, "
+        "con algo de margen."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from herramientas.medical_agent import MedicalAgent
+import asyncio
 import json
 import os
 from datetime import datetime
@@ -72,7 +73,7 @@ def main():
     # Realizar una consulta médica
     print("\nRealizando consulta médica...")
     consulta = "¿Cuáles son mis medicamentos y para qué sirven?"
-    respuesta = agent.process_with_user_data(consulta)
+    respuesta = asyncio.run(agent.process_with_user_data(consulta))
     print(f"Respuesta: {respuesta}\n")
 
     # Añadir un nuevo estudio médico de ejemplo
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import random
+
+from herramientas.intent_classifier import (
+    INTENT_CLASSIFIER_THRESHOLD,
+    INTENT_MODEL_PATH,
+    ROUTING_LOG_PATH,
+    SEED_EXAMPLES,
+    IntentClassifier,
+    confusion_matrix,
+    format_confusion_matrix,
+    load_routing_log,
+)
+
+
+def main():
+    """
+    Entrena el clasificador local de intenciones con las decisiones de
+    enrutamiento registradas y muestra la matriz de confusión.
+    """
+    parser = argparse.ArgumentParser(
+        description="Entrena el clasificador local de intenciones del supervisor."
+    )
+    parser.add_argument(
+        "--log", default=ROUTING_LOG_PATH, help="Archivo JSONL de decisiones"
+    )
+    parser.add_argument(
+        "--output", default=INTENT_MODEL_PATH, help="Archivo donde guardar el modelo"
+    )
+    parser.add_argument(
+        "--test-split",
+        type=float,
+        default=0.2,
+        help="Fracción de ejemplos reservada para evaluación",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=INTENT_CLASSIFIER_THRESHOLD,
+        help="Confianza mínima para resolver sin el LLM",
+    )
+    parser.add_argument(
+        "--include-local",
+        action="store_true",
+        help="Incluir también las decisiones tomadas por el propio clasificador",
+    )
+    parser.add_argument(
+        "--no-seed", action="store_true", help="No usar los ejemplos iniciales"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Semilla aleatoria")
+    args = parser.parse_args()
+
+    sources = ("llm", "local") if args.include_local else ("llm",)
+    logged = load_routing_log(args.log, sources)
+    print(f"Decisiones registradas cargadas: {len(logged)} ({args.log})")
+
+    random.Random(args.seed).shuffle(logged)
+    n_test = int(len(logged) * args.test_split)
+    test, train = logged[:n_test], logged[n_test:]
+    if not args.no_seed:
+        train = train + SEED_EXAMPLES
+
+    if not train:
+        print("Error: No hay ejemplos de entrenamiento.")
+        return
+
+    # Evaluar sobre las decisiones reservadas (o sobre el entrenamiento si no hay suficientes)
+    classifier = IntentClassifier().fit(train)
+    if test:
+        print(f"\nEvaluación sobre {len(test)} decisiones reservadas:\n")
+        report = confusion_matrix(classifier, test, args.threshold)
+    else:
+        print("\nNo hay decisiones suficientes para reservar; evaluación sobre entrenamiento:\n")
+        report = confusion_matrix(classifier, train, args.threshold)
+    print(format_confusion_matrix(report))
+
+    # Entrenar el modelo final con todos los ejemplos disponibles
+    final_examples = logged + ([] if args.no_seed else SEED_EXAMPLES)
+    IntentClassifier().fit(final_examples).save(args.output)
+    print(f"\nModelo guardado en: {args.output} ({len(final_examples)} ejemplos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
+import asyncio
 import json
 import os
-from openai import OpenAI
 from herramientas.meal_plan_generator import MealPlanGenerator
+from herramientas.llm_client import get_async_client
 from dotenv import load_dotenv
 
 # Cargar variables de entorno (para obtener OPENAI_API_KEY)
@@ -39,7 +40,7 @@ def generar_plan_alimenticio():
         )
         return
 
-    client = OpenAI(api_key=api_key)
+    client = get_async_client(api_key)
 
     # Cargar datos del usuario
     try:
@@ -55,7 +56,7 @@ def generar_plan_alimenticio():
 
     # Generar el plan alimenticio
     print("Generando plan alimenticio...")
-    meal_plan = meal_plan_generator.generate_meal_plan(user_data)
+    meal_plan = asyncio.run(meal_plan_generator.generate_meal_plan(user_data))
 
     # Guardar el plan generado
     try:
@@ -5,6 +5,7 @@ from herramientas.exercise_agent import ExerciseAgent
 import os
 import json
 import sys
+import asyncio
 from dotenv import load_dotenv
 
 
@@ -86,7 +87,9 @@ def main():
 
         print("\nGenerando plan de ejercicio semanal personalizado...")
         # Generar y guardar el plan de ejercicio semanal
-        resultado = agente.generar_plan_semanal_ejercicio(datos_usuario, instrucciones)
+        resultado = asyncio.run(
+            agente.generar_plan_semanal_ejercicio(datos_usuario, instrucciones)
+        )
 
         # Mostrar el resultado
         print(resultado)
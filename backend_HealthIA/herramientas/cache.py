@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Caché en memoria acotada con política LRU y expiración por tiempo (TTL).
+    Lleva contadores de aciertos y fallos para medir su efectividad.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_size: Número máximo de entradas; al superarlo se descarta la menos usada.
+            ttl: Segundos de validez de cada entrada. None para no expirar.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Obtiene el valor asociado a la clave si existe y no ha expirado.
+
+        Args:
+            key: Clave de la entrada.
+
+        Returns:
+            El valor almacenado, o None si no existe o expiró.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Guarda un valor en la caché.
+
+        Args:
+            key: Clave de la entrada.
+            value: Valor a guardar.
+            ttl: TTL específico de la entrada; por defecto se usa el de la caché.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Elimina una entrada, si existe."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Elimina todas las entradas (los contadores se conservan)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve las métricas de la caché.
+
+        Returns:
+            Diccionario con tamaño, aciertos, fallos, expulsiones y tasa de aciertos.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def file_version(paths: Iterable[str]) -> Tuple:
+    """
+    Calcula una versión de un conjunto de archivos a partir de su fecha de
+    modificación y tamaño. Cambia cada vez que alguno de ellos se modifica.
+
+    Args:
+        paths: Rutas de los archivos.
+
+    Returns:
+        Tupla comparable; los archivos inexistentes se representan con None.
+    """
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append((path, None))
+    return tuple(version)
+
+
+def data_fingerprint(data: Any) -> str:
+    """
+    Calcula una huella estable de un diccionario de datos (por ejemplo, el perfil del usuario).
+    """
+    serialized = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
+# Agentes cuyas respuestas no se pueden cachear. El agente médico registra cada
+# consulta en medical_info.json y las incluye en el contexto de las siguientes: un
+# acierto dejaría la consulta sin registrar y la escritura cambia la versión del
+# archivo, así que sus respuestas nunca se reutilizarían.
+UNCACHEABLE_AGENTS = {"medico"}
+
+
+def parse_agent_ttls(value: str) -> Dict[str, float]:
+    """
+    Interpreta una lista de agentes con TTL con el formato "nutricion=600,ejercicio=300".
+    Un agente sin TTL explícito usa 600 segundos.
+
+    Raises:
+        ValueError: Si la lista incluye un agente que no se puede cachear.
+    """
+    ttls: Dict[str, float] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, ttl = item.partition("=")
+        name = name.strip()
+        if name in UNCACHEABLE_AGENTS:
+            raise ValueError(
+                f"Las respuestas del agente '{name}' no se pueden cachear: quítalo "
+                "de RESPONSE_CACHE_AGENTS y SEMANTIC_CACHE_AGENTS"
+            )
+        ttls[name] = float(ttl) if ttl.strip() else 600.0
+    return ttls
+
+
+class ResponseCache:
+    """
+    Caché de respuestas de los agentes especializados, activada agente por agente.
+    Cada entrada queda ligada a la versión de los archivos y datos de los que depende
+    la respuesta, por lo que se invalida sola cuando estos cambian.
+    """
+
+    def __init__(self, agent_ttls: Dict[str, float], max_size: int = 256):
+        """
+        Inicializa la caché.
+
+        Args:
+            agent_ttls: TTL en segundos de cada agente con caché activada.
+            max_size: Número máximo de respuestas almacenadas.
+        """
+        self.agent_ttls = agent_ttls
+        self._cache = TTLCache(max_size=max_size, ttl=None)
+
+    def enabled_for(self, agent_name: str) -> bool:
+        """Indica si el agente tiene la caché de respuestas activada."""
+        return agent_name in self.agent_ttls
+
+    def get(self, agent_name: str, user_input: str, version: Hashable) -> Optional[str]:
+        """
+        Obtiene la respuesta guardada para la consulta y versión indicadas.
+
+        Args:
+            agent_name: Nombre del agente.
+            user_input: Consulta enviada al agente.
+            version: Versión de los datos de los que depende la respuesta.
+
+        Returns:
+            La respuesta almacenada, o None si no existe o expiró.
+        """
+        return self._cache.get((agent_name, user_input, version))
+
+    def set(self, agent_name: str, user_input: str, version: Hashable, response: str) -> None:
+        """
+        Guarda la respuesta de un agente con el TTL configurado para él.
+        """
+        self._cache.set(
+            (agent_name, user_input, version), response, self.agent_ttls[agent_name]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve las métricas de la caché y los agentes activados."""
+        stats = self._cache.stats()
+        stats["agents"] = self.agent_ttls
+        return stats
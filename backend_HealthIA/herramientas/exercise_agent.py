@@ -1,6 +1,8 @@
-from openai import OpenAI
+from herramientas.file_lock import atomic_write_json
+from herramientas.image_preprocessing import VISION_DETAIL, prepare_image
+from herramientas.llm_client import generate_text, get_async_client
 import os
-import base64
+import asyncio
 import json
 from datetime import datetime
 from typing import Dict, Any, Optional
@@ -24,9 +26,9 @@ class ExerciseAgent:
                 "Se requiere una clave API de OpenAI. Proporciónela como argumento o establezca la variable de entorno OPENAI_API_KEY."
             )
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_async_client(self.api_key)
 
-    def process(self, user_input: str) -> str:
+    async def process(self, user_input: str) -> str:
         """
         Procesa la consulta del usuario relacionada con ejercicios.
 
@@ -51,7 +53,8 @@ class ExerciseAgent:
         sugiere ejercicios específicos con instrucciones detalladas.
         """
 
-        response = self.client.chat.completions.create(
+        return await generate_text(
+            self.client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -59,9 +62,7 @@ class ExerciseAgent:
             ],
         )
 
-        return response.choices[0].message.content or ""
-
-    def process_with_user_data(self, user_input: str, user_data: Dict[str, Any]) -> str:
+    async def process_with_user_data(self, user_input: str, user_data: Dict[str, Any]) -> str:
         """
         Procesa la consulta del usuario utilizando sus datos personales para proporcionar
         información sobre ejercicios personalizada.
@@ -102,7 +103,8 @@ class ExerciseAgent:
         para que sean seguras y apropiadas para el usuario.
         """
 
-        response = self.client.chat.completions.create(
+        return await generate_text(
+            self.client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -110,9 +112,7 @@ class ExerciseAgent:
             ],
         )
 
-        return response.choices[0].message.content or ""
-
-    def generar_plan_semanal_ejercicio(
+    async def generar_plan_semanal_ejercicio(
         self, user_data: Dict[str, Any], instrucciones_adicionales: str = ""
     ) -> str:
         """
@@ -191,7 +191,7 @@ class ExerciseAgent:
 
         try:
             print("Enviando solicitud a OpenAI para generar plan de ejercicio...")
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -225,9 +225,8 @@ class ExerciseAgent:
 
             # Guardar el plan como archivo JSON
             print(f"Guardando archivo en: {ruta_archivo}")
-            with open(ruta_archivo, "w", encoding="utf-8") as archivo:
-                # Guardar JSON con formato para mejor legibilidad
-                json.dump(plan_data, archivo, ensure_ascii=False, indent=2)
+            # Guardar JSON con formato para mejor legibilidad (escritura atómica)
+            atomic_write_json(ruta_archivo, plan_data, ensure_ascii=False, indent=2)
 
             print(f"Archivo JSON guardado exitosamente en: {ruta_archivo}")
             return f"Plan de ejercicio semanal generado y guardado en: {ruta_archivo}"
@@ -237,20 +236,7 @@ class ExerciseAgent:
             print(error_msg)
             return error_msg
 
-    def encode_image_to_base64(self, image_path: str) -> str:
-        """
-        Codifica una imagen a base64 para el procesamiento por la API.
-
-        Args:
-            image_path: Ruta al archivo de imagen.
-
-        Returns:
-            Imagen codificada en base64.
-        """
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
-
-    def process_image(
+    async def process_image(
         self, image_path: str, user_prompt: Optional[str], user_data: Dict[str, Any]
     ) -> str:
         """
@@ -265,7 +251,9 @@ class ExerciseAgent:
             Respuesta generada por el agente de ejercicios sobre la imagen.
         """
         try:
-            base64_image = self.encode_image_to_base64(image_path)
+            prepared_image = await asyncio.to_thread(
+                prepare_image, image_path, VISION_DETAIL
+            )
         except Exception as e:
             return f"Error al procesar la imagen: {str(e)}"
 
@@ -313,16 +301,13 @@ class ExerciseAgent:
                 "role": "user",
                 "content": [
                     {"type": "text", "text": user_text_prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    prepared_image.content_part(),
                 ],
             },
         ]
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini", messages=messages
+        return await generate_text(
+            self.client,
+            model="gpt-4o-mini",
+            messages=messages,
         )
-
-        return response.choices[0].message.content or ""
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+# Bloqueos entre procesos con flock (POSIX). Si no está disponible (Windows), solo se
+# garantiza la exclusión entre hilos del mismo proceso.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Intervalo entre intentos al esperar un bloqueo de forma asíncrona
+LOCK_POLL_INTERVAL = 0.02
+
+# Bloqueos por ruta dentro del proceso (solo sin fcntl) y bloqueos asíncronos por ruta
+_thread_locks: Dict[str, threading.Lock] = {}
+_async_locks: Dict[str, asyncio.Lock] = {}
+_registry_lock = threading.Lock()
+# Bloqueos que ya tiene cada hilo (file_lock es reentrante dentro de un mismo hilo)
+_held = threading.local()
+
+
+def lock_path_for(path: str) -> str:
+    """Ruta del archivo de bloqueo asociado a un archivo de datos."""
+    return f"{path}.lock"
+
+
+def _open_lock_file(lock_path: str) -> int:
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+
+def _thread_lock(lock_path: str) -> threading.Lock:
+    with _registry_lock:
+        return _thread_locks.setdefault(lock_path, threading.Lock())
+
+
+@contextmanager
+def file_lock(lock_path: str, timeout: Optional[float] = None):
+    """
+    Bloqueo exclusivo entre procesos (y entre hilos) sobre un archivo de bloqueo.
+    Si el hilo ya tiene el bloqueo, se reutiliza.
+
+    Args:
+        lock_path: Ruta del archivo de bloqueo (se crea si no existe).
+        timeout: Segundos máximos de espera; None para esperar indefinidamente.
+
+    Raises:
+        TimeoutError: Si no se obtiene el bloqueo dentro del tiempo indicado.
+    """
+    held = _held.__dict__.setdefault("paths", {})
+    if held.get(lock_path):
+        held[lock_path] += 1
+        try:
+            yield
+        finally:
+            held[lock_path] -= 1
+        return
+
+    if fcntl is None:
+        lock = _thread_lock(lock_path)
+        if not lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"No se pudo bloquear {lock_path}")
+        held[lock_path] = 1
+        try:
+            yield
+        finally:
+            held[lock_path] = 0
+            lock.release()
+        return
+
+    fd = _open_lock_file(lock_path)
+    try:
+        if timeout is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"No se pudo bloquear {lock_path}")
+                    time.sleep(LOCK_POLL_INTERVAL)
+        held[lock_path] = 1
+        try:
+            yield
+        finally:
+            held[lock_path] = 0
+    finally:
+        # Cerrar el descriptor libera el bloqueo
+        os.close(fd)
+
+
+@asynccontextmanager
+async def async_file_lock(lock_path: str, timeout: Optional[float] = None):
+    """
+    Versión asíncrona de file_lock: espera sin bloquear el bucle de eventos. Dentro
+    del proceso las tareas se ordenan con un asyncio.Lock y entre procesos con flock.
+
+    Args:
+        lock_path: Ruta del archivo de bloqueo (se crea si no existe).
+        timeout: Segundos máximos de espera; None para esperar indefinidamente.
+
+    Raises:
+        TimeoutError: Si no se obtiene el bloqueo dentro del tiempo indicado.
+    """
+    with _registry_lock:
+        lock = _async_locks.setdefault(lock_path, asyncio.Lock())
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        await asyncio.wait_for(lock.acquire(), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"No se pudo bloquear {lock_path}")
+
+    try:
+        if fcntl is None:
+            yield
+            return
+
+        fd = _open_lock_file(lock_path)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise TimeoutError(f"No se pudo bloquear {lock_path}")
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+            yield
+        finally:
+            os.close(fd)
+    finally:
+        lock.release()
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """
+    Escribe un archivo de forma atómica: se escribe en un temporal del mismo
+    directorio, se fuerza a disco y se renombra sobre el destino. Un lector ve
+    siempre el archivo anterior o el nuevo, nunca uno a medias.
+
+    Args:
+        path: Ruta del archivo.
+        text: Contenido.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs) -> None:
+    """
+    Guarda datos en JSON de forma atómica (ver atomic_write_text).
+
+    Args:
+        path: Ruta del archivo.
+        data: Datos serializables.
+        **dump_kwargs: Opciones de json.dumps (ensure_ascii, indent...).
+    """
+    atomic_write_text(path, json.dumps(data, **dump_kwargs))
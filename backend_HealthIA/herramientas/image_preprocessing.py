@@ -0,0 +1,220 @@
+import os
+import base64
+import logging
+from io import BytesIO
+from typing import Dict, Optional, Union
+
+from PIL import Image, ImageOps
+from dotenv import load_dotenv
+
+# Configurar logger
+logger = logging.getLogger("image_preprocessing")
+logger.setLevel(logging.INFO)
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Preparación de las imágenes que se envían al modelo de visión: se orientan según
+# su EXIF, se reducen hasta un lado mayor máximo y se recodifican en JPEG. Con "low"
+# el modelo trabaja a 512x512 como máximo, así que no se envía más resolución.
+VISION_PREPROCESS_ENABLED = (
+    os.getenv("VISION_PREPROCESS_ENABLED", "True").lower() == "true"
+)
+VISION_MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", 1536))
+VISION_LOW_MAX_EDGE = int(os.getenv("VISION_LOW_MAX_EDGE", 512))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", 85))
+# Nivel de detalle de visión: el de las respuestas y análisis de imágenes y el de la
+# clasificación del supervisor, que solo decide qué agente responde
+VISION_DETAIL = os.getenv("VISION_DETAIL", "high").lower()
+VISION_ROUTING_DETAIL = os.getenv("VISION_ROUTING_DETAIL", "low").lower()
+
+# Formatos que se pueden enviar sin recodificar si ya son más pequeños
+PASSTHROUGH_FORMATS = {"JPEG", "PNG", "WEBP"}
+
+# Etiqueta EXIF de orientación y valores que intercambian ancho y alto
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class PreparedImage:
+    """
+    Imagen lista para el modelo de visión, con la escala respecto a la imagen original
+    (ya orientada) para llevar a ella las coordenadas que devuelva el modelo.
+    """
+
+    def __init__(
+        self,
+        data: bytes,
+        mime: str,
+        size: tuple,
+        original_size: tuple,
+        detail: str,
+        encoded: Optional[str] = None,
+    ):
+        self.data = data
+        self.mime = mime
+        self.width, self.height = size
+        self.original_width, self.original_height = original_size
+        self.detail = detail
+        self._base64 = encoded
+
+    @property
+    def base64(self) -> str:
+        """Imagen codificada en base64 (se calcula una sola vez)."""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("ascii")
+        return self._base64
+
+    def data_url(self) -> str:
+        return f"data:{self.mime};base64,{self.base64}"
+
+    def content_part(self) -> dict:
+        """Parte de mensaje "image_url" para la API de OpenAI."""
+        return {
+            "type": "image_url",
+            "image_url": {"url": self.data_url(), "detail": self.detail},
+        }
+
+    def to_original(self, coords: Dict[str, float]) -> Dict[str, int]:
+        """
+        Lleva unas coordenadas (x1, y1, x2, y2) de la imagen enviada a la original.
+
+        Args:
+            coords: Coordenadas en píxeles de la imagen enviada.
+
+        Returns:
+            Coordenadas enteras en píxeles de la imagen original.
+        """
+        scale_x = self.original_width / self.width
+        scale_y = self.original_height / self.height
+        return {
+            key: round(float(value) * (scale_x if key.startswith("x") else scale_y))
+            for key, value in coords.items()
+        }
+
+
+def _max_edge(detail: str) -> int:
+    return VISION_LOW_MAX_EDGE if detail == "low" else VISION_MAX_EDGE
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Convierte a RGB; las zonas transparentes quedan sobre fondo blanco."""
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def prepare_image(
+    source: Union[str, bytes, Image.Image],
+    detail: str = VISION_DETAIL,
+    source_bytes: Optional[bytes] = None,
+    source_base64: Optional[str] = None,
+) -> PreparedImage:
+    """
+    Prepara una imagen para el modelo de visión: la orienta según su EXIF, la reduce
+    a VISION_MAX_EDGE (VISION_LOW_MAX_EDGE con detalle "low") y la recodifica en JPEG.
+    Si la imagen original ya es más pequeña y no hay que girarla ni reducirla, se
+    envía tal cual. Si no se puede procesar, también se envía tal cual.
+
+    Args:
+        source: Ruta del archivo, bytes de la imagen o imagen ya abierta. Una imagen
+            abierta se orienta en el sitio y no se cierra, para poder seguir usándola.
+        detail: Nivel de detalle de visión ("low", "high" o "auto").
+        source_bytes: Bytes originales de una imagen ya abierta (opcional).
+        source_base64: Bytes originales ya codificados en base64 (opcional).
+
+    Returns:
+        Imagen preparada.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source_bytes = f.read()
+    elif not isinstance(source, Image.Image):
+        source_bytes = source
+
+    image = None
+    try:
+        if isinstance(source, Image.Image):
+            image = source
+        else:
+            image = Image.open(BytesIO(source_bytes))
+        source_format = image.format
+        if not VISION_PREPROCESS_ENABLED and source_bytes is not None:
+            return PreparedImage(
+                source_bytes,
+                f"image/{(source_format or 'jpeg').lower()}",
+                image.size,
+                image.size,
+                detail,
+                source_base64,
+            )
+
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        width, height = image.size
+        if orientation in ROTATED_ORIENTATIONS:
+            width, height = height, width
+        scale = min(1.0, _max_edge(detail) / max(width, height))
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+        if scale < 1 and source is not image and source_format == "JPEG":
+            # Decodificar el JPEG directamente a una escala reducida (más rápido y
+            # con menos memoria); el tamaño pedido va en la orientación sin girar
+            draft_size = target[::-1] if orientation in ROTATED_ORIENTATIONS else target
+            image.draft("RGB", draft_size)
+
+        ImageOps.exif_transpose(image, in_place=True)
+        resized = image
+        if scale < 1:
+            resized = image.resize(target, Image.LANCZOS, reducing_gap=3.0)
+        rgb = _to_rgb(resized)
+
+        buffer = BytesIO()
+        rgb.save(buffer, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+        data = buffer.getvalue()
+        if rgb is not image:
+            rgb.close()
+        if resized is not image and resized is not rgb:
+            resized.close()
+
+        if (
+            source_bytes is not None
+            and scale == 1
+            and orientation == 1
+            and source_format in PASSTHROUGH_FORMATS
+            and len(source_bytes) <= len(data)
+        ):
+            # La recodificación no reduce el tamaño: se envía la original
+            return PreparedImage(
+                source_bytes,
+                f"image/{source_format.lower()}",
+                target,
+                target,
+                detail,
+                source_base64,
+            )
+
+        original_bytes = len(source_bytes) if source_bytes is not None else "?"
+        logger.info(
+            f"Imagen preparada para visión: {width}x{height} -> "
+            f"{target[0]}x{target[1]}, {original_bytes} -> {len(data)} bytes "
+            f"(detalle {detail})"
+        )
+        return PreparedImage(data, "image/jpeg", target, (width, height), detail)
+    except Exception as e:
+        if source_bytes is None:
+            raise
+        logger.warning(
+            f"No se pudo preparar la imagen para visión, se envía sin cambios: {str(e)}"
+        )
+        size = image.size if image is not None else (1, 1)
+        return PreparedImage(
+            source_bytes, "image/jpeg", size, size, detail, source_base64
+        )
+    finally:
+        if image is not None and image is not source:
+            image.close()
@@ -0,0 +1,446 @@
+import os
+import re
+import json
+import math
+import zlib
+import queue
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from herramientas.file_lock import atomic_write_json
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configuración del clasificador local de intenciones. Está desactivado por defecto:
+# el modelo inicial solo conoce SEED_EXAMPLES y Naive Bayes da confianzas muy altas
+# incluso cuando se equivoca; se activa tras entrenarlo con decisiones registradas
+INTENT_CLASSIFIER_ENABLED = (
+    os.getenv("INTENT_CLASSIFIER_ENABLED", "False").lower() == "true"
+)
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", 0.95))
+INTENT_MODEL_PATH = os.getenv(
+    "INTENT_MODEL_PATH", os.path.join("data_usuario", "intent_model.json")
+)
+# Registro de decisiones de enrutamiento (guarda el texto de las consultas, que puede
+# incluir datos médicos, por lo que solo se activa de forma explícita)
+ROUTING_LOG_ENABLED = os.getenv("ROUTING_LOG_ENABLED", "False").lower() == "true"
+ROUTING_LOG_PATH = os.getenv(
+    "ROUTING_LOG_PATH", os.path.join("data_usuario", "routing_log.jsonl")
+)
+
+LABELS = ["nutricion", "ejercicio", "medico", "ninguno"]
+
+# Número de posiciones del espacio de características (hashing trick)
+N_FEATURES = 2**18
+
+# Ejemplos iniciales para que el clasificador funcione sin decisiones registradas
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("¿qué puedo comer hoy?", "nutricion"),
+    ("dame una receta saludable para la cena", "nutricion"),
+    ("quiero una dieta para bajar de peso", "nutricion"),
+    ("¿cuántas calorías tiene una manzana?", "nutricion"),
+    ("hazme un plan alimenticio semanal", "nutricion"),
+    ("¿qué alimentos tienen más proteína?", "nutricion"),
+    ("cuál es el menú de hoy", "nutricion"),
+    ("¿es bueno desayunar avena?", "nutricion"),
+    ("ideas de comidas sin gluten", "nutricion"),
+    ("¿cuántos carbohidratos debo consumir al día?", "nutricion"),
+    ("qué puedo cenar que sea ligero", "nutricion"),
+    ("recomiéndame snacks saludables", "nutricion"),
+    ("dame una rutina de ejercicios para principiantes", "ejercicio"),
+    ("quiero ganar masa muscular en el gimnasio", "ejercicio"),
+    ("¿cuántas veces a la semana debo entrenar?", "ejercicio"),
+    ("hazme un plan de entrenamiento semanal", "ejercicio"),
+    ("ejercicios para fortalecer la espalda", "ejercicio"),
+    ("¿es mejor correr o nadar para el cardio?", "ejercicio"),
+    ("rutina de pesas para piernas", "ejercicio"),
+    ("cómo mejorar mi resistencia corriendo", "ejercicio"),
+    ("estiramientos antes de hacer deporte", "ejercicio"),
+    ("quiero empezar a hacer yoga", "ejercicio"),
+    ("cuántas series y repeticiones hago de sentadillas", "ejercicio"),
+    ("actividad física para adultos mayores", "ejercicio"),
+    ("me duele la cabeza desde ayer", "medico"),
+    ("¿qué medicamento puedo tomar para la fiebre?", "medico"),
+    ("tengo síntomas de gripe", "medico"),
+    ("¿el ibuprofeno tiene efectos secundarios?", "medico"),
+    ("¿cuáles son mis condiciones médicas?", "medico"),
+    ("qué dice mi historial médico", "medico"),
+    ("tengo la presión alta, ¿es peligroso?", "medico"),
+    ("¿qué es la diabetes tipo 2?", "medico"),
+    ("me salió una alergia en la piel", "medico"),
+    ("¿puedo tomar paracetamol con mis medicamentos?", "medico"),
+    ("tengo dolor de estómago y náuseas", "medico"),
+    ("cuáles fueron los resultados de mis análisis", "medico"),
+    ("hola, ¿cómo estás?", "ninguno"),
+    ("¿quién ganó el partido de fútbol?", "ninguno"),
+    ("cuéntame un chiste", "ninguno"),
+    ("¿qué hora es?", "ninguno"),
+    ("ayúdame con mi tarea de matemáticas", "ninguno"),
+    ("¿cuál es la capital de Francia?", "ninguno"),
+    ("recomiéndame una película", "ninguno"),
+    ("escribe un poema de amor", "ninguno"),
+    ("¿cómo está el clima mañana?", "ninguno"),
+    ("gracias", "ninguno"),
+    ("programa una función en python", "ninguno"),
+    ("¿qué precio tiene el dólar hoy?", "ninguno"),
+]
+
+# Indicios de que la consulta habla de la salud o los datos del propio usuario: en
+# ese caso decide el LLM, que es quien detecta si hay que actualizar sus datos
+PERSONAL_DATA_PATTERN = re.compile(
+    r"\b(yo|me|mi|mis|tengo|tuve|padezco|sufro|estoy|soy|peso|mido|tomo|llevo)\b|\d"
+)
+
+# Las decisiones se escriben en un hilo aparte para no bloquear el bucle de eventos
+_log_queue: "queue.Queue[Tuple[str, dict]]" = queue.Queue()
+_log_thread: Optional[threading.Thread] = None
+_log_lock = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un texto para clasificación: minúsculas, sin acentos y con
+    espacios colapsados.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def may_contain_personal_data(text: str) -> bool:
+    """Indica si la consulta puede referirse a datos personales del usuario."""
+    return bool(PERSONAL_DATA_PATTERN.search(normalize_text(text)))
+
+
+def extract_features(text: str) -> Dict[int, int]:
+    """
+    Convierte un texto en un vector disperso de características con hashing.
+    Usa unigramas y bigramas de palabras y n-gramas de 4 caracteres por palabra,
+    lo que tolera plurales y variaciones de conjugación.
+
+    Args:
+        text: Texto de entrada.
+
+    Returns:
+        Diccionario {índice de característica: frecuencia}.
+    """
+    words = re.findall(r"\w+", normalize_text(text))
+    tokens = [f"w:{w}" for w in words]
+    tokens += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        tokens += [f"c:{padded[i:i + 4]}" for i in range(max(len(padded) - 3, 1))]
+
+    features: Dict[int, int] = {}
+    for token in tokens:
+        index = zlib.crc32(token.encode("utf-8")) % N_FEATURES
+        features[index] = features.get(index, 0) + 1
+    return features
+
+
+class IntentClassifier:
+    """
+    Clasificador Naive Bayes multinomial sobre n-gramas con hashing.
+    Decide en microsegundos a qué agente derivar una consulta de texto.
+    """
+
+    def __init__(self, alpha: float = 0.5):
+        """
+        Inicializa un clasificador vacío.
+
+        Args:
+            alpha: Suavizado de Laplace para las frecuencias de características.
+        """
+        self.alpha = alpha
+        self.class_counts: Dict[str, int] = {label: 0 for label in LABELS}
+        self.feature_counts: Dict[str, Dict[int, int]] = {label: {} for label in LABELS}
+        self.feature_totals: Dict[str, int] = {label: 0 for label in LABELS}
+
+    @property
+    def is_trained(self) -> bool:
+        """Indica si el clasificador tiene ejemplos de entrenamiento."""
+        return sum(self.class_counts.values()) > 0
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "IntentClassifier":
+        """
+        Entrena el clasificador con pares (texto, etiqueta). Las etiquetas
+        desconocidas se ignoran.
+
+        Args:
+            examples: Pares (texto, etiqueta).
+
+        Returns:
+            El propio clasificador entrenado.
+        """
+        for text, label in examples:
+            if label not in self.class_counts:
+                continue
+            self.class_counts[label] += 1
+            counts = self.feature_counts[label]
+            for index, count in extract_features(text).items():
+                counts[index] = counts.get(index, 0) + count
+                self.feature_totals[label] += count
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """
+        Calcula la probabilidad posterior de cada etiqueta para un texto.
+
+        Args:
+            text: Texto de entrada.
+
+        Returns:
+            Diccionario {etiqueta: probabilidad}.
+        """
+        features = extract_features(text)
+        total_docs = sum(self.class_counts.values())
+        scores: Dict[str, float] = {}
+        for label in LABELS:
+            prior = (self.class_counts[label] + 1) / (total_docs + len(LABELS))
+            denominator = self.feature_totals[label] + self.alpha * N_FEATURES
+            counts = self.feature_counts[label]
+            score = math.log(prior)
+            for index, count in features.items():
+                score += count * math.log((counts.get(index, 0) + self.alpha) / denominator)
+            scores[label] = score
+
+        best = max(scores.values())
+        exp_scores = {label: math.exp(score - best) for label, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {label: value / total for label, value in exp_scores.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Predice la etiqueta más probable para un texto.
+
+        Args:
+            text: Texto de entrada.
+
+        Returns:
+            Tupla (etiqueta, confianza).
+        """
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def save(self, path: str = INTENT_MODEL_PATH) -> None:
+        """
+        Guarda el modelo entrenado en un archivo JSON.
+
+        Args:
+            path: Ruta del archivo de destino.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "alpha": self.alpha,
+            "n_features": N_FEATURES,
+            "class_counts": self.class_counts,
+            "feature_counts": {
+                label: {str(index): count for index, count in counts.items()}
+                for label, counts in self.feature_counts.items()
+            },
+            "trained_at": datetime.now().isoformat(),
+        }
+        atomic_write_json(path, data)
+
+    @classmethod
+    def load(cls, path: str = INTENT_MODEL_PATH) -> "IntentClassifier":
+        """
+        Carga un modelo entrenado desde un archivo JSON.
+
+        Args:
+            path: Ruta del archivo del modelo.
+
+        Returns:
+            Clasificador cargado.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("n_features") != N_FEATURES:
+            raise ValueError("El modelo fue entrenado con otro tamaño de hashing")
+
+        classifier = cls(alpha=data.get("alpha", 0.5))
+        for label in LABELS:
+            classifier.class_counts[label] = data["class_counts"].get(label, 0)
+            counts = {
+                int(index): count
+                for index, count in data["feature_counts"].get(label, {}).items()
+            }
+            classifier.feature_counts[label] = counts
+            classifier.feature_totals[label] = sum(counts.values())
+        return classifier
+
+    @classmethod
+    def load_or_seed(cls, path: str = INTENT_MODEL_PATH) -> "IntentClassifier":
+        """
+        Carga el modelo entrenado si existe; en caso contrario entrena uno con
+        los ejemplos iniciales.
+
+        Args:
+            path: Ruta del archivo del modelo.
+
+        Returns:
+            Clasificador listo para predecir.
+        """
+        if os.path.exists(path):
+            try:
+                return cls.load(path)
+            except Exception as e:
+                print(f"Error al cargar el modelo de intenciones: {str(e)}")
+        return cls().fit(SEED_EXAMPLES)
+
+
+def _write_routing_log() -> None:
+    """Hilo que escribe en disco las decisiones encoladas."""
+    while True:
+        path, record = _log_queue.get()
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Error al registrar la decisión de enrutamiento: {str(e)}")
+        finally:
+            _log_queue.task_done()
+
+
+def log_routing_decision(
+    text: str,
+    agent: str,
+    source: str,
+    confidence: Optional[float] = None,
+    personal_data: bool = False,
+    path: str = ROUTING_LOG_PATH,
+) -> None:
+    """
+    Registra una decisión de enrutamiento en el archivo JSONL de decisiones, si
+    ROUTING_LOG_ENABLED está activado. La escritura se hace en un hilo aparte.
+    Las decisiones del LLM sirven como ejemplos de entrenamiento del clasificador.
+
+    Args:
+        text: Consulta del usuario.
+        agent: Agente seleccionado.
+        source: Origen de la decisión ('llm' o 'local').
+        confidence: Confianza de la decisión, si se conoce.
+        personal_data: Si la consulta se refiere a datos médicos personales.
+        path: Ruta del archivo de registro.
+    """
+    global _log_thread
+    if not ROUTING_LOG_ENABLED:
+        return
+
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "text": text,
+        "agente": agent,
+        "datos_personales": personal_data,
+        "confianza": confidence,
+        "source": source,
+    }
+    with _log_lock:
+        if _log_thread is None:
+            _log_thread = threading.Thread(
+                target=_write_routing_log, name="routing-log", daemon=True
+            )
+            _log_thread.start()
+    _log_queue.put((path, record))
+
+
+def load_routing_log(
+    path: str = ROUTING_LOG_PATH, sources: Iterable[str] = ("llm",)
+) -> List[Tuple[str, str]]:
+    """
+    Lee las decisiones registradas como ejemplos (texto, etiqueta).
+
+    Args:
+        path: Ruta del archivo de registro.
+        sources: Orígenes de decisión a incluir. Por defecto solo las del LLM,
+            para no reentrenar el clasificador con sus propias predicciones.
+
+    Returns:
+        Lista de pares (texto, etiqueta).
+    """
+    examples: List[Tuple[str, str]] = []
+    if not os.path.exists(path):
+        return examples
+
+    sources = set(sources)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("source") in sources and record.get("agente") in LABELS:
+                examples.append((record["text"], record["agente"]))
+    return examples
+
+
+def confusion_matrix(
+    classifier: IntentClassifier,
+    examples: Iterable[Tuple[str, str]],
+    threshold: float = INTENT_CLASSIFIER_THRESHOLD,
+) -> Dict[str, object]:
+    """
+    Evalúa el clasificador y calcula la matriz de confusión.
+
+    Args:
+        classifier: Clasificador entrenado.
+        examples: Pares (texto, etiqueta real).
+        threshold: Confianza mínima para resolver sin el LLM.
+
+    Returns:
+        Diccionario con la matriz ('matrix'[real][predicha]), la exactitud total,
+        la cobertura (fracción resuelta localmente sobre el umbral) y la exactitud
+        dentro de esa cobertura.
+    """
+    matrix = {real: {pred: 0 for pred in LABELS} for real in LABELS}
+    total = correct = covered = covered_correct = 0
+    for text, label in examples:
+        if label not in matrix:
+            continue
+        predicted, confidence = classifier.predict(text)
+        matrix[label][predicted] += 1
+        total += 1
+        correct += predicted == label
+        if confidence >= threshold:
+            covered += 1
+            covered_correct += predicted == label
+
+    return {
+        "matrix": matrix,
+        "total": total,
+        "accuracy": correct / total if total else 0.0,
+        "coverage": covered / total if total else 0.0,
+        "covered_accuracy": covered_correct / covered if covered else 0.0,
+    }
+
+
+def format_confusion_matrix(report: Dict[str, object]) -> str:
+    """
+    Formatea el informe de confusion_matrix como tabla de texto.
+    """
+    width = max(len(label) for label in LABELS) + 2
+    lines = ["real \\ pred".ljust(width) + "".join(l.rjust(width) for l in LABELS)]
+    for real in LABELS:
+        row = report["matrix"][real]
+        lines.append(
+            real.ljust(width) + "".join(str(row[pred]).rjust(width) for pred in LABELS)
+        )
+    lines.append("")
+    lines.append(f"Ejemplos evaluados: {report['total']}")
+    lines.append(f"Exactitud: {report['accuracy']:.1%}")
+    lines.append(
+        f"Resueltos sin LLM (cobertura): {report['coverage']:.1%} "
+        f"con exactitud {report['covered_accuracy']:.1%}"
+    )
+    return "\n".join(lines)
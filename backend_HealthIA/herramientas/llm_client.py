@@ -0,0 +1,176 @@
+import os
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+# Configurar logger
+logger = logging.getLogger("llm_client")
+logger.setLevel(logging.INFO)
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configuración del pool de conexiones HTTP compartido
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 10))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "True").lower() == "true"
+
+# Un cliente por API key, compartido por todos los agentes y servicios del proceso
+_clients: Dict[str, AsyncOpenAI] = {}
+_clients_lock = threading.Lock()
+
+# Cola a la que se envían los fragmentos de texto cuando la petición actual es en streaming
+_stream_sink: ContextVar[Optional[asyncio.Queue]] = ContextVar(
+    "llm_stream_sink", default=None
+)
+
+
+def _http2_available() -> bool:
+    """Indica si el paquete h2 está instalado (requerido por httpx para HTTP/2)."""
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def _http2_enabled() -> bool:
+    """Indica si el cliente HTTP usará HTTP/2: configurado y con h2 instalado."""
+    return OPENAI_HTTP2 and _http2_available()
+
+
+def _build_http_client(http2: bool) -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP con límites de conexiones, timeouts y keep-alive.
+
+    Args:
+        http2: Activar HTTP/2 (ver _http2_enabled).
+    """
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    )
+
+
+def get_async_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Obtiene el cliente asíncrono de OpenAI compartido para la API key indicada.
+    La primera llamada crea el cliente y su pool de conexiones; las siguientes lo reutilizan.
+
+    Args:
+        api_key: Clave API de OpenAI. Si no se proporciona, se usa OPENAI_API_KEY.
+
+    Returns:
+        Instancia de AsyncOpenAI compartida.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            http2 = _http2_enabled()
+            if OPENAI_HTTP2 and not http2:
+                logger.warning(
+                    "Paquete 'h2' no disponible, se usará HTTP/1.1 con keep-alive"
+                )
+            client = AsyncOpenAI(
+                api_key=api_key or None,
+                http_client=_build_http_client(http2),
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            _clients[api_key] = client
+            logger.info(
+                f"Cliente OpenAI compartido creado (max_connections={OPENAI_MAX_CONNECTIONS}, "
+                f"keepalive={OPENAI_MAX_KEEPALIVE_CONNECTIONS}, http2={http2})"
+            )
+        return client
+
+
+async def close_clients() -> None:
+    """
+    Cierra todos los clientes compartidos y sus conexiones HTTP.
+    Se invoca al apagar la aplicación.
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Error al cerrar el cliente OpenAI: {str(e)}")
+
+
+def set_stream_sink(queue: Optional[asyncio.Queue]) -> Token:
+    """
+    Activa el modo streaming para el contexto actual (y las tareas creadas desde él).
+    Las respuestas generadas con generate_text enviarán sus fragmentos a la cola.
+
+    Args:
+        queue: Cola que recibirá los fragmentos de texto, o None para desactivar.
+
+    Returns:
+        Token para restaurar el estado anterior con reset_stream_sink.
+    """
+    return _stream_sink.set(queue)
+
+
+def reset_stream_sink(token: Token) -> None:
+    """Restaura el estado de streaming previo a set_stream_sink."""
+    _stream_sink.reset(token)
+
+
+def emit_text(text: str) -> None:
+    """
+    Envía un fragmento de texto al cliente si la petición actual es en streaming.
+    Se usa para prefijos que no provienen del modelo (por ejemplo "[Agente de Nutricion] ").
+    """
+    queue = _stream_sink.get()
+    if queue is not None and text:
+        queue.put_nowait(text)
+
+
+async def generate_text(client: AsyncOpenAI, **kwargs) -> str:
+    """
+    Genera una respuesta de chat y devuelve su texto completo.
+    Si la petición actual es en streaming, solicita la respuesta por fragmentos y
+    los reenvía al cliente a medida que llegan.
+
+    Args:
+        client: Cliente asíncrono de OpenAI.
+        **kwargs: Parámetros de chat.completions.create (model, messages, ...).
+
+    Returns:
+        Texto completo de la respuesta del modelo.
+    """
+    queue = _stream_sink.get()
+    if queue is None:
+        response = await client.chat.completions.create(**kwargs)
+        return response.choices[0].message.content or ""
+
+    parts = []
+    stream = await client.chat.completions.create(stream=True, **kwargs)
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            queue.put_nowait(delta)
+    return "".join(parts)
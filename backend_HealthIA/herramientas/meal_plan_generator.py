@@ -1,7 +1,7 @@
 import json
 import os
 from typing import Dict, Any, List, Optional
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 
 class MealPlanGenerator:
@@ -10,13 +10,13 @@ class MealPlanGenerator:
     basado en un catálogo de comidas disponibles y datos del usuario.
     """
 
-    def __init__(self, meals_json_path: str, client: OpenAI):
+    def __init__(self, meals_json_path: str, client: AsyncOpenAI):
         """
         Inicializa el generador de planes alimenticios.
 
         Args:
             meals_json_path: Ruta al archivo JSON de comidas (ej: "data/meals.json").
-            client: Cliente de OpenAI inicializado.
+            client: Cliente asíncrono de OpenAI inicializado.
         """
         self.meals_json_path = meals_json_path
         self.client = client
@@ -47,7 +47,7 @@ class MealPlanGenerator:
             )
             return []
 
-    def generate_meal_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_meal_plan(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Genera un plan alimenticio personalizado para el usuario utilizando la IA de OpenAI.
 
@@ -154,7 +154,7 @@ class MealPlanGenerator:
 
         try:
             print("Generando plan alimenticio con IA...")
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -185,7 +185,7 @@ class MealPlanGenerator:
             print(f"Error inesperado durante la llamada a la API de OpenAI: {str(e)}")
             return {"error": f"Error inesperado al generar el plan: {str(e)}"}
 
-    def generate_meal_plan_json(self, user_data: Dict[str, Any]) -> str:
+    async def generate_meal_plan_json(self, user_data: Dict[str, Any]) -> str:
         """
         Genera un plan alimenticio personalizado para el usuario utilizando IA
         y lo devuelve en formato JSON (string).
@@ -197,7 +197,7 @@ class MealPlanGenerator:
             Plan alimenticio personalizado en formato JSON (string),
             o un JSON de error si falla la generación.
         """
-        meal_plan_dict = self.generate_meal_plan(user_data)
+        meal_plan_dict = await self.generate_meal_plan(user_data)
         return json.dumps(meal_plan_dict, ensure_ascii=False, indent=2)
 
 
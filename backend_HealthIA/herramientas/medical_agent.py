@@ -1,11 +1,28 @@
-from openai import OpenAI
+from herramientas.file_lock import atomic_write_json, file_lock, lock_path_for
+from herramientas.image_preprocessing import VISION_DETAIL, prepare_image
+from herramientas.llm_client import generate_text, get_async_client
 import os
-import base64
+import asyncio
 import json
+import functools
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
 
+def _medical_info_locked(method):
+    """
+    Ejecuta el método con el archivo de información médica bloqueado, para que las
+    lecturas-modificaciones-escrituras de varios workers no se pisen.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with file_lock(lock_path_for(self.medical_info_path)):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class MedicalAgent:
     """
     Agente especializado en proporcionar información y orientación sobre temas médicos y de salud.
@@ -31,7 +48,7 @@ class MedicalAgent:
                 "Se requiere una clave API de OpenAI. Proporciónela como argumento o establezca la variable de entorno OPENAI_API_KEY."
             )
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_async_client(self.api_key)
         self.user_data_dir = user_data_dir
         self.medical_info_file = medical_info_file
         self.medical_info_path = os.path.join(
@@ -41,6 +58,13 @@ class MedicalAgent:
         # Crear el directorio de datos de usuario si no existe
         os.makedirs(self.user_data_dir, exist_ok=True)
 
+    def cache_dependencies(self) -> List[str]:
+        """
+        Archivos de los que dependen las respuestas del agente (para invalidar cachés).
+        """
+        return [self.medical_info_path]
+
+    @_medical_info_locked
     def _save_user_medical_data(self, user_data: Dict[str, Any]) -> str:
         """
         Guarda los datos médicos del usuario en el archivo medical_info.json.
@@ -140,8 +164,9 @@ class MedicalAgent:
                 "%Y-%m-%d %H:%M:%S"
             )
 
-        with open(self.medical_info_path, "w", encoding="utf-8") as f:
-            json.dump(user_data_to_save, f, ensure_ascii=False, indent=2)
+        atomic_write_json(
+            self.medical_info_path, user_data_to_save, ensure_ascii=False, indent=2
+        )
 
         return self.medical_info_path
 
@@ -167,6 +192,7 @@ class MedicalAgent:
             print(f"Error al cargar los datos médicos: {str(e)}")
             return None
 
+    @_medical_info_locked
     def add_medical_record(
         self, user_id: Optional[str] = None, medical_record: Dict[str, Any] = None
     ) -> bool:
@@ -241,14 +267,15 @@ class MedicalAgent:
 
         # Guardar los datos actualizados directamente
         try:
-            with open(self.medical_info_path, "w", encoding="utf-8") as f:
-                json.dump(historial_actualizado, f, ensure_ascii=False, indent=2)
+            atomic_write_json(
+                self.medical_info_path, historial_actualizado, ensure_ascii=False, indent=2
+            )
             return True
         except Exception as e:
             print(f"Error al guardar el registro médico: {str(e)}")
             return False
 
-    def process(self, user_input: str) -> str:
+    async def process(self, user_input: str) -> str:
         """
         Procesa la consulta del usuario relacionada con temas médicos y de salud.
 
@@ -277,7 +304,8 @@ class MedicalAgent:
         buscar atención médica inmediata.
         """
 
-        response = self.client.chat.completions.create(
+        return await generate_text(
+            self.client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -285,35 +313,30 @@ class MedicalAgent:
             ],
         )
 
-        return response.choices[0].message.content or ""
-
-    def process_with_user_data(
-        self,
-        user_input: str,
-        user_data: Optional[Dict[str, Any]] = None,
-        consult_history: bool = True,
-    ) -> str:
+    @_medical_info_locked
+    def _register_consultation(
+        self, user_input: str, user_data: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
         """
-        Procesa la consulta del usuario utilizando los datos del archivo medical_info.json.
+        Registra la consulta en el historial médico, con el archivo bloqueado.
 
         Args:
-            user_input: Texto de entrada del usuario.
-            user_data: Diccionario con datos adicionales del usuario (opcional).
-            consult_history: Si es True, consultará el historial médico completo.
+            user_input: Texto de la consulta.
+            user_data: Datos del usuario que se usan si no hay historial (opcional).
 
         Returns:
-            Respuesta generada por el agente médico, contextualizada con los datos del usuario.
+            Historial médico con la consulta añadida, o None si no hay datos médicos.
         """
         # Obtener los datos médicos existentes
         medical_history = self.get_user_medical_data()
 
-        # Si no hay datos médicos, retornar un mensaje
+        # Si no hay datos médicos, no se registra nada
         if not medical_history:
             if user_data:
                 # Si no hay datos médicos pero se proporcionan datos de usuario, usarlos
                 medical_history = user_data
             else:
-                return "No se encontraron datos médicos para consultar. Por favor, proporciona tu información médica primero."
+                return None
 
         # Registrar la consulta actual sin modificar los datos personales del usuario
         consulta_actual = {
@@ -332,8 +355,35 @@ class MedicalAgent:
         )
 
         # Guardar solo la nueva consulta sin modificar datos personales
-        with open(self.medical_info_path, "w", encoding="utf-8") as f:
-            json.dump(historial_actualizado, f, ensure_ascii=False, indent=2)
+        atomic_write_json(
+            self.medical_info_path, historial_actualizado, ensure_ascii=False, indent=2
+        )
+        return medical_history
+
+    async def process_with_user_data(
+        self,
+        user_input: str,
+        user_data: Optional[Dict[str, Any]] = None,
+        consult_history: bool = True,
+    ) -> str:
+        """
+        Procesa la consulta del usuario utilizando los datos del archivo medical_info.json.
+
+        Args:
+            user_input: Texto de entrada del usuario.
+            user_data: Diccionario con datos adicionales del usuario (opcional).
+            consult_history: Si es True, consultará el historial médico completo.
+
+        Returns:
+            Respuesta generada por el agente médico, contextualizada con los datos del usuario.
+        """
+        # Leer el historial y registrar la consulta con el archivo bloqueado, en un
+        # hilo para que la espera del bloqueo no detenga el bucle de eventos
+        medical_history = await asyncio.to_thread(
+            self._register_consultation, user_input, user_data
+        )
+        if medical_history is None:
+            return "No se encontraron datos médicos para consultar. Por favor, proporciona tu información médica primero."
 
         # Preparar el historial de consultas para el contexto
         consultas_previas = ""
@@ -427,7 +477,8 @@ class MedicalAgent:
         del usuario, haz referencia a esta información en tu respuesta.
         """
 
-        response = self.client.chat.completions.create(
+        return await generate_text(
+            self.client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -435,22 +486,7 @@ class MedicalAgent:
             ],
         )
 
-        return response.choices[0].message.content or ""
-
-    def encode_image_to_base64(self, image_path: str) -> str:
-        """
-        Codifica una imagen a base64 para el procesamiento por la API.
-
-        Args:
-            image_path: Ruta al archivo de imagen.
-
-        Returns:
-            Imagen codificada en base64.
-        """
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
-
-    def process_image(
+    async def process_image(
         self,
         image_path: str,
         user_prompt: Optional[str] = None,
@@ -498,7 +534,9 @@ class MedicalAgent:
             medical_history = {}
 
         try:
-            base64_image = self.encode_image_to_base64(image_path)
+            prepared_image = await asyncio.to_thread(
+                prepare_image, image_path, VISION_DETAIL
+            )
         except Exception as e:
             return f"Error al procesar la imagen: {str(e)}"
 
@@ -564,20 +602,18 @@ class MedicalAgent:
                 "role": "user",
                 "content": [
                     {"type": "text", "text": user_text_prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    prepared_image.content_part(),
                 ],
             },
         ]
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini", messages=messages
+        content = await generate_text(
+            self.client,
+            model="gpt-4o-mini",
+            messages=messages,
         )
 
         # Añadir un descargo de responsabilidad estándar a la respuesta
         disclaimer = "\n\n[Nota importante: Esta información es educativa y no constituye un diagnóstico médico. Consulte siempre a un profesional de la salud calificado para una evaluación adecuada.]"
 
-        content = response.choices[0].message.content or ""
         return content + disclaimer
@@ -1,11 +1,33 @@
-from openai import OpenAI
+from herramientas.file_lock import atomic_write_json
+from herramientas.image_preprocessing import VISION_DETAIL, prepare_image
+from herramientas.llm_client import generate_text, get_async_client
 import os
-import base64
+import asyncio
 import json
 from typing import Dict, Any, Optional, List
 from herramientas.meal_plan_generator import MealPlanGenerator
 from datetime import datetime
 
+# Días reconocidos en consultas de menú y su nombre en inglés (clave del plan)
+MENU_DAYS = {
+    "lunes": "Monday",
+    "martes": "Tuesday",
+    "miércoles": "Wednesday",
+    "miercoles": "Wednesday",
+    "jueves": "Thursday",
+    "viernes": "Friday",
+    "sábado": "Saturday",
+    "sabado": "Saturday",
+    "domingo": "Sunday",
+    "monday": "Monday",
+    "tuesday": "Tuesday",
+    "wednesday": "Wednesday",
+    "thursday": "Thursday",
+    "friday": "Friday",
+    "saturday": "Saturday",
+    "sunday": "Sunday",
+}
+
 
 class NutritionAgent:
     """
@@ -37,7 +59,7 @@ class NutritionAgent:
                 "Se requiere una clave API de OpenAI. Proporciónela como argumento o establezca la variable de entorno OPENAI_API_KEY."
             )
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_async_client(self.api_key)
         self.meal_plan_generator = MealPlanGenerator(meals_js_path, self.client)
         self.data_dir = data_dir
         # Ruta fija para leer la información médica del usuario
@@ -88,14 +110,19 @@ class NutritionAgent:
         """
         self.meal_plan = meal_plan  # Actualizar en memoria
         try:
-            with open(self.meal_plan_path, "w", encoding="utf-8") as f:
-                json.dump(meal_plan, f, ensure_ascii=False, indent=2)
+            atomic_write_json(self.meal_plan_path, meal_plan, ensure_ascii=False, indent=2)
             print(f"Plan alimenticio guardado en: {self.meal_plan_path}")
         except Exception as e:
             print(
                 f"Error al guardar el plan alimenticio en {self.meal_plan_path}: {str(e)}"
             )
 
+    def cache_dependencies(self) -> List[str]:
+        """
+        Archivos de los que dependen las respuestas del agente (para invalidar cachés).
+        """
+        return [self.user_data_source_path, self.meal_plan_path]
+
     def get_current_user_data(self) -> Optional[Dict[str, Any]]:
         """
         Devuelve los datos del usuario actualmente cargados (desde medical_info.json).
@@ -254,18 +281,17 @@ class NutritionAgent:
         # Devolver con el formato solicitado
         return f"Este es tu menú de tu día {{{plan_name}}}\n\n{menu_content}"
 
-    def process(self, user_input: str) -> str:
+    def match_menu_request(self, user_input: str) -> Optional[str]:
         """
-        Procesa una consulta general del usuario sobre nutrición y alimentación.
-        Utiliza los datos cargados de medical_info.json para personalizar la respuesta si están disponibles.
+        Detecta si la consulta pide el menú de hoy o de un día concreto.
 
         Args:
             user_input: Texto de entrada del usuario.
 
         Returns:
-            Respuesta generada por el agente de nutrición.
+            "today" para el menú del día actual, el nombre del día en inglés
+            (por ejemplo "Monday") para un día concreto, o None si no es una consulta de menú.
         """
-        # Verificar si el usuario está pidiendo el menú del día actual
         lower_input = user_input.lower()
         if (
             "menú" in lower_input or "menu" in lower_input or "comida" in lower_input
@@ -274,65 +300,55 @@ class NutritionAgent:
             or "día actual" in lower_input
             or "dia actual" in lower_input
         ):
-            return self.get_today_menu()
+            return "today"
 
-        # Verificar si el usuario está pidiendo el menú de un día específico
-        dias_semana = [
-            "lunes",
-            "martes",
-            "miércoles",
-            "miercoles",
-            "jueves",
-            "viernes",
-            "sábado",
-            "sabado",
-            "domingo",
-            "monday",
-            "tuesday",
-            "wednesday",
-            "thursday",
-            "friday",
-            "saturday",
-            "sunday",
-        ]
-
-        for dia in dias_semana:
+        for dia, dia_traducido in MENU_DAYS.items():
             if dia in lower_input and (
                 "menú" in lower_input
                 or "menu" in lower_input
                 or "comida" in lower_input
                 or "plan" in lower_input
             ):
-                # Convertir nombre español a inglés si es necesario
-                if dia in [
-                    "lunes",
-                    "martes",
-                    "miércoles",
-                    "miercoles",
-                    "jueves",
-                    "viernes",
-                    "sábado",
-                    "sabado",
-                    "domingo",
-                ]:
-                    dia_traducido = {
-                        "lunes": "Monday",
-                        "martes": "Tuesday",
-                        "miércoles": "Wednesday",
-                        "miercoles": "Wednesday",
-                        "jueves": "Thursday",
-                        "viernes": "Friday",
-                        "sábado": "Saturday",
-                        "sabado": "Saturday",
-                        "domingo": "Sunday",
-                    }[dia]
-                    return self.get_daily_menu(dia_traducido)
-                else:
-                    return self.get_daily_menu(dia.capitalize())
+                return dia_traducido
+
+        return None
+
+    def answer_menu_request(self, user_input: str) -> Optional[str]:
+        """
+        Responde directamente una consulta de menú desde el plan alimenticio guardado.
+
+        Args:
+            user_input: Texto de entrada del usuario.
+
+        Returns:
+            El menú solicitado, o None si la consulta no es de menú.
+        """
+        day = self.match_menu_request(user_input)
+        if day is None:
+            return None
+        if day == "today":
+            return self.get_today_menu()
+        return self.get_daily_menu(day)
+
+    async def process(self, user_input: str) -> str:
+        """
+        Procesa una consulta general del usuario sobre nutrición y alimentación.
+        Utiliza los datos cargados de medical_info.json para personalizar la respuesta si están disponibles.
+
+        Args:
+            user_input: Texto de entrada del usuario.
+
+        Returns:
+            Respuesta generada por el agente de nutrición.
+        """
+        # Consultas del menú (hoy o un día concreto) se responden desde el plan guardado
+        menu_response = self.answer_menu_request(user_input)
+        if menu_response is not None:
+            return menu_response
 
         if self.user_data:
             # Usar el método con datos si existen
-            return self._process_with_loaded_user_data(user_input)
+            return await self._process_with_loaded_user_data(user_input)
         else:
             # Usar el método general si no hay datos
             print(
@@ -343,16 +359,16 @@ class NutritionAgent:
             saludable, nutrientes, dietas y recomendaciones alimentarias.
             Proporciona consejos claros, precisos y basados en evidencia científica.
             """
-            response = self.client.chat.completions.create(
+            return await generate_text(
+                self.client,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_input},
                 ],
             )
-            return response.choices[0].message.content or ""
 
-    def _process_with_loaded_user_data(self, user_input: str) -> str:
+    async def _process_with_loaded_user_data(self, user_input: str) -> str:
         """
         Procesa la consulta del usuario utilizando los datos cargados (medical_info.json).
         No guarda cambios en los datos del usuario.
@@ -372,7 +388,7 @@ class NutritionAgent:
             or "dieta" in user_input.lower()
             or "plan nutricional" in user_input.lower()
         ):
-            return self.create_meal_plan(
+            return await self.create_meal_plan(
                 user_input
             )  # Llama a crear plan con datos cargados
 
@@ -407,7 +423,8 @@ class NutritionAgent:
         No promueves dietas extremas o no saludables.
         """
 
-        response = self.client.chat.completions.create(
+        return await generate_text(
+            self.client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -415,22 +432,7 @@ class NutritionAgent:
             ],
         )
 
-        return response.choices[0].message.content or ""
-
-    def encode_image_to_base64(self, image_path: str) -> str:
-        """
-        Codifica una imagen a base64 para el procesamiento por la API.
-
-        Args:
-            image_path: Ruta al archivo de imagen.
-
-        Returns:
-            Imagen codificada en base64.
-        """
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
-
-    def process_image(self, image_path: str, user_prompt: Optional[str], *args) -> str:
+    async def process_image(self, image_path: str, user_prompt: Optional[str], *args) -> str:
         """
         Procesa una imagen relacionada con nutrición y alimentación utilizando los datos cargados del usuario.
 
@@ -445,7 +447,9 @@ class NutritionAgent:
             return "No se pueden procesar imágenes sin datos del usuario cargados (de medical_info.json)."
 
         try:
-            base64_image = self.encode_image_to_base64(image_path)
+            prepared_image = await asyncio.to_thread(
+                prepare_image, image_path, VISION_DETAIL
+            )
         except Exception as e:
             return f"Error al procesar la imagen: {str(e)}"
 
@@ -494,23 +498,19 @@ class NutritionAgent:
                 "role": "user",
                 "content": [
                     {"type": "text", "text": user_text_prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    prepared_image.content_part(),
                 ],
             },
         ]
 
-        response = self.client.chat.completions.create(
+        return await generate_text(
+            self.client,
             model="gpt-4o-mini",  # Considera gpt-4-vision-preview si necesitas análisis de imagen más potente
             messages=messages,
             max_tokens=1024,  # Ajusta según necesidad
         )
 
-        return response.choices[0].message.content or ""
-
-    def create_meal_plan(self, user_input: str) -> str:
+    async def create_meal_plan(self, user_input: str) -> str:
         """
         Crea un plan alimenticio personalizado basado en los datos del usuario cargados (medical_info.json).
         Guarda el plan generado en plan_alimenticio.json.
@@ -532,7 +532,7 @@ class NutritionAgent:
         print(
             f"Generando plan alimenticio con los datos de usuario: {list(self.user_data.keys())}"
         )
-        meal_plan_json = self.meal_plan_generator.generate_meal_plan_json(
+        meal_plan_json = await self.meal_plan_generator.generate_meal_plan_json(
             self.user_data
         )
 
@@ -583,7 +583,8 @@ class NutritionAgent:
         Menciona explícitamente cómo se han tenido en cuenta sus datos médicos.
         """
 
-        response = self.client.chat.completions.create(
+        explanation = await generate_text(
+            self.client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -597,8 +598,6 @@ Explica este plan de manera clara y concisa, indicando cómo considera mi salud.
             ],
         )
 
-        explanation = response.choices[0].message.content or ""
-
         # Añadir mensaje informativo sobre dónde se guardó el plan
         save_message = f"\n\nTu plan alimenticio ha sido guardado en formato JSON y se puede consultar en: {self.meal_plan_path}"
         save_message += "\nPuedes consultar tu plan completo con 'get_weekly_menu()' o un día específico con 'get_daily_menu(día)'."
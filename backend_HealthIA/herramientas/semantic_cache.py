@@ -0,0 +1,354 @@
+import re
+import time
+import zlib
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from herramientas.intent_classifier import normalize_text
+
+
+# Palabras que invierten o restringen el sentido de la pregunta. Cambian muy pocos
+# n-gramas ("qué puedo comer" / "qué no puedo comer"), así que no entran en el
+# vector: dos preguntas solo se comparan si tienen las mismas (y las mismas cifras)
+NEGATION_WORDS = {
+    "no", "ni", "nunca", "jamas", "tampoco", "nada", "sin", "ningun", "ninguna",
+    "ninguno", "evitar", "evito", "evita", "prohibido", "prohibida", "prohibidos",
+    "prohibidas",
+}
+
+# Palabras sin contenido propio en las preguntas (artículos, preposiciones, verbos
+# modales...): "qué como hoy" y "qué debería comer hoy" piden lo mismo
+STOPWORDS = {
+    "que", "el", "la", "los", "las", "lo", "un", "una", "unos", "unas", "de", "del",
+    "a", "al", "en", "y", "o", "u", "e", "para", "por", "con", "me", "mi", "mis",
+    "te", "tu", "tus", "se", "le", "les", "es", "son", "hay", "esta", "este", "esto",
+    "debo", "deberia", "puedo", "podria", "quiero", "querria", "seria", "sera",
+    "tengo", "tiene", "tienen", "cual", "cuales", "algo", "alguna", "algun", "favor",
+    "dame", "dime", "hacer", "hago", "haga", "recomiendame", "recomienda", "mas",
+    "muy",
+}
+
+# Terminaciones que se recortan para unir formas de la misma palabra
+# (comer/como/comes, cena/cenar, ejercicio/ejercicios)
+SUFFIXES = sorted(
+    [
+        "amos", "emos", "imos", "aron", "ieron", "ando", "iendo", "ados", "idos",
+        "adas", "idas", "ado", "ido", "ada", "ida", "aria", "eria", "iria", "ar",
+        "er", "ir", "as", "es", "os", "an", "en", "o", "a", "e", "s",
+    ],
+    key=len,
+    reverse=True,
+)
+
+# Pares de preguntas con los que se calibró SEMANTIC_CACHE_THRESHOLD: equivalentes
+# (True) o con distinta respuesta (False). Con ellos, las equivalentes quedan por
+# encima de 0.77 (salvo sinónimos como sana/saludable) y las distintas por debajo de
+# 0.63; las que solo difieren en una negación o una cifra nunca se comparan
+CALIBRATION_PAIRS: List[Tuple[str, str, bool]] = [
+    ("qué como hoy", "qué debería comer hoy", True),
+    ("qué puedo comer hoy", "qué debería comer hoy", True),
+    ("dame una receta saludable para la cena", "receta sana para cenar", True),
+    ("¿cuántas calorías tiene una manzana?", "calorías de una manzana", True),
+    (
+        "rutina de ejercicios para principiantes",
+        "dame una rutina de ejercicio para principiantes",
+        True,
+    ),
+    ("¿qué alimentos tienen más proteína?", "alimentos con más proteínas", True),
+    (
+        "ejercicios para fortalecer la espalda",
+        "qué ejercicios fortalecen la espalda",
+        True,
+    ),
+    ("¿es bueno desayunar avena?", "es bueno comer avena en el desayuno", True),
+    ("cómo bajar de peso rápido", "cómo puedo bajar de peso rápido", True),
+    ("ideas de cenas ligeras", "ideas para cenar ligero", True),
+    (
+        "cuántos vasos de agua debo beber al día",
+        "cuánta agua debo beber al día",
+        True,
+    ),
+    ("qué puedo comer antes de entrenar", "qué comer antes del entrenamiento", True),
+    (
+        "estiramientos para después de correr",
+        "qué estiramientos hago después de correr",
+        True,
+    ),
+    (
+        "snacks saludables para el trabajo",
+        "recomiéndame snacks saludables para el trabajo",
+        True,
+    ),
+    ("cuántas horas debo dormir", "cuántas horas tengo que dormir", True),
+    ("qué puedo comer hoy", "qué no puedo comer hoy", False),
+    ("puedo comer pan", "no puedo comer pan", False),
+    ("receta con gluten", "receta sin gluten", False),
+    ("dieta de 1500 calorías", "dieta de 2000 calorías", False),
+    ("ejercicios para las piernas", "ejercicios para los brazos", False),
+    ("calorías de una manzana", "calorías de un plátano", False),
+    ("qué comer antes de entrenar", "qué comer después de entrenar", False),
+    ("cómo bajar de peso", "cómo subir de peso", False),
+    ("dieta alta en proteínas", "dieta baja en proteínas", False),
+    ("receta para la cena", "receta para el desayuno", False),
+    ("rutina de ejercicios para principiantes", "rutina de ejercicios avanzada", False),
+    (
+        "cuántas calorías debo comer al día",
+        "cuántas proteínas debo comer al día",
+        False,
+    ),
+    ("qué puedo comer hoy", "qué puedo cenar hoy", False),
+    ("es bueno correr todos los días", "es bueno nadar todos los días", False),
+    ("alimentos ricos en hierro", "alimentos ricos en calcio", False),
+    ("cuánta agua debo beber", "cuánto café debo beber", False),
+]
+
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def query_signature(text: str) -> int:
+    """
+    Firma de las negaciones y cifras de una pregunta: solo se reutiliza la respuesta
+    de una pregunta con la misma firma.
+    """
+    words = re.findall(r"\w+", normalize_text(text))
+    marks = sorted({w for w in words if w in NEGATION_WORDS or w.isdigit()})
+    return zlib.crc32(" ".join(marks).encode("utf-8"))
+
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    """
+    Convierte un texto en un vector normalizado de n-gramas de caracteres (3 a 5)
+    con hashing, calculado sobre las palabras con contenido y sin sus terminaciones.
+    Dos textos con redacción parecida obtienen vectores cercanos.
+
+    Args:
+        text: Texto de entrada.
+        dim: Dimensión del vector.
+
+    Returns:
+        Vector float32 de norma 1 (o de ceros si el texto está vacío).
+    """
+    words = [
+        w for w in re.findall(r"\w+", normalize_text(text)) if w not in NEGATION_WORDS
+    ]
+    # Si la pregunta solo tiene palabras vacías, se usan todas
+    content = [w for w in words if w not in STOPWORDS] or words
+    padded = f" {' '.join(_stem(w) for w in content)} "
+    vector = np.zeros(dim, dtype=np.float32)
+    for n in (3, 4, 5):
+        for i in range(len(padded) - n + 1):
+            vector[zlib.crc32(padded[i : i + n].encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def pair_similarity(text_a: str, text_b: str, dim: int = 4096) -> Optional[float]:
+    """
+    Similitud coseno entre dos preguntas, o None si no se pueden comparar porque
+    difieren en negaciones o cifras.
+    """
+    if query_signature(text_a) != query_signature(text_b):
+        return None
+    return float(embed_text(text_a, dim) @ embed_text(text_b, dim))
+
+
+def calibration_report(
+    pairs: List[Tuple[str, str, bool]], thresholds: List[float], dim: int = 4096
+) -> List[Dict[str, Any]]:
+    """
+    Evalúa varios umbrales sobre pares de preguntas etiquetados.
+
+    Args:
+        pairs: Tuplas (pregunta_a, pregunta_b, equivalentes).
+        thresholds: Umbrales a evaluar.
+        dim: Dimensión de los vectores de n-gramas.
+
+    Returns:
+        Por umbral: aciertos sobre pares equivalentes (reutilizaciones correctas) y
+        falsos aciertos sobre pares distintos (respuestas a otra pregunta).
+    """
+    scored = [(pair_similarity(a, b, dim), same) for a, b, same in pairs]
+    n_same = sum(1 for _, same in scored if same)
+    n_different = len(scored) - n_same
+    report = []
+    for threshold in thresholds:
+        hits = sum(
+            1 for sim, same in scored if same and sim is not None and sim >= threshold
+        )
+        false_hits = sum(
+            1
+            for sim, same in scored
+            if not same and sim is not None and sim >= threshold
+        )
+        report.append(
+            {
+                "threshold": threshold,
+                "recall": hits / n_same if n_same else 0.0,
+                "false_hits": false_hits,
+                "false_hit_rate": false_hits / n_different if n_different else 0.0,
+            }
+        )
+    return report
+
+
+class SemanticCache:
+    """
+    Caché de respuestas por similitud: devuelve la respuesta guardada de la pregunta
+    más parecida (similitud coseno top-1) si supera un umbral. Las entradas se agrupan
+    por ámbito (agente y versión del perfil) y solo se comparan dentro del mismo ámbito
+    y con preguntas de la misma firma de negaciones y cifras.
+    """
+
+    def __init__(
+        self,
+        agent_ttls: Dict[str, float],
+        threshold: float = 0.7,
+        max_size: int = 512,
+        dim: int = 4096,
+    ):
+        """
+        Inicializa la caché con capacidad fija.
+
+        Args:
+            agent_ttls: TTL en segundos de cada agente con la caché activada.
+            threshold: Similitud coseno mínima para reutilizar una respuesta.
+            max_size: Número máximo de entradas; al llenarse se reemplaza la menos usada.
+            dim: Dimensión de los vectores de n-gramas.
+        """
+        self.agent_ttls = agent_ttls
+        self.threshold = threshold
+        self.max_size = max_size
+        self.dim = dim
+
+        self._matrix = np.zeros((max_size, dim), dtype=np.float32)
+        self._scope_ids = np.full(max_size, -1, dtype=np.int64)
+        self._signatures = np.zeros(max_size, dtype=np.int64)
+        self._expires_at = np.zeros(max_size, dtype=np.float64)
+        self._last_used = np.zeros(max_size, dtype=np.float64)
+        self._responses: list = [None] * max_size
+        self._scope_index: Dict[Hashable, int] = {}
+        self._next_scope_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lookup_time_total = 0.0
+        self._last_lookup_ms = 0.0
+
+    def enabled_for(self, agent_name: str) -> bool:
+        """Indica si el agente tiene la caché semántica activada."""
+        return agent_name in self.agent_ttls
+
+    def _scope_id(self, agent_name: str, version: Hashable, create: bool) -> Optional[int]:
+        key = (agent_name, version)
+        scope_id = self._scope_index.get(key)
+        if scope_id is None and create:
+            scope_id = self._next_scope_id
+            self._next_scope_id += 1
+            self._scope_index[key] = scope_id
+        return scope_id
+
+    def get(
+        self, agent_name: str, user_input: str, version: Hashable
+    ) -> Optional[Tuple[str, float]]:
+        """
+        Busca la pregunta más parecida dentro del ámbito del agente y versión indicados.
+
+        Args:
+            agent_name: Nombre del agente.
+            user_input: Pregunta del usuario.
+            version: Versión de los datos de los que depende la respuesta.
+
+        Returns:
+            Tupla (respuesta, similitud) si se supera el umbral, o None.
+        """
+        start = time.perf_counter()
+        query = embed_text(user_input, self.dim)
+        signature = query_signature(user_input)
+        result = None
+        with self._lock:
+            scope_id = self._scope_id(agent_name, version, create=False)
+            if scope_id is not None:
+                now = time.monotonic()
+                candidates = np.flatnonzero(
+                    (self._scope_ids == scope_id)
+                    & (self._signatures == signature)
+                    & (self._expires_at > now)
+                )
+                if candidates.size:
+                    similarities = self._matrix[candidates] @ query
+                    best = int(np.argmax(similarities))
+                    similarity = float(similarities[best])
+                    if similarity >= self.threshold:
+                        slot = candidates[best]
+                        self._last_used[slot] = now
+                        result = (self._responses[slot], similarity)
+
+            if result is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            elapsed = time.perf_counter() - start
+            self._lookup_time_total += elapsed
+            self._last_lookup_ms = elapsed * 1000
+        return result
+
+    def set(self, agent_name: str, user_input: str, version: Hashable, response: str) -> None:
+        """
+        Guarda la respuesta de una pregunta. Si la caché está llena, reemplaza una
+        entrada expirada o, si no hay, la usada hace más tiempo.
+        """
+        vector = embed_text(user_input, self.dim)
+        signature = query_signature(user_input)
+        with self._lock:
+            now = time.monotonic()
+            free = np.flatnonzero((self._scope_ids < 0) | (self._expires_at <= now))
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._matrix[slot] = vector
+            self._scope_ids[slot] = self._scope_id(agent_name, version, create=True)
+            self._signatures[slot] = signature
+            self._expires_at[slot] = now + self.agent_ttls[agent_name]
+            self._last_used[slot] = now
+            self._responses[slot] = response
+
+            # Olvidar los ámbitos sin entradas (versiones de perfil antiguas)
+            if len(self._scope_index) > self.max_size:
+                live = set(self._scope_ids[self._scope_ids >= 0].tolist())
+                self._scope_index = {
+                    key: scope for key, scope in self._scope_index.items() if scope in live
+                }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve las métricas de la caché: tamaño, aciertos, fallos, tasa de aciertos
+        y latencia de búsqueda.
+        """
+        lookups = self.hits + self.misses
+        now = time.monotonic()
+        return {
+            "size": int(np.count_nonzero((self._scope_ids >= 0) & (self._expires_at > now))),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_lookup_ms": self._lookup_time_total * 1000 / lookups if lookups else 0.0,
+            "last_lookup_ms": self._last_lookup_ms,
+            "agents": self.agent_ttls,
+        }
@@ -0,0 +1,112 @@
+import os
+import hashlib
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+# Reparto de archivos en subdirectorios por un prefijo del hash de su clave
+# (p. ej. "ab/cd/123.json"): dos niveles de 256 directorios cada uno. Cambiar estos
+# valores exige volver a repartir los archivos existentes.
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+
+def shard_dir(base: Union[str, Path], key: Union[int, str]) -> Path:
+    """
+    Subdirectorio en el que se guardan los archivos de una clave.
+
+    Args:
+        base: Directorio raíz.
+        key: Clave (ID de conversación, nombre de archivo...).
+
+    Returns:
+        Ruta del subdirectorio (no se crea).
+    """
+    digest = hashlib.md5(str(key).encode("utf-8")).hexdigest()
+    parts = [digest[i * SHARD_WIDTH : (i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+    return Path(base).joinpath(*parts)
+
+
+def sharded_path(base: Union[str, Path], key: Union[int, str], name: str) -> Path:
+    """Ruta de un archivo dentro del subdirectorio de su clave."""
+    return shard_dir(base, key) / name
+
+
+def _is_shard_name(name: str) -> bool:
+    return len(name) == SHARD_WIDTH and all(c in "0123456789abcdef" for c in name)
+
+
+def iter_sharded_files(base: Union[str, Path]) -> Iterator[os.DirEntry]:
+    """
+    Recorre los archivos de un directorio repartido con os.scandir, un subdirectorio
+    cada vez. Los archivos que estén directamente en la raíz no se incluyen.
+
+    Yields:
+        Entradas de los archivos de los subdirectorios de último nivel.
+    """
+
+    def walk(directory: str, level: int) -> Iterator[os.DirEntry]:
+        try:
+            with os.scandir(directory) as entries:
+                if level == SHARD_LEVELS:
+                    for entry in entries:
+                        if entry.is_file():
+                            yield entry
+                    return
+                subdirectories = [
+                    entry.path
+                    for entry in entries
+                    if _is_shard_name(entry.name) and entry.is_dir()
+                ]
+        except FileNotFoundError:
+            return
+        for subdirectory in sorted(subdirectories):
+            yield from walk(subdirectory, level + 1)
+
+    yield from walk(str(base), 0)
+
+
+def iter_flat_files(base: Union[str, Path]) -> Iterator[os.DirEntry]:
+    """
+    Recorre los archivos que están directamente en la raíz de un directorio
+    (organización anterior al reparto).
+    """
+    try:
+        with os.scandir(base) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    yield entry
+    except FileNotFoundError:
+        return
+
+
+def conversation_id_of(name: str) -> Optional[int]:
+    """Devuelve el ID de conversación de un nombre de archivo, o None si no tiene."""
+    prefix = name.split(".", 1)[0]
+    if prefix.startswith("turn-"):
+        prefix = prefix[len("turn-") :]
+    return int(prefix) if prefix.isdigit() else None
+
+
+def reshard(directory: Union[str, Path]) -> dict:
+    """
+    Mueve los archivos de conversaciones de la raíz del directorio a su subdirectorio.
+    Un archivo cuyo destino ya existe se deja en su sitio y se cuenta como conflicto.
+
+    Returns:
+        Número de archivos movidos ("moved") y rutas sin mover por conflicto
+        ("conflicts").
+    """
+    summary = {"moved": 0, "conflicts": []}
+    # Se recorre una lista: mover archivos mientras se lee el directorio puede saltarse entradas
+    for entry in list(iter_flat_files(directory)):
+        conversation_id = conversation_id_of(entry.name)
+        if conversation_id is None:
+            continue
+        target = sharded_path(directory, conversation_id, entry.name)
+        if target.exists():
+            summary["conflicts"].append(entry.path)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(entry.path, target)
+        summary["moved"] += 1
+    return summary
@@ -1,8 +1,52 @@
-from openai import OpenAI
+from herramientas.image_preprocessing import VISION_ROUTING_DETAIL, prepare_image
+from herramientas.llm_client import emit_text, generate_text, get_async_client
+from herramientas.intent_classifier import (
+    INTENT_CLASSIFIER_ENABLED,
+    INTENT_CLASSIFIER_THRESHOLD,
+    IntentClassifier,
+    log_routing_decision,
+    may_contain_personal_data,
+    normalize_text,
+)
+from herramientas.cache import (
+    ResponseCache,
+    TTLCache,
+    data_fingerprint,
+    file_version,
+    parse_agent_ttls,
+)
+from herramientas.semantic_cache import SemanticCache
 import os
-import base64
+import asyncio
+import logging
+import re
+import json
 from typing import Any, Dict, Optional
 
+# Configurar logger
+logger = logging.getLogger("supervisor_agent")
+
+# Caché de decisiones de enrutamiento del LLM (0 entradas la desactiva)
+ROUTING_CACHE_SIZE = int(os.getenv("ROUTING_CACHE_SIZE", 1024))
+ROUTING_CACHE_TTL = float(os.getenv("ROUTING_CACHE_TTL", 3600))
+# Caché de respuestas por agente, desactivada por defecto (ej: "nutricion=600,ejercicio=600")
+RESPONSE_CACHE_AGENTS = parse_agent_ttls(os.getenv("RESPONSE_CACHE_AGENTS", ""))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+# Caché semántica de preguntas parecidas por agente, desactivada por defecto
+SEMANTIC_CACHE_AGENTS = parse_agent_ttls(os.getenv("SEMANTIC_CACHE_AGENTS", ""))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.7))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 512))
+
+# Consultas de menú que se responden antes de enrutar: la consulta completa debe
+# pedir el menú de un día ("qué hay de menú el lunes", "mi comida de hoy"); se
+# compara con el texto normalizado, sin acentos ni signos de puntuación
+MENU_LOOKUP_PATTERN = re.compile(
+    r"(?:(?:cual|que) (?:es|hay|tengo) (?:de |en )?"
+    r"|(?:dime|muestrame|ensename|dame|ver) )?"
+    r"(?:el |mi )?(?:menu|comida)s? (?:(?:de|del|para|en) )?(?:el |este )?"
+    r"(?:hoy|dia actual|lunes|martes|miercoles|jueves|viernes|sabado|domingo)"
+)
+
 
 class SupervisorAgent:
     """
@@ -23,8 +67,30 @@ class SupervisorAgent:
                 "Se requiere una clave API de OpenAI. Proporciónela como argumento o establezca la variable de entorno OPENAI_API_KEY."
             )
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_async_client(self.api_key)
         self.agents = {}
+        # Decisiones de enrutamiento recientes por texto normalizado
+        self.routing_cache = (
+            TTLCache(ROUTING_CACHE_SIZE, ROUTING_CACHE_TTL)
+            if ROUTING_CACHE_SIZE > 0
+            else None
+        )
+        # Respuestas recientes de los agentes que la tienen activada
+        self.response_cache = ResponseCache(RESPONSE_CACHE_AGENTS, RESPONSE_CACHE_SIZE)
+        # Respuestas a preguntas parecidas (similitud de n-gramas de caracteres)
+        self.semantic_cache = (
+            SemanticCache(
+                SEMANTIC_CACHE_AGENTS, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE
+            )
+            if SEMANTIC_CACHE_AGENTS
+            else None
+        )
+        # Reglas deterministas evaluadas antes de enrutar, en orden
+        self.fast_path_rules = [self._rule_update_user_data, self._rule_menu_lookup]
+        # Clasificador local que evita la llamada al LLM en consultas evidentes
+        self.intent_classifier = (
+            IntentClassifier.load_or_seed() if INTENT_CLASSIFIER_ENABLED else None
+        )
         # Inicializar datos del usuario
         self.user_data = {
             "nombre": "",
@@ -89,6 +155,21 @@ class SupervisorAgent:
         """
         self.agents[agent_name] = agent_instance
 
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Devuelve las métricas de las cachés del supervisor.
+
+        Returns:
+            Diccionario con las estadísticas de cada caché activa.
+        """
+        stats = {}
+        if self.routing_cache is not None:
+            stats["routing"] = self.routing_cache.stats()
+        stats["responses"] = self.response_cache.stats()
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        return stats
+
     def update_user_data(self, data: Dict[str, Any]) -> None:
         """
         Actualiza los datos del usuario.
@@ -100,20 +181,7 @@ class SupervisorAgent:
             if key in self.user_data:
                 self.user_data[key] = value
 
-    def encode_image_to_base64(self, image_path: str) -> str:
-        """
-        Codifica una imagen a base64 para el procesamiento por la API.
-
-        Args:
-            image_path: Ruta al archivo de imagen.
-
-        Returns:
-            Imagen codificada en base64.
-        """
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
-
-    def process_image(self, image_path: str, user_prompt: Optional[str] = None) -> str:
+    async def process_image(self, image_path: str, user_prompt: Optional[str] = None) -> str:
         """
         Procesa una imagen y determina qué agente debe manejarla.
 
@@ -124,9 +192,11 @@ class SupervisorAgent:
         Returns:
             Respuesta generada por el sistema de agentes.
         """
-        # Codificar la imagen a base64
+        # Preparar la imagen con poco detalle: solo se usa para elegir el agente
         try:
-            base64_image = self.encode_image_to_base64(image_path)
+            prepared_image = await asyncio.to_thread(
+                prepare_image, image_path, VISION_ROUTING_DETAIL
+            )
         except Exception as e:
             return f"[Agente Supervisor] Error al procesar la imagen: {str(e)}"
 
@@ -156,15 +226,12 @@ class SupervisorAgent:
                 "role": "user",
                 "content": [
                     {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    prepared_image.content_part(),
                 ],
             },
         ]
 
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model="gpt-4o-mini", messages=messages
         )
 
@@ -192,7 +259,8 @@ class SupervisorAgent:
 
             # Procesar la imagen con el agente seleccionado
             if hasattr(selected_agent, "process_image"):
-                agent_response = selected_agent.process_image(
+                emit_text(f"[Agente de {agent_selection.capitalize()}] ")
+                agent_response = await selected_agent.process_image(
                     image_path, md_prompt, self.user_data
                 )
                 return f"[Agente de {agent_selection.capitalize()}] {agent_response}"
@@ -219,107 +287,244 @@ class SupervisorAgent:
                 "role": "user",
                 "content": [
                     {"type": "text", "text": description_prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    prepared_image.content_part(),
                 ],
             },
         ]
 
-        fallback_response = self.client.chat.completions.create(
-            model="gpt-4o-mini", messages=fallback_messages, max_tokens=150
+        emit_text("[Agente Supervisor] ")
+        response_content = await generate_text(
+            self.client, model="gpt-4o-mini", messages=fallback_messages, max_tokens=150
         )
-
-        response_content = fallback_response.choices[0].message.content
         return f"[Agente Supervisor] {response_content}"
 
-    def process_request(self, user_input: str, image_path: Optional[str] = None) -> str:
+    def apply_fast_path(self, user_input: str) -> Optional[str]:
         """
-        Procesa la entrada del usuario, determina qué agente debe manejarla
-        y coordina la respuesta.
+        Aplica las reglas deterministas previas al enrutamiento. Estas consultas son
+        búsquedas o actualizaciones puras y se responden sin llamar al modelo.
 
         Args:
             user_input: Texto de entrada del usuario.
-            image_path: Ruta opcional a una imagen que el usuario desea procesar.
 
         Returns:
-            Respuesta generada por el sistema de agentes.
+            Respuesta de la primera regla que coincide, o None si ninguna aplica.
         """
-        # Si se proporciona una imagen, procesarla
-        if image_path:
-            return self.process_image(image_path, user_input)
-
-        # Verificar si la entrada contiene actualización de datos de usuario
-        if user_input.startswith("/datos"):
-            try:
-                # Parsear los datos proporcionados
-                # Ejemplo: /datos peso=70 altura=175 objetivos=perder_peso,aumentar_musculo
-                data_input = user_input.replace("/datos", "").strip()
-                data_pairs = data_input.split()
-
-                update_data = {}
-                for pair in data_pairs:
-                    if "=" in pair:
-                        key, value = pair.split("=", 1)
-                        # Procesar listas separadas por comas
-                        if "," in value:
-                            update_data[key] = value.split(",")
-                        # Procesar valores numéricos
-                        elif value.replace(".", "", 1).isdigit():
-                            if "." in value:
-                                update_data[key] = float(value)
-                            else:
-                                update_data[key] = int(value)
+        for rule in self.fast_path_rules:
+            response = rule(user_input)
+            if response is not None:
+                logger.debug(f"Consulta resuelta por la regla {rule.__name__}")
+                return response
+        return None
+
+    def _rule_update_user_data(self, user_input: str) -> Optional[str]:
+        """
+        Regla para '/datos clave=valor ...': actualiza los datos del usuario.
+        """
+        if not user_input.startswith("/datos"):
+            return None
+
+        try:
+            # Parsear los datos proporcionados
+            # Ejemplo: /datos peso=70 altura=175 objetivos=perder_peso,aumentar_musculo
+            data_input = user_input.replace("/datos", "").strip()
+            data_pairs = data_input.split()
+
+            update_data = {}
+            for pair in data_pairs:
+                if "=" in pair:
+                    key, value = pair.split("=", 1)
+                    # Procesar listas separadas por comas
+                    if "," in value:
+                        update_data[key] = value.split(",")
+                    # Procesar valores numéricos
+                    elif value.replace(".", "", 1).isdigit():
+                        if "." in value:
+                            update_data[key] = float(value)
                         else:
-                            update_data[key] = value
+                            update_data[key] = int(value)
+                    else:
+                        update_data[key] = value
 
-                self.update_user_data(update_data)
-                return f"[Agente Supervisor] He actualizado tus datos: {', '.join(f'{k}={v}' for k, v in update_data.items())}"
-            except Exception as e:
-                return f"[Agente Supervisor] Error al actualizar datos: {str(e)}. Usa el formato: /datos clave1=valor1 clave2=valor2"
+            self.update_user_data(update_data)
+            return f"[Agente Supervisor] He actualizado tus datos: {', '.join(f'{k}={v}' for k, v in update_data.items())}"
+        except Exception as e:
+            return f"[Agente Supervisor] Error al actualizar datos: {str(e)}. Usa el formato: /datos clave1=valor1 clave2=valor2"
 
-        # Verificar si el usuario pregunta sobre sus datos médicos personales
-        prompt_datos_personales = f"""
-        Analiza si la siguiente consulta del usuario se refiere a SUS PROPIOS datos médicos personales,
-        historial médico, medicamentos, condiciones de salud o resultados médicos. 
-        
-        Consulta: "{user_input}"
-        
-        Responde SOLO con "si" o "no".
+    def _rule_menu_lookup(self, user_input: str) -> Optional[str]:
+        """
+        Regla para consultas del menú de hoy o de un día concreto: responde desde
+        el plan alimenticio guardado del agente de nutrición.
         """
+        agent = self.agents.get("nutricion")
+        if agent is None or not hasattr(agent, "answer_menu_request"):
+            return None
 
-        response_datos_personales = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Eres un analizador preciso que determina si una consulta se refiere a datos médicos personales del usuario.",
-                },
-                {"role": "user", "content": prompt_datos_personales},
-            ],
+        # Antes de enrutar solo se aceptan peticiones explícitas del menú de un día:
+        # "plan del lunes" podría referirse al plan de ejercicio y "qué comida me
+        # conviene hoy" es una pregunta para el agente
+        text = re.sub(r"[^\w\s]", " ", normalize_text(user_input))
+        if not MENU_LOOKUP_PATTERN.fullmatch(" ".join(text.split())):
+            return None
+
+        menu = agent.answer_menu_request(user_input)
+        if menu is None:
+            return None
+
+        log_routing_decision(user_input, "nutricion", "rule", 1.0)
+        return f"[Agente de Nutricion] {menu}"
+
+    async def run_agent(self, agent_name: str, user_input: str) -> str:
+        """
+        Envía la consulta al agente especializado, con la instrucción de formato Markdown
+        y los datos del usuario. Si el agente tiene la caché de respuestas (o la semántica)
+        activada, reutiliza la respuesta de una consulta idéntica (o muy parecida)
+        mientras no cambien los datos de los que depende.
+
+        Args:
+            agent_name: Nombre del agente registrado.
+            user_input: Texto de entrada del usuario.
+
+        Returns:
+            Respuesta del agente (sin el prefijo del agente).
+        """
+        selected_agent = self.agents[agent_name]
+        md_enhanced_input = f"{user_input}\n\n{self.markdown_instruction}"
+        uses_user_data = hasattr(selected_agent, "process_with_user_data")
+
+        cache_enabled = self.response_cache.enabled_for(agent_name)
+        semantic_enabled = (
+            self.semantic_cache is not None and self.semantic_cache.enabled_for(agent_name)
         )
+        if cache_enabled or semantic_enabled:
+            # La versión se calcula antes de llamar al agente: si la llamada modifica
+            # sus propios datos (por ejemplo, al generar un plan), no se reutilizará
+            dependencies = getattr(selected_agent, "cache_dependencies", lambda: [])()
+            version = (
+                file_version(dependencies),
+                data_fingerprint(self.user_data) if uses_user_data else None,
+            )
+            cache_text = self._routing_cache_key(user_input)[0]
+            cached = (
+                self.response_cache.get(agent_name, cache_text, version)
+                if cache_enabled
+                else None
+            )
+            if cached is not None:
+                logger.debug(f"Respuesta en caché para el agente {agent_name}")
+                emit_text(cached)
+                return cached
+
+            # Buscar una pregunta equivalente con otra redacción
+            similar = (
+                self.semantic_cache.get(agent_name, user_input, version)
+                if semantic_enabled
+                else None
+            )
+            if similar is not None:
+                cached, similarity = similar
+                logger.debug(
+                    f"Respuesta similar en caché para el agente {agent_name} "
+                    f"(similitud {similarity:.2f})"
+                )
+                emit_text(cached)
+                return cached
+
+        # Pasar los datos del usuario al agente especializado
+        if uses_user_data:
+            agent_response = await selected_agent.process_with_user_data(
+                md_enhanced_input, self.user_data
+            )
+        else:
+            agent_response = await selected_agent.process(md_enhanced_input)
+
+        if cache_enabled and agent_response:
+            self.response_cache.set(agent_name, cache_text, version, agent_response)
+        if semantic_enabled and agent_response:
+            self.semantic_cache.set(agent_name, user_input, version, agent_response)
+        return agent_response
+
+    def _routing_cache_key(self, user_input: str) -> tuple:
+        """
+        Clave de la caché de enrutamiento: texto normalizado (sin acentos, mayúsculas,
+        signos de puntuación ni espacios repetidos) y agentes registrados.
+        """
+        text = " ".join(re.findall(r"\w+", normalize_text(user_input)))
+        return text, tuple(sorted(self.agents.keys()))
+
+    async def resolve_routing(self, user_input: str) -> Dict[str, Any]:
+        """
+        Determina el enrutamiento de una solicitud de texto. Consulta primero la caché
+        de decisiones, después el clasificador local y, si su confianza no es
+        suficiente, el LLM con una sola llamada.
 
-        # Extraer la respuesta
-        es_consulta_personal = (
-            response_datos_personales.choices[0].message.content.strip().lower()
+        Args:
+            user_input: Texto de entrada del usuario.
+
+        Returns:
+            Diccionario con el mismo formato que route_request.
+        """
+        cache_key = self._routing_cache_key(user_input)
+        if self.routing_cache is not None:
+            cached = self.routing_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+
+        routing = self.classify_locally(user_input)
+        if routing is not None:
+            log_routing_decision(
+                user_input, routing["agente"], "local", routing["confianza"]
+            )
+            return routing
+
+        routing = await self.route_request(user_input)
+        log_routing_decision(
+            user_input,
+            routing["agente"],
+            "llm",
+            routing["confianza"],
+            routing["datos_personales"],
         )
+        if self.routing_cache is not None:
+            self.routing_cache.set(cache_key, dict(routing))
+        return routing
 
-        # Si es una consulta sobre datos médicos personales, usar directamente el agente médico
-        if es_consulta_personal == "si" and "medico" in self.agents:
-            selected_agent = self.agents["medico"]
-            md_enhanced_input = f"{user_input}\n\n{self.markdown_instruction}"
+    def classify_locally(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """
+        Clasifica la solicitud con el clasificador local de intenciones.
 
-            if hasattr(selected_agent, "process_with_user_data"):
-                agent_response = selected_agent.process_with_user_data(
-                    md_enhanced_input, self.user_data
-                )
-            else:
-                agent_response = selected_agent.process(md_enhanced_input)
+        Args:
+            user_input: Texto de entrada del usuario.
 
-            return f"[Agente de Médico] {agent_response}"
+        Returns:
+            Diccionario con el mismo formato que route_request, o None si el
+            clasificador está desactivado, la consulta puede contener datos
+            personales o su confianza no supera el umbral.
+        """
+        if self.intent_classifier is None or may_contain_personal_data(user_input):
+            # Si puede haber datos personales decide el LLM, que los detecta
+            return None
+
+        agente, confianza = self.intent_classifier.predict(user_input)
+        if confianza < INTENT_CLASSIFIER_THRESHOLD or (
+            agente != "ninguno" and agente not in self.agents
+        ):
+            return None
+
+        return {"agente": agente, "datos_personales": False, "confianza": confianza}
+
+    async def route_request(self, user_input: str) -> Dict[str, Any]:
+        """
+        Clasifica la solicitud de texto del usuario con una única llamada al modelo.
+        Determina el agente especializado y si la consulta se refiere a los datos
+        médicos personales del usuario.
 
-        # Determinar el propósito de la solicitud usando GPT-4o-mini
+        Args:
+            user_input: Texto de entrada del usuario.
+
+        Returns:
+            Diccionario con las claves 'agente' ('nutricion', 'ejercicio', 'medico' o
+            'ninguno'), 'datos_personales' (bool) y 'confianza' (float entre 0 y 1, o None).
+        """
         prompt = f"""
         Analiza la siguiente solicitud del usuario y determina qué agente especializado 
         debe manejarla. Los agentes disponibles son: {list(self.agents.keys())}
@@ -330,15 +535,19 @@ class SupervisorAgent:
         3. Si la consulta está relacionada con MEDICAMENTOS, SÍNTOMAS, ENFERMEDADES o CONSULTAS MÉDICAS, asignar al agente 'medico'
         4. Si no corresponde claramente a ninguna categoría, responder con 'ninguno'
         
+        Además, indica si la consulta se refiere a SUS PROPIOS datos médicos personales,
+        historial médico, medicamentos, condiciones de salud o resultados médicos.
+        
         Datos del usuario:
         {self.user_data}
         
         Solicitud del usuario: {user_input}
         
-        Responde ÚNICAMENTE con el nombre del agente que debe manejar esta consulta: 'nutricion', 'ejercicio', 'medico' o 'ninguno'.
+        Responde ÚNICAMENTE con un objeto JSON con este formato:
+        {{"agente": "nutricion" | "ejercicio" | "medico" | "ninguno", "datos_personales": true | false, "confianza": número entre 0 y 1}}
         """
 
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -347,33 +556,76 @@ class SupervisorAgent:
                 },
                 {"role": "user", "content": prompt},
             ],
+            response_format={"type": "json_object"},
         )
 
-        # Extraer el nombre del agente de la respuesta
-        agent_selection = response.choices[0].message.content.strip().lower()
+        routing = {"agente": "ninguno", "datos_personales": False, "confianza": None}
+        try:
+            data = json.loads(response.choices[0].message.content or "{}")
+        except json.JSONDecodeError:
+            logger.debug("La respuesta de enrutamiento no es JSON válido")
+            return routing
+
+        agente = str(data.get("agente", "ninguno")).strip().lower()
+        routing["agente"] = agente if agente in self.agents else "ninguno"
+        datos_personales = data.get("datos_personales", False)
+        if isinstance(datos_personales, str):
+            datos_personales = datos_personales.strip().lower() in ("si", "sí", "true")
+        routing["datos_personales"] = bool(datos_personales)
+        try:
+            confianza = data.get("confianza")
+            routing["confianza"] = (
+                min(max(float(confianza), 0.0), 1.0) if confianza is not None else None
+            )
+        except (TypeError, ValueError):
+            routing["confianza"] = None
+
+        return routing
+
+    async def process_request(self, user_input: str, image_path: Optional[str] = None) -> str:
+        """
+        Procesa la entrada del usuario, determina qué agente debe manejarla
+        y coordina la respuesta.
+
+        Args:
+            user_input: Texto de entrada del usuario.
+            image_path: Ruta opcional a una imagen que el usuario desea procesar.
+
+        Returns:
+            Respuesta generada por el sistema de agentes.
+        """
+        # Si se proporciona una imagen, procesarla
+        if image_path:
+            return await self.process_image(image_path, user_input)
+
+        # Reglas deterministas (actualización de datos, consultas de menú) sin llamadas al LLM
+        fast_response = self.apply_fast_path(user_input)
+        if fast_response is not None:
+            return fast_response
+
+        # Determinar el agente (caché, clasificador local o LLM)
+        routing = await self.resolve_routing(user_input)
+        agent_selection = routing["agente"]
 
         print(
-            f"DEBUG [process_request]: Clasificación del LLM para la solicitud de texto: {agent_selection}"
+            f"DEBUG [process_request]: Enrutamiento para la solicitud de texto: {routing}"
         )
 
+        # Si es una consulta sobre datos médicos personales, usar directamente el agente médico
+        if routing["datos_personales"] and "medico" in self.agents:
+            emit_text("[Agente de Médico] ")
+            agent_response = await self.run_agent("medico", user_input)
+
+            return f"[Agente de Médico] {agent_response}"
+
         print(
             f"DEBUG [process_request]: Estado de self.agents ANTES del chequeo: {list(self.agents.keys())}"
         )
 
         # Verificar si se seleccionó un agente válido y procesarlo directamente
         if agent_selection in self.agents:
-            selected_agent = self.agents[agent_selection]
-
-            # Preparar la consulta con instrucción de formato Markdown
-            md_enhanced_input = f"{user_input}\n\n{self.markdown_instruction}"
-
-            # Pasar los datos del usuario al agente especializado
-            if hasattr(selected_agent, "process_with_user_data"):
-                agent_response = selected_agent.process_with_user_data(
-                    md_enhanced_input, self.user_data
-                )
-            else:
-                agent_response = selected_agent.process(md_enhanced_input)
+            emit_text(f"[Agente de {agent_selection.capitalize()}] ")
+            agent_response = await self.run_agent(agent_selection, user_input)
             # Retornar la respuesta del agente especializado directamente
             return f"[Agente de {agent_selection.capitalize()}] {agent_response}"
 
@@ -392,9 +644,8 @@ class SupervisorAgent:
                 {"role": "user", "content": user_input},
             ]
 
-            fallback_response = self.client.chat.completions.create(
-                model="gpt-4o-mini", messages=fallback_messages, max_tokens=100
+            emit_text("[Agente Supervisor] ")
+            response_content = await generate_text(
+                self.client, model="gpt-4o-mini", messages=fallback_messages, max_tokens=100
             )
-
-            response_content = fallback_response.choices[0].message.content
             return f"[Agente Supervisor] {response_content}"
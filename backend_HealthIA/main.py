@@ -1,17 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from app.routers import chatbot, image_analysis
+from app.routers.chatbot import IMAGES_DIR
+from app.services.openai_service import OpenAIService
+from app.services.context_service import ContextService
+from app.services.conversation_store import (
+    close_conversation_store,
+    get_conversation_store,
+)
+from herramientas.llm_client import close_clients
 from dotenv import load_dotenv
 import os
 
 # Cargar variables de entorno
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Abrir el almacén de conversaciones (y migrar los chats JSON, si hace falta)
+    # antes de atender peticiones, fuera del bucle de eventos
+    await asyncio.to_thread(get_conversation_store)
+    yield
+    # Esperar a los títulos y resúmenes que se están generando en segundo plano
+    await OpenAIService.wait_for_background_tasks()
+    await ContextService.wait_for_background_tasks()
+    # Cerrar las conexiones del cliente de OpenAI compartido
+    await close_clients()
+    # Cerrar el almacén de conversaciones (vuelca la caché pendiente)
+    await asyncio.to_thread(close_conversation_store)
+
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title="HealthIA Chatbot API",
     description="API para el chatbot de HealthIA utilizando OpenAI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configurar CORS
@@ -27,6 +55,10 @@ app.add_middleware(
 app.include_router(chatbot.router, tags=["Chatbot"])
 app.include_router(image_analysis.router, tags=["Image Analysis"])
 
+# Servir las imágenes guardadas en local cuando falla la subida a S3 (solo ese
+# directorio: el resto de app/static, como el prompt del sistema, no es público)
+app.mount("/static/images", StaticFiles(directory=IMAGES_DIR), name="images")
+
 
 # Ruta de inicio
 @app.get("/")
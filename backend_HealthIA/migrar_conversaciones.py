@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+
+from app.services.conversation_store import (
+    CHAT_LOG_DIR,
+    CHAT_STORE_PATH,
+    FRONTEND_CHATS_DIR,
+    OPENAI_CHATS_DIR,
+    JsonConversationStore,
+    JsonlConversationStore,
+    SqliteConversationStore,
+    migrate_conversations,
+)
+
+
+def main():
+    """
+    Migra las conversaciones guardadas en archivos (formato JSON o JSONL) a la
+    base de datos SQLite.
+    Las conversaciones se leen y se escriben de una en una, por lo que la memoria
+    usada no depende del número de chats.
+    """
+    parser = argparse.ArgumentParser(
+        description="Migra las conversaciones en archivos al almacén SQLite."
+    )
+    parser.add_argument(
+        "--source",
+        choices=["json", "jsonl"],
+        default="json",
+        help="Formato de origen de las conversaciones",
+    )
+    parser.add_argument(
+        "--db", default=CHAT_STORE_PATH, help="Base de datos SQLite de destino"
+    )
+    parser.add_argument(
+        "--openai-dir",
+        default=str(OPENAI_CHATS_DIR),
+        help="Directorio de conversaciones en formato OpenAI",
+    )
+    parser.add_argument(
+        "--frontend-dir",
+        default=str(FRONTEND_CHATS_DIR),
+        help="Directorio de conversaciones en formato frontend",
+    )
+    parser.add_argument(
+        "--log-dir",
+        default=str(CHAT_LOG_DIR),
+        help="Directorio de conversaciones en formato JSONL",
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Reemplazar las conversaciones que ya existen en la base de datos",
+    )
+    args = parser.parse_args()
+
+    if args.source == "jsonl":
+        source = JsonlConversationStore(args.log_dir)
+    else:
+        source = JsonConversationStore(args.openai_dir, args.frontend_dir)
+    target = SqliteConversationStore(args.db)
+
+    migrated, skipped = migrate_conversations(source, target, args.replace)
+    target.close()
+    print(f"Conversaciones migradas: {migrated}")
+    if skipped:
+        print(f"Conversaciones omitidas (ya existían): {skipped}; usa --replace para sobrescribirlas")
+    print(f"Base de datos: {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import argparse
+from pathlib import Path
+
+from app.services.conversation_store import (
+    CHAT_LOCK_DIR,
+    CHAT_LOG_DIR,
+    FRONTEND_CHATS_DIR,
+    OPENAI_CHATS_DIR,
+)
+from herramientas.sharding import conversation_id_of, iter_flat_files, reshard
+
+
+def remove_flat_locks(directory: Path) -> int:
+    """Elimina los archivos de bloqueo por conversación de la organización anterior."""
+    removed = 0
+    for entry in list(iter_flat_files(directory)):
+        if entry.name.endswith(".lock") and conversation_id_of(entry.name) is not None:
+            os.unlink(entry.path)
+            removed += 1
+    return removed
+
+
+def main():
+    """
+    Reparte en subdirectorios por hash los archivos de conversaciones que siguen en
+    la raíz de sus directorios (backends JSON y JSONL) y elimina los bloqueos por
+    conversación antiguos. Es idempotente y debe ejecutarse con el servicio detenido.
+    """
+    parser = argparse.ArgumentParser(
+        description="Reparte los archivos de conversaciones en subdirectorios por hash."
+    )
+    parser.add_argument(
+        "--openai-dir",
+        default=str(OPENAI_CHATS_DIR),
+        help="Directorio de conversaciones en formato OpenAI",
+    )
+    parser.add_argument(
+        "--frontend-dir",
+        default=str(FRONTEND_CHATS_DIR),
+        help="Directorio de conversaciones en formato frontend",
+    )
+    parser.add_argument(
+        "--log-dir",
+        default=str(CHAT_LOG_DIR),
+        help="Directorio de conversaciones en formato JSONL",
+    )
+    parser.add_argument(
+        "--lock-dir", default=CHAT_LOCK_DIR, help="Directorio de los bloqueos de turno"
+    )
+    args = parser.parse_args()
+
+    conflicts = 0
+    for directory in (args.openai_dir, args.frontend_dir, args.log_dir):
+        directory = Path(directory)
+        if not directory.is_dir():
+            continue
+        summary = reshard(directory)
+        for path in summary["conflicts"]:
+            print(f"Conflicto: {path} ya existe en su subdirectorio; se deja sin mover")
+        conflicts += len(summary["conflicts"])
+        print(f"{directory}: {summary['moved']} archivos movidos")
+
+    lock_dirs = {
+        Path(args.lock_dir),
+        Path(args.frontend_dir).parent / "chats-locks",
+        Path(args.log_dir) / "locks",
+    }
+    removed = sum(remove_flat_locks(directory) for directory in lock_dirs)
+    if removed:
+        print(f"Bloqueos antiguos eliminados: {removed}")
+    if conflicts:
+        print(f"Archivos sin mover por conflicto: {conflicts}")
+
+
+if __name__ == "__main__":
+    main()
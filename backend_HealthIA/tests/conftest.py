@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Los servicios leen la configuración al importarse: los datos de las pruebas van a
+# un directorio temporal y el cliente de OpenAI no llega a usarse
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+_data_dir = tempfile.mkdtemp(prefix="healthia-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("CHAT_LOCK_DIR", os.path.join(_data_dir, "locks"))
+os.environ.setdefault("CHAT_STORE_PATH", os.path.join(_data_dir, "chats.db"))
+os.environ.setdefault("CHAT_LOG_DIR", os.path.join(_data_dir, "chats-log"))
+os.environ.setdefault("CHAT_ARCHIVE_DIR", os.path.join(_data_dir, "chats-archive"))
+
+from app.services import conversation_store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(tmp_path, monkeypatch):
+    """Bloqueos de turno propios de cada prueba."""
+    monkeypatch.setattr(conversation_store, "CHAT_LOCK_DIR", str(tmp_path / "locks"))
+    return tmp_path / "locks"
+
+
+
+def make_backend(kind: str, directory: Path) -> conversation_store.ConversationStore:
+    """Crea un almacén del tipo indicado ("json", "jsonl" o "sqlite") en un directorio."""
+    if kind == "json":
+        (directory / "chats-openai").mkdir(parents=True, exist_ok=True)
+        (directory / "chats-frontend").mkdir(parents=True, exist_ok=True)
+        return conversation_store.JsonConversationStore(
+            directory / "chats-openai", directory / "chats-frontend"
+        )
+    if kind == "jsonl":
+        return conversation_store.JsonlConversationStore(directory / "chats-log")
+    return conversation_store.SqliteConversationStore(str(directory / "chats.db"))
+
+
+@pytest.fixture(params=["json", "jsonl", "sqlite"])
+def backend_kind(request):
+    return request.param
+
+
+@pytest.fixture
+def backend(backend_kind, tmp_path):
+    """Almacén de cada backend en un directorio temporal."""
+    store = make_backend(backend_kind, tmp_path)
+    yield store
+    store.close()
@@ -0,0 +1,16 @@
+import pytest
+
+from herramientas.cache import parse_agent_ttls
+
+
+def test_parse_agent_ttls():
+    assert parse_agent_ttls("nutricion=300, ejercicio") == {
+        "nutricion": 300.0,
+        "ejercicio": 600.0,
+    }
+    assert parse_agent_ttls("") == {}
+
+
+def test_parse_agent_ttls_rejects_medical_agent():
+    with pytest.raises(ValueError, match="medico"):
+        parse_agent_ttls("nutricion=300,medico=600")
@@ -0,0 +1,346 @@
+import asyncio
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.services import conversation_store, openai_service
+from app.services.conversation_store import (
+    ArchivedConversationStore,
+    CachedConversationStore,
+    JsonConversationStore,
+    SqliteConversationStore,
+    has_legacy_json_chats,
+    migrate_legacy_json,
+    turn_lock_path,
+)
+from app.services.openai_service import OpenAIService
+from herramientas.file_lock import file_lock
+from herramientas.sharding import iter_sharded_files
+from tests.conftest import make_backend
+
+CREATED_AT = "2024-01-01 10:00:00"
+
+
+def header(title: str, last_message_at: str = "2024-01-01 10:05:00") -> dict:
+    return {"title": title, "created_at": CREATED_AT, "last_message_at": last_message_at}
+
+
+def turn(question: str, answer: str) -> list:
+    return [
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": answer},
+    ]
+
+
+def ids(changed) -> list:
+    return [record["id"] for record, _ in changed]
+
+
+# Ida y vuelta
+
+
+def test_append_and_load_round_trip(backend, backend_kind, tmp_path):
+    messages = turn("Me duele la rodilla", "Aplica hielo") + turn(
+        "¿Cuánto tiempo?", "Veinte minutos"
+    )
+    backend.create(1, "Rodilla", CREATED_AT)
+    backend.append(1, header("Rodilla"), messages[:2])
+    backend.append(1, header("Rodilla", "2024-01-01 10:10:00"), messages[2:])
+
+    record = backend.load(1)
+    assert record["messages"] == messages
+    assert record["title"] == "Rodilla"
+    assert record["created_at"] == CREATED_AT
+    assert record["last_message_at"] == "2024-01-01 10:10:00"
+    assert backend.exists(1) and not backend.exists(2)
+    assert backend.load(2) is None
+    assert backend.conversation_ids() == [1]
+    assert backend.get_metadata(1)["message_count"] == 4
+
+    # Otro proceso (otra instancia sobre los mismos archivos) ve lo mismo
+    other = make_backend(backend_kind, tmp_path)
+    try:
+        assert other.load(1)["messages"] == messages
+    finally:
+        other.close()
+
+
+def test_set_title_and_delete(backend):
+    backend.append(1, header("Rodilla"), turn("Hola", "Hola"))
+
+    assert backend.set_title(1, "Dolor de rodilla")
+    assert backend.load(1)["title"] == "Dolor de rodilla"
+    assert not backend.set_title(2, "No existe")
+    assert backend.delete(1)
+    assert not backend.exists(1)
+    assert not backend.delete(1)
+
+
+# Sincronización
+
+
+def test_changes_since_with_tombstones(backend):
+    backend.append(1, header("Rodilla"), turn("Me duele la rodilla", "Aplica hielo"))
+    backend.append(2, header("Dieta"), turn("¿Qué ceno?", "Verduras"))
+
+    synced, changed, deleted = backend.changes_since(0)
+    assert ids(changed) == [1, 2]
+    assert all(offset == 0 for _, offset in changed)
+    assert deleted == []
+
+    backend.append(1, header("Rodilla"), turn("¿Y mañana?", "Reposo"))
+    backend.delete(2)
+
+    current, changed, deleted = backend.changes_since(synced)
+    assert current > synced
+    assert ids(changed) == [1]
+    record, offset = changed[0]
+    # Mensajes que el cliente ya tenía
+    assert offset == 2
+    assert record["messages"][offset:] == turn("¿Y mañana?", "Reposo")
+    assert [d["id"] for d in deleted] == [2]
+    assert synced < deleted[0]["version"] <= current
+
+    # Sin cambios nuevos
+    assert backend.changes_since(current)[1:] == ([], [])
+
+    # Una conversación recreada tras el borrado ya no se marca como eliminada
+    backend.append(2, header("Dieta"), turn("Otra vez", "Claro"))
+    _, changed, deleted = backend.changes_since(synced)
+    assert ids(changed) == [1, 2]
+    assert deleted == []
+
+
+def test_changes_since_sees_other_process_writes(backend, backend_kind, tmp_path):
+    backend.append(3, header("Sueño"), turn("Duermo mal", "Evita pantallas"))
+    synced = backend.changes_since(0)[0]
+    other = make_backend(backend_kind, tmp_path)
+    try:
+        other.append(1, header("Rodilla"), turn("Hola", "Hola"))
+        other.delete(1)
+        other.append(2, header("Dieta"), turn("Hola", "Hola"))
+    finally:
+        other.close()
+
+    current, changed, deleted = backend.changes_since(synced)
+    assert current > synced
+    assert ids(changed) == [2]
+    assert [d["id"] for d in deleted] == [1]
+    assert [m["id"] for m in backend.list_metadata()[0]] == [3, 2]
+
+
+# Importación de los chats JSON
+
+
+def test_migrate_legacy_json(tmp_path, monkeypatch):
+    # Las rutas del backend JSON son relativas al directorio de trabajo
+    monkeypatch.chdir(tmp_path)
+    Path("app/chats-openai").mkdir(parents=True)
+    Path("app/chats-frontend").mkdir(parents=True)
+    legacy = JsonConversationStore(Path("app/chats-openai"), Path("app/chats-frontend"))
+    legacy.append(1, header("Rodilla"), turn("Me duele la rodilla", "Aplica hielo"))
+    legacy.append(2, header("Dieta"), turn("¿Qué ceno?", "Verduras"))
+    legacy.close()
+    # Una conversación guardada antes del reparto en subdirectorios
+    for entry in list(iter_sharded_files("app/chats-frontend")) + list(
+        iter_sharded_files("app/chats-openai")
+    ):
+        if entry.name == "2.json":
+            os.replace(entry.path, Path(entry.path).parents[2] / entry.name)
+
+    store = SqliteConversationStore("app/chats.db")
+    try:
+        assert store.is_empty() and has_legacy_json_chats()
+        migrate_legacy_json(store)
+        assert store.conversation_ids() == [1, 2]
+        assert store.load(1)["messages"] == turn("Me duele la rodilla", "Aplica hielo")
+        assert store.load(2)["title"] == "Dieta"
+
+        # Solo se importa en una base vacía
+        store.delete(1)
+        migrate_legacy_json(store)
+        assert store.conversation_ids() == [2]
+    finally:
+        store.close()
+
+
+def test_sqlite_store_imports_legacy_json_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("app/chats-openai").mkdir(parents=True)
+    Path("app/chats-frontend").mkdir(parents=True)
+    legacy = JsonConversationStore(Path("app/chats-openai"), Path("app/chats-frontend"))
+    legacy.append(7, header("Rodilla"), turn("Hola", "Hola"))
+    legacy.close()
+
+    monkeypatch.setattr(conversation_store, "_store", None)
+    monkeypatch.setattr(conversation_store, "CHAT_STORE_BACKEND", "sqlite")
+    monkeypatch.setattr(conversation_store, "CHAT_STORE_PATH", "app/chats.db")
+    monkeypatch.setattr(conversation_store, "CHAT_ARCHIVE_ENABLED", False)
+    monkeypatch.setattr(conversation_store, "CHAT_CACHE_ENABLED", False)
+    try:
+        store = conversation_store.get_conversation_store()
+        assert isinstance(store, SqliteConversationStore)
+        assert store.load(7)["messages"] == turn("Hola", "Hola")
+    finally:
+        conversation_store.close_conversation_store()
+
+
+# Archivo de conversaciones inactivas
+
+
+def test_archive_and_rehydrate(backend, tmp_path):
+    archived = ArchivedConversationStore(backend, tmp_path / "archive", interval=0)
+    old_messages = turn("Me duele la rodilla", "Aplica hielo")
+    archived.append(1, header("Rodilla", "2020-01-01 10:00:00"), old_messages)
+    archived.append(2, header("Dieta", "2099-01-01 10:00:00"), turn("Hola", "Hola"))
+    synced = archived.changes_since(0)[0]
+
+    summary = archived.archive_idle()
+    assert summary["archived"] == 1
+    assert not backend.exists(1)
+    assert archived.exists(1)
+    assert archived.conversation_ids() == [1, 2]
+    assert [m["id"] for m in archived.list_metadata()[0]] == [2, 1]
+    assert archived.get_metadata(1)["title"] == "Rodilla"
+    assert archived.archive_stats()["conversations"] == 1
+
+    # Archivar no es borrar, y la sincronización completa no descomprime nada
+    assert archived.changes_since(synced)[2] == []
+    changed = dict((record["id"], record) for record, _ in archived.changes_since(0)[1])
+    assert changed[1]["archived"] and changed[1]["metadata"]["title"] == "Rodilla"
+
+    # Leer la conversación la devuelve al almacén principal
+    record = archived.load(1)
+    assert record["messages"] == old_messages
+    assert backend.exists(1)
+    assert archived.archive_stats()["conversations"] == 0
+
+    # Los borrados posteriores sí se sincronizan
+    assert archived.delete(1)
+    assert [d["id"] for d in archived.changes_since(synced)[2]] == [1]
+
+
+def test_writing_archived_conversation_rehydrates_it(backend, tmp_path):
+    archived = ArchivedConversationStore(backend, tmp_path / "archive", interval=0)
+    archived.append(1, header("Rodilla", "2020-01-01 10:00:00"), turn("Hola", "Hola"))
+    assert archived.archive_conversation(1) is not None
+
+    archived.append(1, header("Rodilla"), turn("Sigo igual", "Consulta a un médico"))
+
+    assert backend.load(1)["messages"] == turn("Hola", "Hola") + turn(
+        "Sigo igual", "Consulta a un médico"
+    )
+    assert archived.archive_stats()["conversations"] == 0
+
+
+def test_busy_conversation_is_not_archived(backend, tmp_path):
+    archived = ArchivedConversationStore(backend, tmp_path / "archive", interval=0)
+    archived.append(1, header("Rodilla", "2020-01-01 10:00:00"), turn("Hola", "Hola"))
+
+    locked, release = threading.Event(), threading.Event()
+
+    def process_turn():
+        # Un turno en curso en otro hilo (file_lock es reentrante en el mismo)
+        with file_lock(turn_lock_path(1)):
+            locked.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=process_turn)
+    worker.start()
+    locked.wait(5)
+    try:
+        assert archived.archive_idle()["archived"] == 0
+    finally:
+        release.set()
+        worker.join()
+    assert backend.exists(1)
+
+
+# Caché con escritura diferida
+
+
+@pytest.fixture
+def cached(backend):
+    # Intervalo largo: solo se vuelca al llamar a flush
+    store = CachedConversationStore(backend, flush_interval=3600)
+    yield store
+    store.close()
+
+
+def test_cached_flush_writes_pending_turns_in_order(cached, backend_kind, tmp_path):
+    other = make_backend(backend_kind, tmp_path)
+    try:
+        cached.create(1, "Rodilla", CREATED_AT)
+        cached.append(1, header("Rodilla"), turn("Me duele", "Hielo"))
+        cached.append(1, header("Rodilla"), turn("¿Y mañana?", "Reposo"))
+        cached.append(2, header("Dieta"), turn("¿Qué ceno?", "Verduras"))
+        assert not other.exists(1)
+
+        # Volcar una conversación no vuelca las demás
+        cached.flush(1)
+        assert other.load(1)["messages"] == turn("Me duele", "Hielo") + turn(
+            "¿Y mañana?", "Reposo"
+        )
+        assert not other.exists(2)
+        assert cached.stats()["pending"] == 1
+        version = other.load(1)["version"]
+
+        cached.append(1, header("Rodilla"), turn("Sigo igual", "Ve al médico"))
+        cached.flush()
+        record = other.load(1)
+        assert [m["content"] for m in record["messages"]] == [
+            "Me duele",
+            "Hielo",
+            "¿Y mañana?",
+            "Reposo",
+            "Sigo igual",
+            "Ve al médico",
+        ]
+        assert record["version"] > version
+        assert other.exists(2)
+        assert cached.stats()["pending"] == 0
+    finally:
+        other.close()
+
+
+def test_cached_delete_is_not_undone_by_flush(cached, backend):
+    cached.append(1, header("Rodilla"), turn("Hola", "Hola"))
+    cached.flush()
+    cached.append(1, header("Rodilla"), turn("Pendiente", "Sin volcar"))
+
+    assert cached.delete(1)
+    cached.flush()
+
+    assert not backend.exists(1)
+    assert not cached.exists(1)
+
+
+def test_chat_turn_flushes_before_releasing_turn_lock(cached, backend, monkeypatch):
+    flushed_under_lock = []
+    flush = cached.flush
+
+    def checked_flush(conversation_id=None):
+        # Si el turno aún tiene el bloqueo, no se puede obtener sin esperar
+        try:
+            with file_lock(turn_lock_path(1), timeout=0):
+                flushed_under_lock.append(False)
+        except TimeoutError:
+            flushed_under_lock.append(True)
+        flush(conversation_id)
+
+    async def generate_text(*args, **kwargs):
+        return "Aplica hielo"
+
+    monkeypatch.setattr(cached, "flush", checked_flush)
+    monkeypatch.setattr(openai_service, "get_conversation_store", lambda: cached)
+    monkeypatch.setattr(openai_service, "generate_text", generate_text)
+    monkeypatch.setattr(openai_service, "CHAT_TITLE_MODE", "local")
+
+    result = asyncio.run(OpenAIService.chat_with_openai("Me duele la rodilla", 1))
+
+    assert result["respuesta"] == "Aplica hielo"
+    assert flushed_under_lock == [True]
+    # Otro worker ve el turno en cuanto se libera el bloqueo
+    assert backend.load(1)["messages"] == turn("Me duele la rodilla", "Aplica hielo")
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.services import openai_service
+from app.services.conversation_store import SqliteConversationStore, turn_lock_path
+from app.services.openai_service import OpenAIService
+from herramientas.file_lock import async_file_lock
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SqliteConversationStore(str(tmp_path / "chats.db"))
+    monkeypatch.setattr(openai_service, "get_conversation_store", lambda: store)
+    monkeypatch.setattr(openai_service, "CHAT_TITLE_MODE", "background")
+    yield store
+    store.close()
+
+
+def llm_title(title: str):
+    async def generate_title(source_text: str, kind: str = "text") -> str:
+        return title
+
+    return generate_title
+
+
+def first_turn(conversation_id: int) -> None:
+    """Primer turno: se guarda con el título extractivo."""
+    OpenAIService.create_new_conversation(conversation_id)
+    conversation = OpenAIService.get_conversation(conversation_id)
+    conversation["title"] = OpenAIService.extractive_title("Me duele la rodilla")
+    conversation["messages"].append({"role": "user", "content": "Me duele la rodilla"})
+    OpenAIService.save_conversation(conversation_id, conversation)
+
+
+def test_background_title_is_saved(store, monkeypatch):
+    monkeypatch.setattr(OpenAIService, "generate_title", llm_title("Dolor de rodilla"))
+    first_turn(1)
+
+    asyncio.run(OpenAIService._update_title(1, "Me duele la rodilla", "text"))
+
+    assert store.load(1)["title"] == "Dolor de rodilla"
+    assert 1 not in openai_service._pending_titles
+
+
+def test_background_title_survives_concurrent_turn(store, monkeypatch):
+    monkeypatch.setattr(OpenAIService, "generate_title", llm_title("Dolor de rodilla"))
+    first_turn(1)
+
+    async def scenario():
+        # El turno siguiente lee el registro con el título extractivo y, mientras
+        # espera al modelo, termina la generación del título en segundo plano
+        async with async_file_lock(turn_lock_path(1)):
+            conversation = OpenAIService.get_conversation(1)
+            start = len(conversation["messages"])
+            task = asyncio.create_task(
+                OpenAIService._update_title(1, "Me duele la rodilla", "text")
+            )
+            await asyncio.sleep(0.1)
+            conversation["messages"].append({"role": "assistant", "content": "Reposo"})
+            OpenAIService.save_conversation(1, conversation, start)
+        await task
+
+    asyncio.run(scenario())
+
+    record = store.load(1)
+    assert record["title"] == "Dolor de rodilla"
+    assert len(record["messages"]) == 2
+    assert 1 not in openai_service._pending_titles
@@ -0,0 +1,19 @@
+import asyncio
+import logging
+
+import pytest
+
+from herramientas import llm_client
+
+
+@pytest.mark.parametrize("h2_installed", [True, False])
+def test_client_log_reports_effective_http2(h2_installed, monkeypatch, caplog):
+    monkeypatch.setattr(llm_client, "OPENAI_HTTP2", True)
+    monkeypatch.setattr(llm_client, "_http2_available", lambda: h2_installed)
+
+    with caplog.at_level(logging.INFO, logger="llm_client"):
+        llm_client.get_async_client(f"sk-test-http2-{h2_installed}")
+    asyncio.run(llm_client.close_clients())
+
+    assert f"http2={h2_installed}" in caplog.text
+    assert ("Paquete 'h2' no disponible" in caplog.text) is not h2_installed
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from herramientas import medical_agent
+from herramientas.file_lock import file_lock, lock_path_for
+from herramientas.medical_agent import MedicalAgent
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    async def generate_text(*args, **kwargs):
+        return "Respuesta médica"
+
+    monkeypatch.setattr(medical_agent, "generate_text", generate_text)
+    agent = MedicalAgent(api_key="sk-test", user_data_dir=str(tmp_path))
+    with open(agent.medical_info_path, "w", encoding="utf-8") as f:
+        json.dump({"nombre": "Ana", "alergias": ["penicilina"]}, f)
+    return agent
+
+
+def test_consultation_waits_for_lock_off_event_loop(agent):
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        # Otro worker tiene el archivo bloqueado
+        with file_lock(lock_path_for(agent.medical_info_path)):
+            locked.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    locked.wait(5)
+
+    async def scenario():
+        task = asyncio.create_task(agent.process_with_user_data("Me duele la cabeza"))
+        ticks = 0
+        while ticks < 10:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        # El bucle sigue atendiendo otras tareas mientras la consulta espera
+        assert not task.done()
+        release.set()
+        return await task
+
+    try:
+        response = asyncio.run(scenario())
+    finally:
+        release.set()
+        holder.join()
+
+    assert response == "Respuesta médica"
+    with open(agent.medical_info_path, encoding="utf-8") as f:
+        assert f.read().count("Me duele la cabeza") == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import chatbot
+from app.services import openai_service
+from app.services.conversation_store import SqliteConversationStore
+from app.services.openai_service import OpenAIService
+
+
+class LoopGuard:
+    """Almacén que falla si se usa desde el hilo del bucle de eventos."""
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        def call(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                self.calls.append(name)
+                return method(*args, **kwargs)
+            raise AssertionError(f"{name} se ha llamado en el bucle de eventos")
+
+        return call
+
+
+@pytest.fixture
+def guarded(tmp_path, monkeypatch):
+    store = SqliteConversationStore(str(tmp_path / "chats.db"))
+    store.append(
+        1,
+        {"title": "Rodilla", "created_at": "2024-01-01 10:00:00"},
+        [
+            {"role": "user", "content": "Me duele la rodilla"},
+            {"role": "assistant", "content": "Aplica hielo"},
+        ],
+    )
+    guard = LoopGuard(store)
+    monkeypatch.setattr(openai_service, "get_conversation_store", lambda: guard)
+    yield guard
+    store.close()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chatbot.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/show-chats",
+        "/show-chat/1",
+        "/sync-chats",
+        "/search-chats?q=rodilla",
+        "/cache-stats",
+    ],
+)
+def test_endpoints_use_store_off_event_loop(guarded, client, url):
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert guarded.calls
+
+
+def test_delete_uses_store_off_event_loop(guarded, client):
+    response = client.delete("/delete-chat/1")
+
+    assert response.status_code == 200
+    assert "delete" in guarded.calls
+
+
+def test_chat_turn_uses_store_off_event_loop(guarded, monkeypatch):
+    async def generate_text(*args, **kwargs):
+        return "Reposo y hielo"
+
+    monkeypatch.setattr(openai_service, "generate_text", generate_text)
+
+    result = asyncio.run(OpenAIService.chat_with_openai("¿Y si sigue doliendo?", 1))
+
+    assert result["respuesta"] == "Reposo y hielo"
+    assert {"exists", "load", "append", "flush"} <= set(guarded.calls)
+    assert len(guarded.store.load(1)["messages"]) == 4
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import "../styles/ChatOptionsMenu.css";
 
 // URL de la API desde variables de entorno
@@ -13,6 +13,8 @@ const ChatOptionsMenu = ({ isOpen, onClose, onNewChat, onSelectChat }) => {
     });
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
+    // Copia local de las conversaciones y última versión recibida de /sync-chats
+    const syncState = useRef({ version: 0, chats: new Map() });
 
     useEffect(() => {
         if (isOpen) {
@@ -25,7 +27,9 @@ const ChatOptionsMenu = ({ isOpen, onClose, onNewChat, onSelectChat }) => {
             setLoading(true);
             setError(null);
             console.log('📥 Solicitando lista de chats...');
-            const response = await fetch(`${API_URL}/show-chats`, {
+            // Pedir solo los cambios desde la última sincronización
+            const { version } = syncState.current;
+            const response = await fetch(`${API_URL}/sync-chats?since=${version}&include_messages=false`, {
                 method: 'GET',
                 headers: {
                     'Accept': 'application/json',
@@ -39,14 +43,24 @@ const ChatOptionsMenu = ({ isOpen, onClose, onNewChat, onSelectChat }) => {
                 throw new Error(`Error HTTP: ${response.status}`);
             }
 
-            const data = await response.json();
-            console.log('📊 Chats recibidos:', data);
+            const changes = await response.json();
+            console.log('📊 Cambios recibidos:', changes);
 
-            if (!data || !data.chats) {
-                console.error('Estructura de datos inválida:', data);
+            if (!changes || !changes.chats || !changes.deleted) {
+                console.error('Estructura de datos inválida:', changes);
                 throw new Error('Formato de respuesta inválido');
             }
 
+            // Aplicar los cambios sobre la copia local
+            const localChats = syncState.current.chats;
+            changes.deleted.forEach(tombstone => localChats.delete(tombstone.id));
+            changes.chats.forEach(chat => localChats.set(chat.id, chat));
+            syncState.current.version = changes.version;
+
+            // De la más reciente (ID mayor) a la más antigua
+            const allChats = [...localChats.values()].sort((a, b) => b.id - a.id);
+            const data = { chats: allChats };
+
             // Verificar si hay chats
             if (data.chats.length === 0) {
                 console.log('ℹ️ No hay conversaciones disponibles');
@@ -67,13 +81,13 @@ const ChatOptionsMenu = ({ isOpen, onClose, onNewChat, onSelectChat }) => {
                     };
 
                     if (diffDays === 0) {
-                        acc.today.unshift(chatInfo);
+                        acc.today.push(chatInfo);
                     } else if (diffDays === 1) {
-                        acc.yesterday.unshift(chatInfo);
+                        acc.yesterday.push(chatInfo);
                     } else if (diffDays <= 7) {
-                        acc.lastWeek.unshift(chatInfo);
+                        acc.lastWeek.push(chatInfo);
                     } else if (diffDays <= 30) {
-                        acc.lastMonth.unshift(chatInfo);
+                        acc.lastMonth.push(chatInfo);
                     }
 
                     return acc;
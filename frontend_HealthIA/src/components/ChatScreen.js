@@ -190,7 +190,7 @@ const ChatScreen = ({ onBack }) => {
     const initializeChatId = async () => {
       try {
         // Obtener la lista de chats existentes
-        const response = await fetch(`${API_URL}/show-chats`, {
+        const response = await fetch(`${API_URL}/show-chats?limit=1`, {
           method: 'GET',
           headers: {
             'Accept': 'application/json',
@@ -206,7 +206,7 @@ const ChatScreen = ({ onBack }) => {
 
         const data = await response.json();
         
-        // Encontrar el ID más alto
+        // Las conversaciones llegan ordenadas por ID descendente: la primera tiene el ID más alto
         let maxId = 0;
         if (data && data.chats && data.chats.length > 0) {
           maxId = Math.max(...data.chats.map(chat => chat.id));
@@ -234,7 +234,7 @@ const ChatScreen = ({ onBack }) => {
       console.log('🔄 Obteniendo lista de chats para crear uno nuevo...');
       
       // Obtener la lista de chats existentes
-      const response = await fetch(`${API_URL}/show-chats`, {
+      const response = await fetch(`${API_URL}/show-chats?limit=1`, {
         method: 'GET',
         headers: {
           'Accept': 'application/json',
@@ -250,7 +250,7 @@ const ChatScreen = ({ onBack }) => {
 
       const data = await response.json();
       
-      // Encontrar el ID más alto
+      // Las conversaciones llegan ordenadas por ID descendente: la primera tiene el ID más alto
       let maxId = 0;
       if (data && data.chats && data.chats.length > 0) {
         maxId = Math.max(...data.chats.map(chat => chat.id));
@@ -831,7 +831,9 @@ const ChatScreen = ({ onBack }) => {
     try {
         console.log('🔄 Cargando chat:', chatId);
         
-        const response = await fetch(`${API_URL}/show-chats`, {
+        // Convertir chatId a número
+        const numericChatId = parseInt(chatId, 10);
+        const response = await fetch(`${API_URL}/show-chat/${numericChatId}`, {
             method: 'GET',
             headers: {
                 'Accept': 'application/json',
@@ -841,30 +843,16 @@ const ChatScreen = ({ onBack }) => {
             mode: 'cors'
         });
 
-        if (!response.ok) {
-            throw new Error(`Error HTTP: ${response.status}`);
+        if (response.status === 404) {
+            console.log('❌ Chat no encontrado:', numericChatId);
+            throw new Error('Chat no encontrado');
         }
 
-        const data = await response.json();
-        
-        // Verificar si hay chats
-        if (!data.chats || data.chats.length === 0) {
-            console.log('ℹ️ No hay conversaciones disponibles');
-            setMessages([{
-                type: 'bot',
-                content: 'No hay conversaciones disponibles. Puedes iniciar una nueva conversación.'
-            }]);
-            return;
+        if (!response.ok) {
+            throw new Error(`Error HTTP: ${response.status}`);
         }
-        
-        // Convertir chatId a número para la comparación
-        const numericChatId = parseInt(chatId, 10);
-        const selectedChat = data.chats.find(chat => chat.id === numericChatId);
 
-        if (!selectedChat) {
-            console.log('❌ Chat no encontrado:', numericChatId);
-            throw new Error('Chat no encontrado');
-        }
+        const selectedChat = await response.json();
 
         console.log('📱 Chat encontrado:', selectedChat);
 